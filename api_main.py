@@ -1,55 +1,408 @@
 # api_main.py
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+import json
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, ValidationError
-from typing import Dict, Any
+from starlette.background import BackgroundTask
+from typing import Dict, Any, AsyncIterator, Callable, List, Literal
 
-from core.exceptions import ServiceExecutionError
+from core.admission import get_task_admission, task_admission_stats
+from core.exceptions import AdmissionRejectedError, ProviderUnavailableError, ServiceExecutionError
+from core.instrumentation import record_task_request, record_wait, track_timings
+from core.jobs import JobManager, JobStatus, create_job_store
+from core.chain_factory import CHAIN_FACTORY
+from core.task_registry import TaskRegistry, enabled_task_names
+from core.llm_router import provider_gate_stats
+from core.metrics import METRICS
+from core.response_cache import get_response_cache, summarize_cache_outcomes, track_cache_outcomes
+from core.single_flight import SingleFlight
+from core.structured_output import STRUCTURED_OUTPUT_STATS
+from core.workspace_index import workspace_index_stats
+from core.concurrency import run_in_worker_thread
+from config.llm_providers import LLM_CLIENT_CACHE, resolve_model_candidates, warm_up_llm_cache
+from config.prompt_loader import PROMPT_REGISTRY
+from config.settings import get_section_settings
 
 # --- Task Registry ---
-from services.planning_service import PlanningService, PlanRequest
-from services.docs_service import DocsService, DocsRequest
-from services.analysis_service import AnalysisService, AnalyzeRequest
-from services.editing_service import EditingService, EditRequest
-from services.optimizer_service import OptimizerService, OptimizerRequest 
-
-TASK_REGISTRY = {
-    "planning": (PlanningService, PlanRequest),
-    "documentation": (DocsService, DocsRequest),
-    "analysis": (AnalysisService, AnalyzeRequest),
-    "editing": (EditingService, EditRequest),
-    "optimizer": (OptimizerService, OptimizerRequest),
+# task -> (service module, service class, request model). One service instance per task, shared by every
+# request; services keep no per-request state and reuse their chains through the CHAIN_FACTORY.
+# Service modules are imported on first use, and only the enabled tasks (ENABLED_TASKS) are served.
+TASK_SPECS = {
+    "planning": ("services.planning_service", "PlanningService", "PlanRequest"),
+    "documentation": ("services.docs_service", "DocsService", "DocsRequest"),
+    "analysis": ("services.analysis_service", "AnalysisService", "AnalyzeRequest"),
+    "editing": ("services.editing_service", "EditingService", "EditRequest"),
+    "optimizer": ("services.optimizer_service", "OptimizerService", "OptimizerRequest"),
 }
+# A service's prompts are checked against the variables it fills in as soon as it is loaded.
+TASK_REGISTRY = TaskRegistry(
+    TASK_SPECS,
+    enabled=enabled_task_names(TASK_SPECS),
+    on_load=lambda service_instance: PROMPT_REGISTRY.expect_variables(service_instance.PROMPT_VARIABLES),
+)
 
 # --- Generic Request Models ---
 class GenericTaskRequest(BaseModel):
     model: str | None = None
     data: Dict[str, Any]
 
+class BatchTaskRequest(BaseModel):
+    model: str | None = None
+    data: List[Dict[str, Any]]
+    max_concurrency: int | None = None
+
+# --- Single-flight ---
+# Identical concurrent requests (same task, models, data and input files) share one execution.
+SINGLE_FLIGHT = SingleFlight()
+
+# --- Background Jobs ---
+JOB_MANAGER = JobManager(
+    store=create_job_store(get_section_settings("jobs")),
+    concurrency_for=lambda task_name: get_section_settings("jobs", task_name).get("concurrency", 2),
+    progress_save_interval_seconds=float(get_section_settings("jobs").get("progress_save_interval_seconds", 0.5)),
+)
+
 # --- FastAPI App Instance and Handlers ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile every prompt once. With `preload_services`, import the enabled services now and fail fast
+    # if a template does not match the variables its service fills in; otherwise that happens on first use.
+    PROMPT_REGISTRY.load_all()
+    if get_section_settings("server").get("preload_services", False):
+        TASK_REGISTRY.load_all()
+    print(f"INFO: Serving tasks: {list(TASK_REGISTRY)} (loaded: {TASK_REGISTRY.loaded_tasks()})")
+    prompt_settings = get_section_settings("prompts")
+    if prompt_settings.get("watch", False):
+        PROMPT_REGISTRY.start_watching(float(prompt_settings.get("watch_interval_seconds", 2.0)))
+
+    if get_section_settings("llm_client_cache").get("warm_up", True):
+        warmed = warm_up_llm_cache(TASK_REGISTRY.keys())
+        print(f"INFO: Warmed up LLM clients: {warmed}")
+    yield
+    await JOB_MANAGER.shutdown()
+    PROMPT_REGISTRY.stop_watching()
+
 app = FastAPI(
     title="Generic AI Task Assistant (SOLID)",
-    version="10.0"
+    version="10.0",
+    lifespan=lifespan,
 )
 
 @app.exception_handler(ServiceExecutionError)
 async def service_exception_handler(request: Request, exc: ServiceExecutionError):
+    if isinstance(exc.original_exception, ProviderUnavailableError):
+        return JSONResponse(
+            status_code=503,
+            content={"error": "No LLM provider is currently available for this task.", "detail": exc.message},
+        )
     return JSONResponse(
         status_code=500,
         content={"error": "An internal error occurred during task execution.", "detail": exc.message},
     )
 
-@app.post("/tasks/{task_name}", summary="Executes any registered AI task", tags=["Tasks"])
-async def execute_task(task_name: str, request: GenericTaskRequest):
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejectedError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "The task is at capacity.", "detail": exc.message, "retry_after_seconds": exc.retry_after_seconds},
+        headers={"Retry-After": str(exc.retry_after_seconds)},
+    )
+
+@app.get("/stats/llm-clients", summary="Hit/miss/eviction counters of the pooled LLM clients", tags=["Stats"])
+async def llm_client_stats():
+    return LLM_CLIENT_CACHE.stats()
+
+@app.get("/stats/chains", summary="Hit/miss/eviction counters of the cached task chains", tags=["Stats"])
+async def chain_stats():
+    return CHAIN_FACTORY.stats()
+
+@app.get("/stats/providers", summary="Concurrency slots and circuit breaker state of each LLM provider", tags=["Stats"])
+async def provider_stats():
+    return provider_gate_stats()
+
+@app.get("/stats/admission", summary="Running, queued and rejected requests of each task", tags=["Stats"])
+async def admission_stats():
+    return task_admission_stats()
+
+@app.get("/stats/single-flight", summary="Executions shared by identical concurrent requests", tags=["Stats"])
+async def single_flight_stats():
+    return SINGLE_FLIGHT.stats()
+
+@app.get("/stats/structured-output", summary="Parsed, repaired and re-asked structured outputs of each task", tags=["Stats"])
+async def structured_output_stats():
+    return STRUCTURED_OUTPUT_STATS.stats()
+
+@app.get("/stats/workspace-index", summary="Files, scans and cached reads of the workspace file indexes", tags=["Stats"])
+async def workspace_stats():
+    return workspace_index_stats()
+
+@app.get("/stats/prompts", summary="Counters of the prompt template registry", tags=["Stats"])
+async def prompt_stats():
+    return PROMPT_REGISTRY.stats()
+
+@app.get("/stats/response-cache", summary="Counters of the LLM response cache", tags=["Stats"])
+async def response_cache_stats():
+    return get_response_cache().stats()
+
+@app.get("/metrics", summary="Latency, token and error metrics in the Prometheus text format", tags=["Stats"], response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(METRICS.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+def _task_not_found(task_name: str) -> JSONResponse:
+    if task_name in TASK_SPECS:
+        return JSONResponse(status_code=404, content={"error": f"Task '{task_name}' is not enabled on this server."})
+    return JSONResponse(status_code=404, content={"error": f"Task '{task_name}' not found."})
+
+async def _validate_task_request(task_name: str, data: Dict[str, Any]):
+    """Returns (service instance, validated task data), or the JSONResponse to send back when the request is invalid."""
     if task_name not in TASK_REGISTRY:
-        return JSONResponse(status_code=404, content={"error": f"Task '{task_name}' not found."})
+        return _task_not_found(task_name)
 
-    ServiceClass, RequestModel = TASK_REGISTRY[task_name]
+    service_instance, RequestModel = await TASK_REGISTRY.aget(task_name)
     try:
-        task_data = RequestModel(**request.data)
+        task_data = RequestModel(**data)
     except ValidationError as e:
         return JSONResponse(status_code=422, content={"error": "Invalid data for the specified task.", "detail": str(e)})
+    return service_instance, task_data
+
+@asynccontextmanager
+async def _admitted(task_name: str, model: str | None) -> AsyncIterator[float]:
+    """
+    Runs the block once the task's admission control lets the request in (see `admission` in llm_settings.yaml);
+    yields the seconds spent in its queue. Raises AdmissionRejectedError when the queue is full or the wait too long.
+    """
+    admission = get_task_admission(task_name)
+    if admission is None:
+        yield 0.0
+        return
+    async with admission.admit() as queue_wait:
+        record_wait("queue_wait", queue_wait, task=task_name, model=model or "default")
+        yield queue_wait
+
+async def _admit_stream(task_name: str, model: str | None) -> tuple[float, Callable[[], None]]:
+    """Admits a streaming request, whose slot outlives the handler; returns the queue wait and an idempotent release."""
+    admission = get_task_admission(task_name)
+    if admission is None:
+        return 0.0, lambda: None
+    queue_wait = await admission.acquire()
+    record_wait("queue_wait", queue_wait, task=task_name, model=model or "default")
+    admitted_at = time.monotonic()
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            admission.release(time.monotonic() - admitted_at)
+    return queue_wait, release
+
+def _queue_wait_header(queue_wait: float) -> str:
+    return f"{queue_wait * 1000:.1f}"
+
+async def _single_flight_key(task_name: str, model: str | None, service_instance, task_kwargs: Dict[str, Any]) -> tuple | None:
+    """
+    The key under which identical requests share an execution: the task, its candidate models, the request
+    data and a fingerprint of the input files the service reads. None when single-flight is off for the task.
+    """
+    if not get_section_settings("single_flight", task_name).get("enabled", True):
+        return None
+    fingerprint = await run_in_worker_thread(service_instance.single_flight_fingerprint, **task_kwargs)
+    return (
+        task_name,
+        tuple(resolve_model_candidates(task_name, model)),
+        json.dumps(task_kwargs, sort_keys=True, default=str),
+        fingerprint,
+    )
 
-    service_instance = ServiceClass(task_name)
-    result = service_instance.execute(model_override=request.model, **task_data.model_dump())
+async def _run_shared(task_name: str, model: str | None, service_instance, task_kwargs: Dict[str, Any], runner) -> tuple[Any, str]:
+    """
+    Awaits `runner()`, or the identical execution already in flight instead (whose leader's `runner` produces
+    the result). Returns the result and the request's role: "leader", "shared", or "off" without single-flight.
+    """
+    key = await _single_flight_key(task_name, model, service_instance, task_kwargs)
+    if key is None:
+        return await runner(), "off"
+    role = "shared" if key in SINGLE_FLIGHT else "leader"
+    return await SINGLE_FLIGHT.run(key, runner, task_name), role
+
+async def _observe_request(task_name: str, model: str | None, runner):
+    """Awaits `runner()` and records its latency and outcome in the task request metrics."""
+    started = time.perf_counter()
+    status = "error"
+    try:
+        result = await runner()
+        status = "ok"
+        return result
+    finally:
+        record_task_request(task_name, model or "default", status, time.perf_counter() - started)
+
+@app.post("/tasks/{task_name}", summary="Executes any registered AI task", tags=["Tasks"])
+async def execute_task(task_name: str, request: GenericTaskRequest, response: Response, timings: bool = False):
+    validated = await _validate_task_request(task_name, request.data)
+    if isinstance(validated, JSONResponse):
+        return validated
+    service_instance, task_data = validated
+
+    task_kwargs = task_data.model_dump()
+    queue_wait = 0.0
+
+    async def run_admitted() -> Any:
+        nonlocal queue_wait
+        async with _admitted(task_name, request.model) as queue_wait:
+            # Native async services await their chains; sync-only services are run in the bounded worker pool.
+            return await _observe_request(
+                task_name, request.model, lambda: service_instance.aexecute(model_override=request.model, **task_kwargs)
+            )
+
+    with track_cache_outcomes() as cache_outcomes, track_timings() as request_timings:
+        # A request that joins an identical one in flight takes no admission slot and does not queue.
+        result, single_flight_role = await _run_shared(task_name, request.model, service_instance, task_kwargs, run_admitted)
+    response.headers["X-Response-Cache"] = summarize_cache_outcomes(cache_outcomes)
+    response.headers["X-Queue-Wait-Ms"] = _queue_wait_header(queue_wait)
+    response.headers["X-Single-Flight"] = single_flight_role
+    if timings and isinstance(result, dict):
+        result = {**result, "timings": request_timings}
     return result
+
+@app.post("/tasks/{task_name}/batch", summary="Executes a task for many inputs over one chain", tags=["Tasks"])
+async def execute_task_batch(task_name: str, request: BatchTaskRequest, response: Response):
+    if task_name not in TASK_REGISTRY:
+        return _task_not_found(task_name)
+
+    service_instance, RequestModel = await TASK_REGISTRY.aget(task_name)
+    batch_settings = get_section_settings("batch", task_name)
+    max_items = int(batch_settings.get("max_items", 500))
+    if len(request.data) > max_items:
+        return JSONResponse(status_code=422, content={"error": f"A batch may contain at most {max_items} items, got {len(request.data)}."})
+    max_concurrency = min(
+        request.max_concurrency or int(batch_settings.get("max_concurrency", 4)),
+        int(batch_settings.get("max_concurrency_limit", 16)),
+    )
+
+    # Invalid items are reported individually instead of rejecting the whole batch.
+    results: List[Dict[str, Any] | None] = [None] * len(request.data)
+    valid_indexes, valid_items = [], []
+    for index, item in enumerate(request.data):
+        try:
+            valid_items.append(RequestModel(**item).model_dump())
+            valid_indexes.append(index)
+        except ValidationError as e:
+            results[index] = {"index": index, "status": "error", "error": "Invalid data for the specified task.", "detail": str(e)}
+
+    # A batch takes one admission slot; its items are bounded by `max_concurrency` instead.
+    with track_cache_outcomes() as cache_outcomes:
+        async with _admitted(task_name, request.model) as queue_wait:
+            outputs = await _observe_request(
+                task_name, request.model, lambda: service_instance.abatch_execute(valid_items, model_override=request.model, max_concurrency=max_concurrency)
+            )
+    response.headers["X-Response-Cache"] = summarize_cache_outcomes(cache_outcomes)
+    response.headers["X-Queue-Wait-Ms"] = _queue_wait_header(queue_wait)
+
+    for index, output in zip(valid_indexes, outputs):
+        if isinstance(output, Exception):
+            detail = output.message if isinstance(output, ServiceExecutionError) else str(output)
+            results[index] = {"index": index, "status": "error", "error": "An internal error occurred during task execution.", "detail": detail}
+        else:
+            results[index] = {"index": index, "status": "ok", "result": output}
+
+    failed = sum(1 for result in results if result["status"] == "error")
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}
+
+def _format_stream_event(event: dict, stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+async def _timed_event_stream(
+    events: AsyncIterator[dict], stream_format: str, task_name: str, model: str | None, queue_wait: float = 0.0, on_close: Callable[[], None] = lambda: None
+) -> AsyncIterator[str]:
+    """Serialises service events and adds queue wait, time-to-first-token and total time to the final event."""
+    started = time.perf_counter()
+    first_token_at = None
+    status = "error"
+    try:
+        async for event in events:
+            if event["event"] == "token" and first_token_at is None:
+                first_token_at = time.perf_counter()
+            if event["event"] == "end":
+                event["timings"] = {
+                    "queue_wait_ms": round(queue_wait * 1000, 1),
+                    "time_to_first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                    "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                }
+                status = "ok"
+            yield _format_stream_event(event, stream_format)
+    except ServiceExecutionError as e:
+        # Headers are already sent, so errors are reported in-band as the last event.
+        yield _format_stream_event({"event": "error", "error": "An internal error occurred during task execution.", "detail": e.message}, stream_format)
+    finally:
+        on_close()
+        record_task_request(task_name, model or "default", status, time.perf_counter() - started)
+
+@app.post("/tasks/{task_name}/stream", summary="Executes a text-producing task and streams its tokens", tags=["Tasks"])
+async def stream_task(task_name: str, request: GenericTaskRequest, format: Literal["ndjson", "sse"] = "ndjson"):
+    validated = await _validate_task_request(task_name, request.data)
+    if isinstance(validated, JSONResponse):
+        return validated
+    service_instance, task_data = validated
+
+    if not service_instance.supports_streaming:
+        return JSONResponse(status_code=400, content={"error": f"Task '{task_name}' does not support streaming."})
+
+    # The slot is held until the stream ends; the background task also frees it if the stream never starts.
+    queue_wait, release = await _admit_stream(task_name, request.model)
+    events = service_instance.astream(model_override=request.model, **task_data.model_dump())
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _timed_event_stream(events, format, task_name, request.model, queue_wait, on_close=release),
+        media_type=media_type,
+        headers={"X-Queue-Wait-Ms": _queue_wait_header(queue_wait)},
+        background=BackgroundTask(release),
+    )
+
+# --- Background Job Endpoints ---
+@app.post("/jobs/{task_name}", status_code=202, summary="Submits a task to run in the background", tags=["Jobs"])
+async def submit_job(task_name: str, request: GenericTaskRequest):
+    validated = await _validate_task_request(task_name, request.data)
+    if isinstance(validated, JSONResponse):
+        return validated
+    service_instance, task_data = validated
+
+    task_kwargs = task_data.model_dump()
+
+    async def run_job() -> Any:
+        # Identical jobs running at the same time share one execution, like identical task requests.
+        result, _ = await _run_shared(
+            task_name, request.model, service_instance, task_kwargs,
+            lambda: _observe_request(task_name, request.model, lambda: service_instance.aexecute(model_override=request.model, **task_kwargs)),
+        )
+        return result
+
+    job = JOB_MANAGER.submit(
+        task_name,
+        data=task_kwargs,
+        model=request.model,
+        runner=run_job,
+    )
+    return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
+
+@app.get("/jobs/{job_id}", summary="Returns the status and, once finished, the result of a job", tags=["Jobs"])
+async def get_job(job_id: str):
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job '{job_id}' not found."})
+    return job
+
+@app.delete("/jobs/{job_id}", summary="Cancels a queued or running job", tags=["Jobs"])
+async def cancel_job(job_id: str):
+    job = await JOB_MANAGER.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job '{job_id}' not found."})
+    if job.status != JobStatus.CANCELLED:
+        return JSONResponse(
+            status_code=409,
+            content={"error": f"Job '{job_id}' already finished with status '{job.status.value}'.", "job": job.model_dump(mode="json")},
+        )
+    return job
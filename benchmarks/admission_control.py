@@ -0,0 +1,167 @@
+# benchmarks/admission_control.py
+"""
+Benchmark for admission control and provider rate limits on the task API.
+
+Uses the FAKE provider with a slow profile (every call takes --delay seconds) behind a shared provider
+concurrency limit, and checks four things:
+
+- isolation: during a burst of documentation requests (each fanning out into several LLM calls),
+  optimizer requests stay fast when documentation is admission-controlled, and queue behind the
+  documentation calls when it is not;
+- backpressure: documentation requests beyond its concurrency limit and queue depth are rejected at once
+  with 429 and a Retry-After header, and queued ones report their wait in X-Queue-Wait-Ms;
+- queue timeout: a request still queued after `max_queue_wait_seconds` gets 503;
+- rate limit: calls to a provider with `requests_per_minute` are paced, and the wait shows up in the timings.
+
+Usage: python -m benchmarks.admission_control [--delay 0.3]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from api_main import app
+from config.llm_providers import LLM_PROVIDERS
+from config.settings import LLM_SETTINGS_CONFIG
+
+DOCS_BURST = 8
+OPTIMIZER_REQUESTS = 8
+PACED_REQUESTS = 12
+PACED_PER_SECOND = 10
+
+
+def _configure(workspace: str, delay: float) -> None:
+    LLM_SETTINGS_CONFIG.setdefault("response_cache", {})["tasks"] = {}
+    LLM_SETTINGS_CONFIG.setdefault("llm_client_cache", {})["warm_up"] = False
+    LLM_SETTINGS_CONFIG.setdefault("fake_provider", {}).setdefault("profiles", {})["bench_slow"] = {
+        "time_to_first_token_seconds": delay, "tokens_per_second": 0,
+    }
+    LLM_SETTINGS_CONFIG["documentation_pipeline"] = {"summary_cache_path": "", "map_max_concurrency": 2}
+    # The provider's slots are the resource a burst of long tasks would otherwise take over.
+    providers = LLM_SETTINGS_CONFIG.setdefault("routing", {}).setdefault("providers", {})
+    providers["FAKE"] = {"max_concurrency": 8}
+    # Same fake model under another provider name, with a rate limit of its own.
+    LLM_PROVIDERS["FAKE_PACED"] = LLM_PROVIDERS["FAKE"]
+    providers["FAKE_PACED"] = {"max_concurrency": 64, "requests_per_minute": PACED_PER_SECOND * 60, "burst": 2}
+    # The bursts are identical requests; each must be admitted on its own rather than share one execution.
+    LLM_SETTINGS_CONFIG["single_flight"] = {"enabled": False}
+    LLM_SETTINGS_CONFIG["admission"] = {
+        "enabled": True,
+        "max_concurrency": 8,
+        "max_queue": 64,
+        "tasks": {
+            # Starts disabled for the run without admission control; admission objects are built on first use.
+            "documentation": {"enabled": False, "max_concurrency": 1, "max_queue": 2},
+            "planning": {"max_concurrency": 1, "max_queue": 4, "max_queue_wait_seconds": delay * 0.7},
+        },
+    }
+    for index in range(6):
+        with open(os.path.join(workspace, f"module_{index}.py"), "w", encoding="utf-8") as f:
+            f.write(f"def handler_{index}(value):\n    return value * {index}\n")
+
+
+async def _post(client: httpx.AsyncClient, path: str, model: str, data: dict) -> tuple:
+    started = time.perf_counter()
+    response = await client.post(path, json={"model": model, "data": data})
+    return time.perf_counter() - started, response
+
+
+async def _burst(client: httpx.AsyncClient, workspace: str) -> tuple:
+    """A documentation burst, with optimizer requests arriving just after it; returns both sets of (seconds, response)."""
+    docs = [
+        asyncio.ensure_future(_post(client, "/tasks/documentation", "FAKE:bench_slow", {"project_path": workspace}))
+        for _ in range(DOCS_BURST)
+    ]
+    await asyncio.sleep(0.05)
+    optimizer = await asyncio.gather(*(
+        _post(client, "/tasks/optimizer", "FAKE:bench_slow", {"raw_prompt": f"prompt #{index}"}) for index in range(OPTIMIZER_REQUESTS)
+    ))
+    return await asyncio.gather(*docs), optimizer
+
+
+async def run(delay: float) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        _configure(workspace, delay)
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            await _post(client, "/tasks/optimizer", "FAKE:bench_slow", {"raw_prompt": "warm up"})
+            results["without"] = await _burst(client, workspace)
+            LLM_SETTINGS_CONFIG["admission"]["tasks"]["documentation"]["enabled"] = True
+            results["with"] = await _burst(client, workspace)
+
+            results["queue_timeout"] = await asyncio.gather(*(
+                _post(client, "/tasks/planning", "FAKE:bench_slow", {"description": f"Add a REST API endpoint #{index}"}) for index in range(3)
+            ))
+
+            started = time.perf_counter()
+            paced = await asyncio.gather(*(
+                _post(client, "/tasks/optimizer?timings=true", "FAKE_PACED:instant", {"raw_prompt": f"paced #{index}"})
+                for index in range(PACED_REQUESTS)
+            ))
+            results["paced"] = (time.perf_counter() - started, paced)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.3, help="Fake LLM latency in seconds.")
+    args = parser.parse_args()
+
+    real_stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            results = asyncio.run(run(args.delay))
+        finally:
+            sys.stdout = real_stdout
+
+    failures = []
+    optimizer_p50 = {}
+    print(f"{'documentation admission':<24} {'docs ok':>8} {'docs 429':>9} {'optimizer p50 s':>16} {'optimizer max s':>16}")
+    for name in ("without", "with"):
+        docs, optimizer = results[name]
+        optimizer_seconds = [seconds for seconds, _ in optimizer]
+        optimizer_p50[name] = statistics.median(optimizer_seconds)
+        ok = sum(1 for _, response in docs if response.status_code == 200)
+        rejected = [(seconds, response) for seconds, response in docs if response.status_code == 429]
+        print(f"{name:<24} {ok:>8} {len(rejected):>9} {optimizer_p50[name]:>16.3f} {max(optimizer_seconds):>16.3f}")
+        if any(response.status_code != 200 for _, response in optimizer):
+            failures.append(f"optimizer requests failed {name} admission control")
+        if name == "with":
+            if not rejected or any(seconds > args.delay / 2 or "Retry-After" not in response.headers for seconds, response in rejected):
+                failures.append("requests beyond the documentation queue should be rejected at once with 429 and Retry-After")
+            queued_waits = [float(response.headers["X-Queue-Wait-Ms"]) for _, response in docs if response.status_code == 200]
+            print(f"documentation queue waits (ms): {sorted(queued_waits)}; Retry-After: {[response.headers['Retry-After'] for _, response in rejected]}")
+            if not any(wait > 0 for wait in queued_waits):
+                failures.append("queued documentation requests should report their wait in X-Queue-Wait-Ms")
+    if optimizer_p50["with"] >= optimizer_p50["without"]:
+        failures.append("admission control of documentation should keep the optimizer requests from queueing behind it")
+
+    statuses = sorted(response.status_code for _, response in results["queue_timeout"])
+    print(f"planning with a {args.delay * 0.7:.2f}s queue limit: statuses {statuses}")
+    if statuses != [200, 503, 503]:
+        failures.append("requests queued longer than max_queue_wait_seconds should get 503")
+
+    paced_seconds, paced = results["paced"]
+    rate_limit_waits = [response.json()["timings"]["stages"].get("rate_limit_wait", {}).get("count", 0) for _, response in paced]
+    minimum_seconds = (PACED_REQUESTS - 2) / PACED_PER_SECOND
+    print(f"{PACED_REQUESTS} calls at {PACED_PER_SECOND}/s (burst 2): {paced_seconds:.2f}s (at least {minimum_seconds:.2f}s), "
+          f"{sum(rate_limit_waits)} waited for the rate limit")
+    if paced_seconds < minimum_seconds * 0.9 or sum(rate_limit_waits) < PACED_REQUESTS - 2:
+        failures.append("calls to a rate-limited provider should be paced and report rate_limit_wait")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: admission control isolates tasks, rejects excess load with Retry-After, and provider calls are paced.")
+
+
+if __name__ == "__main__":
+    main()
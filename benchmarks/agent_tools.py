@@ -0,0 +1,120 @@
+# benchmarks/agent_tools.py
+"""
+Replays scripted agent traces through EditingService and reports what each run cost.
+
+The scripted chat model answers with a fixed sequence of ReAct steps, so every run makes the same tool
+calls. Two traces do the same job (find where `target_function` is defined and read the relevant files):
+one with the original list/read tools, revisiting paths as agents often do, and one with the bulk tools.
+Each is replayed with and without per-run memoisation, reporting agent iterations (LLM round-trips),
+tool calls, bytes read from disk and cache hits. (`grep_files` reads every file once; reads after it are hits.)
+
+Usage: python -m benchmarks.agent_tools [--files 60]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+from config.llm_providers import LLM_PROVIDERS, LLMProvider
+from config.settings import LLM_SETTINGS_CONFIG
+from core.fake_llm import ScriptedFakeChatModel
+from services.editing_service import EditingService
+
+
+def _step(action: str, action_input: str) -> str:
+    return f"Thought: I need more context.\nAction: {action}\nAction Input: {action_input}"
+
+
+_FINAL = "Thought: I now know where target_function is defined.\nFinal Answer: target_function is in pkg_3/module_3.py."
+
+TRACES = {
+    # What an agent limited to list_files/read_file typically does: walk directory by directory and re-read files.
+    "basic tools": [
+        _step("list_files", "."),
+        _step("list_files", "pkg_0"),
+        _step("read_file", "pkg_0/module_0.py"),
+        _step("list_files", "pkg_1"),
+        _step("read_file", "pkg_1/module_1.py"),
+        _step("list_files", "."),
+        _step("list_files", "pkg_3"),
+        _step("read_file", "pkg_3/module_3.py"),
+        _step("read_file", "pkg_0/module_0.py"),
+        _step("read_file", "pkg_3/module_3.py"),
+        _FINAL,
+    ],
+    "bulk tools": [
+        _step("list_tree", ". | 2"),
+        _step("grep_files", "def target_function"),
+        _step("read_files", "pkg_3/module_3.py, pkg_0/module_0.py"),
+        _step("read_file_range", "pkg_3/module_3.py | 1 | 20"),
+        _FINAL,
+    ],
+}
+
+
+class _ScriptedProvider(LLMProvider):
+    """Serves a ScriptedFakeChatModel per model name; the name selects the trace. Models are kept to count their calls."""
+
+    def __init__(self):
+        self.models = {}
+
+    def create_llm(self, model_name: str, llm_settings: dict) -> ScriptedFakeChatModel:
+        trace_name = model_name.rsplit("#", 1)[0]
+        self.models[model_name] = ScriptedFakeChatModel(steps=[{"response": step} for step in TRACES[trace_name]])
+        return self.models[model_name]
+
+
+def _write_workspace(root: str, files: int) -> None:
+    for index in range(files):
+        package = os.path.join(root, f"pkg_{index % 6}")
+        os.makedirs(package, exist_ok=True)
+        body = "".join(f"def helper_{index}_{line}(value):\n    return value * {line}\n\n" for line in range(40))
+        if index == 3:
+            body += "def target_function(value):\n    return helper_3_1(value)\n"
+        with open(os.path.join(package, f"module_{index}.py"), "w", encoding="utf-8") as f:
+            f.write(body)
+
+
+async def run(files: int) -> dict:
+    provider = LLM_PROVIDERS["SCRIPTED"] = _ScriptedProvider()
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        _write_workspace(workspace, files)
+        tool_settings = LLM_SETTINGS_CONFIG.setdefault("editing_tools", {})
+        LLM_SETTINGS_CONFIG["agent_traces"] = {"enabled": False}
+        tool_settings["workspace_root"] = workspace
+        for trace_name in TRACES:
+            for memoize in (False, True):
+                tool_settings["memoize"] = memoize
+                # A fresh model per run, so each replay starts at the first step of its trace.
+                model_name = f"{trace_name}#{memoize}"
+                result = await EditingService().aexecute("Find where target_function is defined.", model_override=f"SCRIPTED:{model_name}")
+                results[(trace_name, memoize)] = {**result["tool_stats"], "iterations": provider.models[model_name].calls}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=60)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.files))
+    print(f"{'trace':<12} {'memoize':<8} {'iterations':>10} {'tool calls':>10} {'bytes read':>11} {'cache hits':>10}")
+    for (trace_name, memoize), stats in results.items():
+        print(f"{trace_name:<12} {str(memoize):<8} {stats['iterations']:>10} {stats['tool_calls']:>10} "
+              f"{stats['bytes_read']:>11} {stats['cache_hits']:>10}")
+
+    basic_cold, basic_memo = results[("basic tools", False)], results[("basic tools", True)]
+    bulk_memo = results[("bulk tools", True)]
+    if basic_memo["bytes_read"] >= basic_cold["bytes_read"] or basic_memo["cache_hits"] == 0:
+        print("FAIL: memoisation did not avoid repeated reads.", file=sys.stderr)
+        sys.exit(1)
+    if bulk_memo["iterations"] >= basic_memo["iterations"]:
+        print("FAIL: the bulk tools did not reduce the number of agent iterations.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: memoisation avoids repeated reads and the bulk tools need fewer iterations.")
+
+
+if __name__ == "__main__":
+    main()
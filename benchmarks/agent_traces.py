@@ -0,0 +1,192 @@
+# benchmarks/agent_traces.py
+"""
+Benchmark of agent run traces and their offline replay.
+
+Runs EditingService with scripted chat models (one step every --delay seconds) under two versions of the
+`editing_agent` prompt: v1 (the current prompt, the scripted agent uses the bulk tools) and v2 (the bulk-tool
+guidance replaced by a longer paragraph, the scripted agent walks directory by directory, as agents without
+that guidance tend to). Every run is recorded to a temporary trace file. Then:
+
+- checks each record against the run: LLM calls, tool calls, token counts, rebuilt LLM inputs;
+- reports how much smaller the trace file is than one storing every LLM input in full;
+- replays the v1 runs offline with v1 (must reproduce them exactly, without the LLM latency) and with v2
+  (same steps, more prompt tokens and, at --prefill tokens/s, more simulated time);
+- replays a run whose recording is missing its last LLM output (must report 'diverged');
+- prints the comparison report of live runs by prompt version, which must show v2's extra iterations.
+
+Usage: python -m benchmarks.agent_traces [--runs 3] [--delay 0.02] [--prefill 500]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks.agent_tools import TRACES, _write_workspace
+from config.llm_providers import LLM_PROVIDERS, LLMProvider
+from config.prompt_loader import PROMPT_REGISTRY, PROMPTS_DIR
+from config.settings import LLM_SETTINGS_CONFIG
+from core.agent_traces import compare_traces, format_report, get_agent_trace_store, llm_inputs
+from core.fake_llm import ScriptedFakeChatModel
+from core.tokens import count_tokens
+from services.editing_service import EditingService
+
+INSTRUCTION = "Find where target_function is defined."
+V2_GUIDANCE = (
+    "Explore the project carefully before answering. Look at the directories one at a time, read each file "
+    "that may be relevant in full, and re-check any file you are unsure about. It is better to be thorough "
+    "than fast: a wrong answer costs much more than a few extra steps. Before you give your final answer, "
+    "list the directories you have not looked at yet and make sure none of them holds a better match. Quote "
+    "the lines you rely on, and say which files you read and which ones you skipped, and why.\n\n"
+)
+
+
+class _ScriptedProvider(LLMProvider):
+    """A ScriptedFakeChatModel per model name '<trace>#<run>'; models are kept to count their calls."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.models = {}
+
+    def create_llm(self, model_name: str, llm_settings: dict) -> ScriptedFakeChatModel:
+        trace_name = model_name.rsplit("#", 1)[0]
+        self.models[model_name] = ScriptedFakeChatModel(steps=[{"delay": self.delay, "response": step} for step in TRACES[trace_name]])
+        return self.models[model_name]
+
+
+def _write_prompt_version(prompts_dir: str, version: str) -> None:
+    path = os.path.join(prompts_dir, "editing_agent.md")
+    with open(os.path.join(PROMPTS_DIR, "editing_agent.md"), "r", encoding="utf-8") as f:
+        text = f.read()
+    if version == "v2":
+        start = text.index("Prefer the bulk tools")
+        text = text[:start] + V2_GUIDANCE + text[text.index("To change an existing file", start):]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    PROMPT_REGISTRY.load_all()
+
+
+async def _live_runs(provider: _ScriptedProvider, version: str, trace_name: str, runs: int) -> list:
+    results = []
+    for index in range(runs):
+        model_name = f"{trace_name}#{version}-{index}"
+        result = await EditingService().aexecute(INSTRUCTION, model_override=f"SCRIPTED:{model_name}")
+        results.append({"model_calls": provider.models[model_name].calls, "tool_stats": result["tool_stats"]})
+    return results
+
+
+def run(runs: int, delay: float, prefill: float) -> dict:
+    provider = LLM_PROVIDERS["SCRIPTED"] = _ScriptedProvider(delay)
+    original_prompts_dir = PROMPT_REGISTRY.prompts_dir
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace, tempfile.TemporaryDirectory() as scratch:
+        _write_workspace(workspace, 60)
+        LLM_SETTINGS_CONFIG.setdefault("editing_tools", {})["workspace_root"] = workspace
+        trace_path = os.path.join(scratch, "agent_traces.jsonl")
+        LLM_SETTINGS_CONFIG["agent_traces"] = {"enabled": True, "path": trace_path, "max_tool_output_chars": 20000}
+        prompts_dir = os.path.join(scratch, "prompts")
+        shutil.copytree(PROMPTS_DIR, prompts_dir)
+        PROMPT_REGISTRY.prompts_dir = prompts_dir
+        try:
+            _write_prompt_version(prompts_dir, "v1")
+            results["v1 runs"] = asyncio.run(_live_runs(provider, "v1", "bulk tools", runs))
+            _write_prompt_version(prompts_dir, "v2")
+            results["v2 runs"] = asyncio.run(_live_runs(provider, "v2", "basic tools", runs))
+            v2_prompt = PROMPT_REGISTRY.get("editing_agent")
+
+            records = list(get_agent_trace_store(trace_path).read())
+            results["records"] = records
+            results["trace_bytes"] = os.path.getsize(trace_path)
+            results["full_input_bytes"] = sum(
+                len(json.dumps(text, ensure_ascii=False)) - len(json.dumps(step["input"], ensure_ascii=False))
+                for record in records
+                for text, step in zip(llm_inputs(record), [step for step in record["steps"] if step["type"] == "llm"])
+            )
+
+            _write_prompt_version(prompts_dir, "v1")
+            service = EditingService()
+            v1_records = records[:runs]
+            results["replay v1"] = [service.replay(record) for record in v1_records]
+            results["replay v2"] = [service.replay(record, prompt=v2_prompt, prefill_tokens_per_second=prefill) for record in v1_records]
+            cut = dict(v1_records[0])
+            last_llm = max(index for index, step in enumerate(cut["steps"]) if step["type"] == "llm")
+            cut["steps"] = cut["steps"][:last_llm]
+            results["replay cut"] = service.replay(cut)
+        finally:
+            PROMPT_REGISTRY.prompts_dir = original_prompts_dir
+            PROMPT_REGISTRY.load_all()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Live runs per prompt version.")
+    parser.add_argument("--delay", type=float, default=0.02, help="Scripted LLM latency per step, in seconds.")
+    parser.add_argument("--prefill", type=float, default=500.0, help="Prompt tokens per second charged to replayed extra tokens.")
+    args = parser.parse_args()
+
+    real_stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            results = run(args.runs, args.delay, args.prefill)
+        finally:
+            sys.stdout = real_stdout
+
+    failures = []
+    records = results["records"]
+    live = results["v1 runs"] + results["v2 runs"]
+    if len(records) != len(live):
+        failures.append(f"every agent run should be recorded ({len(records)} records for {len(live)} runs)")
+    for record, run_result in zip(records, live):
+        inputs = llm_inputs(record)
+        llm_steps = [step for step in record["steps"] if step["type"] == "llm"]
+        if record["iterations"] != run_result["model_calls"] or record["tool_calls"] != run_result["tool_stats"]["tool_calls"]:
+            failures.append(f"run {record['run_id']} should record its {run_result['model_calls']} LLM calls and its tool calls")
+        if any(count_tokens(text) != step["prompt_tokens"] or INSTRUCTION not in text for text, step in zip(inputs, llm_steps)):
+            failures.append(f"the LLM inputs of run {record['run_id']} should be rebuilt exactly from the trace")
+        if record["status"] != "ok" or not record["files_written"] == [] or not record["output"]:
+            failures.append(f"run {record['run_id']} should be recorded as a successful run with its final answer")
+    compaction = (results["trace_bytes"] + results["full_input_bytes"]) / results["trace_bytes"]
+    print(f"{len(records)} runs recorded in {results['trace_bytes']} bytes; storing every LLM input in full would take {compaction:.1f}x as much")
+    if compaction < 2:
+        failures.append("storing LLM inputs as differences should at least halve the trace file")
+
+    v1_records = records[:args.runs]
+    for original, replayed in zip(v1_records, results["replay v1"]):
+        same = all(replayed[field] == original[field] for field in ("iterations", "tool_calls", "prompt_tokens", "completion_tokens", "output"))
+        if replayed["status"] != "ok" or not same or replayed["simulated_seconds"] != original["simulated_seconds"]:
+            failures.append(f"replaying run {original['run_id']} with its own prompt should reproduce it")
+        if replayed["wall_seconds"] >= original["wall_seconds"] / 2:
+            failures.append(f"replaying run {original['run_id']} should not wait for the LLM latency")
+    for original, replayed in zip(v1_records, results["replay v2"]):
+        if replayed["status"] != "ok" or replayed["iterations"] != original["iterations"] or replayed["prompt_tokens"] <= original["prompt_tokens"]:
+            failures.append(f"replaying run {original['run_id']} with the longer v2 prompt should take the same steps and more prompt tokens")
+        elif args.prefill > 0 and replayed["simulated_seconds"] <= original["simulated_seconds"]:
+            failures.append("the extra prompt tokens of a replay should add simulated time")
+    cut = results["replay cut"]
+    print(f"replay of a run missing its last LLM output: {cut['status']} ({cut['error']})")
+    if cut["status"] != "diverged":
+        failures.append("a replay that runs out of recorded LLM outputs should report 'diverged'")
+
+    print()
+    print("Live runs by prompt version (v1 first):")
+    live_rows = compare_traces(records, ("prompt_version",))
+    print(format_report(live_rows, ("prompt_version",)))
+    print()
+    print("v1 runs replayed with v1 and v2:")
+    print(format_report(compare_traces(v1_records + results["replay v1"] + results["replay v2"]), ("mode", "prompt_version")))
+    if len(live_rows) != 2 or live_rows[1]["iterations"] <= live_rows[0]["iterations"] or live_rows[1]["tool_calls"] <= live_rows[0]["tool_calls"]:
+        failures.append("the report should show the extra iterations and tool calls of the v2 prompt")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: agent runs are traced compactly, replay offline exactly, and the report compares prompt versions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# benchmarks/analysis_chunks.py
+"""
+Benchmark for chunked analysis of large source files.
+
+Generates a large Python file and analyses it with AnalysisService against a fake chat model whose latency
+grows with the prompt size and that rejects prompts larger than its context window, as real models do.
+With chunking off the whole file goes into one prompt; with it on, the file is split along top-level
+definitions and the chunks are analysed in parallel. One function in the file contains a marker the
+fake model flags, so the merged result must fail while the other chunks pass.
+
+Usage: python -m benchmarks.analysis_chunks [--functions 400] [--context-window 8000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from config.llm_providers import LLM_PROVIDERS, LLMProvider
+from config.settings import LLM_SETTINGS_CONFIG
+from core.tokens import count_tokens
+from services.analysis_service import AnalysisService
+
+_MARKER = "MAGIC_NUMBER_42"
+
+
+class _PromptSizedFakeChatModel(BaseChatModel):
+    """Waits `seconds_per_1k_tokens` per thousand prompt tokens; fails the check if the prompt contains the marker."""
+
+    seconds_per_1k_tokens: float = 0.05
+    context_window: int = 8000
+
+    @property
+    def _llm_type(self) -> str:
+        return "prompt-sized-fake"
+
+    def _answer(self, messages: List[BaseMessage]) -> tuple:
+        prompt = "\n".join(str(message.content) for message in messages)
+        tokens = count_tokens(prompt)
+        if tokens > self.context_window:
+            raise ValueError(f"Prompt of {tokens} tokens exceeds the context window of {self.context_window}.")
+        passed = _MARKER not in prompt
+        response = json.dumps({"analysis_markdown": "Magic number found." if not passed else "Looks clean.", "passed": passed})
+        return tokens / 1000 * self.seconds_per_1k_tokens, ChatResult(generations=[ChatGeneration(message=AIMessage(content=response))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        delay, result = self._answer(messages)
+        time.sleep(delay)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        delay, result = self._answer(messages)
+        await asyncio.sleep(delay)
+        return result
+
+
+class _PromptSizedProvider(LLMProvider):
+    """The model name is the context window, e.g. 'FAKE_SIZED:8000'."""
+
+    def create_llm(self, model_name: str, llm_settings: dict) -> BaseChatModel:
+        return _PromptSizedFakeChatModel(context_window=int(model_name))
+
+
+def _write_source(path: str, functions: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("import math\n\nRATE = 0.5\n\n")
+        for index in range(functions):
+            body = f"    return math.floor(value * RATE) + {_MARKER}\n" if index == functions // 2 else "    return math.floor(value * RATE)\n"
+            f.write(f"\ndef compute_{index}(value):\n    \"\"\"Scales the value.\"\"\"\n{body}\n")
+        f.write("\nclass Registry:\n    def register(self, name):\n        return name\n")
+
+
+async def _analyse(service: AnalysisService, path: str, model: str) -> tuple:
+    started = time.perf_counter()
+    try:
+        result = await service.aexecute(path, model_override=model)
+        return time.perf_counter() - started, result, None
+    except Exception as e:
+        return time.perf_counter() - started, None, e
+
+
+async def run(functions: int, context_window: int) -> dict:
+    LLM_PROVIDERS["FAKE_SIZED"] = _PromptSizedProvider()
+    model = f"FAKE_SIZED:{context_window}"
+    # Every run must reach the model.
+    cache_tasks = LLM_SETTINGS_CONFIG.setdefault("response_cache", {}).setdefault("tasks", {})
+    cache_tasks.setdefault("analysis", {})["enabled"] = False
+    pipeline_settings = LLM_SETTINGS_CONFIG.setdefault("analysis_pipeline", {})
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "large_module.py")
+        _write_source(path, functions)
+        with open(path, encoding="utf-8") as f:
+            results["file_tokens"] = count_tokens(f.read())
+        service = AnalysisService()
+
+        pipeline_settings.update({"chunk_threshold_tokens": 0})
+        results["whole, large window"] = await _analyse(service, path, "FAKE_SIZED:1000000")
+        results["whole"] = await _analyse(service, path, model)
+        pipeline_settings.update({"chunk_threshold_tokens": 6000, "chunk_token_budget": 3000, "max_concurrency": 8})
+        results["chunked"] = await _analyse(service, path, model)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--functions", type=int, default=400)
+    parser.add_argument("--context-window", type=int, default=8000)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.functions, args.context_window))
+    print(f"source file: {results['file_tokens']} tokens, model context window: {args.context_window} tokens")
+    for mode in ("whole, large window", "whole", "chunked"):
+        seconds, result, error = results[mode]
+        outcome = f"error: {error}" if error else f"{result['chunks']} chunk(s), passed={result['analysis']['passed']}"
+        print(f"{mode:<20} {seconds:>7.3f}s  {outcome}")
+
+    whole_seconds, _, _ = results["whole, large window"]
+    chunked_seconds, chunked, chunked_error = results["chunked"]
+    if chunked_error or results["whole"][2] is None:
+        print("FAIL: the chunked run should fit the context window that the whole file overflows.", file=sys.stderr)
+        sys.exit(1)
+    if chunked["chunks"] < 2 or chunked["analysis"]["passed"] or "Magic number found." not in chunked["analysis"]["analysis_markdown"]:
+        print("FAIL: the merged result should fail when one chunk fails, and keep that chunk's findings.", file=sys.stderr)
+        sys.exit(1)
+    if chunked_seconds >= whole_seconds:
+        print("FAIL: analysing the chunks in parallel should be faster than one whole-file prompt.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: large files are analysed in parallel chunks that fit the context window, and the results merge correctly.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/analysis_incremental.py
+"""
+Benchmark for directory analysis with changed-file detection.
+
+Analyses a generated project three times with AnalysisService in directory mode, against a fake delayed
+chat model: a cold run (every file is analysed, concurrently), an unchanged run (every result comes from
+the manifest, no LLM calls) and a run after editing a few files and deleting one (only the edited files
+are analysed again, and the deleted file leaves the report and the manifest).
+
+Usage: python -m benchmarks.analysis_incremental [--files 40] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from config.settings import LLM_SETTINGS_CONFIG
+from core.analysis_manifest import get_analysis_manifest
+from services.analysis_service import AnalysisService
+
+EDITED_FILES = 3
+
+
+def _write_project(root: str, files: int) -> None:
+    for index in range(files):
+        package = os.path.join(root, f"pkg_{index % 5}")
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f"module_{index}.py"), "w", encoding="utf-8") as f:
+            f.write(f"def handler_{index}(value):\n    return value * 2\n")
+
+
+async def _timed_run(service: AnalysisService, root: str, model: str) -> tuple:
+    started = time.perf_counter()
+    result = await service.aexecute(directory_path=root, model_override=model)
+    return time.perf_counter() - started, result["analysis"]
+
+
+async def run(files: int, delay: float) -> dict:
+    LLM_SETTINGS_CONFIG.setdefault("fake_provider", {}).setdefault("profiles", {})["bench_analysis"] = {
+        "time_to_first_token_seconds": delay, "tokens_per_second": 0,
+        "responses": [{"contains": "", "response": json.dumps({"analysis_markdown": "Looks clean.", "passed": True})}],
+    }
+    model = "FAKE:bench_analysis"
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        manifest_path = os.path.join(workspace, "manifest.sqlite3")
+        LLM_SETTINGS_CONFIG.setdefault("analysis_pipeline", {}).update({"manifest_path": manifest_path, "max_concurrency": 8})
+        # Every analysed file must reach the model.
+        LLM_SETTINGS_CONFIG.setdefault("response_cache", {}).setdefault("tasks", {}).setdefault("analysis", {})["enabled"] = False
+        root = os.path.join(workspace, "project")
+        _write_project(root, files)
+        service = AnalysisService()
+
+        results["cold"] = await _timed_run(service, root, model)
+        results["unchanged"] = await _timed_run(service, root, model)
+        for index in range(EDITED_FILES):
+            with open(os.path.join(root, f"pkg_{index % 5}", f"module_{index}.py"), "a", encoding="utf-8") as f:
+                f.write("\nLIMIT = 10\n")
+        os.remove(os.path.join(root, f"pkg_{(files - 1) % 5}", f"module_{files - 1}.py"))
+        results["edited"] = await _timed_run(service, root, model)
+        results["manifest_entries"] = len(get_analysis_manifest(manifest_path).load(os.path.realpath(root)))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--delay", type=float, default=0.2, help="Fake LLM latency in seconds.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.files, args.delay))
+    print(f"{'run':<10} {'seconds':>8} {'files':>6} {'analysed':>9} {'reused':>7} {'passed':>7}")
+    for name in ("cold", "unchanged", "edited"):
+        seconds, report = results[name]
+        summary = report["summary"]
+        print(f"{name:<10} {seconds:>8.3f} {summary['total']:>6} {summary['analysed']:>9} {summary['reused']:>7} {str(report['passed']):>7}")
+    print(f"sequential per-file calls would take about {args.files * args.delay:.1f}s")
+
+    cold_seconds, cold = results["cold"]
+    _, unchanged = results["unchanged"]
+    _, edited = results["edited"]
+    if cold["summary"]["analysed"] != args.files or cold_seconds > args.files * args.delay / 2:
+        print("FAIL: the cold run should analyse every file, concurrently.", file=sys.stderr)
+        sys.exit(1)
+    if unchanged["summary"]["analysed"] != 0:
+        print("FAIL: an unchanged directory should be served entirely from the manifest.", file=sys.stderr)
+        sys.exit(1)
+    if edited["summary"]["analysed"] != EDITED_FILES or edited["summary"]["total"] != args.files - 1 or results["manifest_entries"] != args.files - 1:
+        print("FAIL: only the edited files should be analysed again, and the deleted file should be forgotten.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: directory analysis runs files concurrently and re-analyses only what changed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# benchmarks/api_suite.py
+"""
+Offline benchmark suite for the API.
+
+Drives every task in TASK_REGISTRY through the FastAPI app (in process, over httpx's ASGI transport)
+against the FAKE provider, at several concurrency levels, and reports throughput, p50/p95/p99 latency
+and the peak RSS of the process after each run. No model server or API key is needed.
+
+Results are written as JSON (--output) so they can be kept and compared between revisions; with
+--baseline, a run whose p95 latency or throughput is more than --tolerance worse than the baseline
+for the same task and concurrency fails.
+
+Usage: python -m benchmarks.api_suite [--concurrency 1,4,16] [--requests 32] [--profile default]
+                                      [--output results.json] [--baseline previous.json] [--tolerance 0.25]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from api_main import TASK_REGISTRY, app
+from config.settings import LLM_SETTINGS_CONFIG
+
+
+def _task_payloads(workspace: str) -> dict:
+    """The request data each task is benchmarked with, against a small generated project."""
+    source_file = os.path.join(workspace, "app", "handlers.py")
+    os.makedirs(os.path.dirname(source_file), exist_ok=True)
+    with open(source_file, "w", encoding="utf-8") as f:
+        f.write("def handler(value):\n    return value * 2\n\n\nclass Store:\n    def __init__(self):\n        self.items = {}\n")
+    with open(os.path.join(workspace, "app", "main.py"), "w", encoding="utf-8") as f:
+        f.write("from app.handlers import handler\n\nprint(handler(21))\n")
+    return {
+        "planning": {"description": "Add a REST API endpoint that lists orders"},
+        "documentation": {"project_path": workspace},
+        "analysis": {"file_path": source_file},
+        "editing": {"instruction": "Explain what handler does without changing any file."},
+        "optimizer": {"raw_prompt": "write a poem about the sea"},
+    }
+
+
+def _configure(workspace: str, requests: int) -> None:
+    """Measures the service, not the caches, and keeps every file the run writes inside `workspace`."""
+    LLM_SETTINGS_CONFIG.setdefault("response_cache", {})["tasks"] = {}
+    # Concurrent requests of a run are identical; each should execute rather than share one execution.
+    LLM_SETTINGS_CONFIG["single_flight"] = {"enabled": False}
+    LLM_SETTINGS_CONFIG.setdefault("llm_client_cache", {})["warm_up"] = False
+    LLM_SETTINGS_CONFIG.setdefault("documentation_pipeline", {})["summary_cache_path"] = ""
+    LLM_SETTINGS_CONFIG.setdefault("analysis_pipeline", {})["manifest_path"] = ""
+    LLM_SETTINGS_CONFIG.setdefault("editing_tools", {})["workspace_root"] = workspace
+    LLM_SETTINGS_CONFIG["agent_traces"] = {"enabled": False}
+    # Queue in the service, not in front of the fake provider, and queue every request rather than reject some.
+    LLM_SETTINGS_CONFIG.setdefault("routing", {}).setdefault("providers", {})["FAKE"] = {"max_concurrency": requests}
+    admission = LLM_SETTINGS_CONFIG.setdefault("admission", {})
+    for task_settings in [admission, *(admission.get("tasks") or {}).values()]:
+        task_settings["max_queue"] = requests
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def _measure(client: httpx.AsyncClient, task_name: str, data: dict, model: str, concurrency: int, requests: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    async def one_request() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(f"/tasks/{task_name}", json={"model": model, "data": data})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors.append(f"{response.status_code}: {response.text[:200]}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "task": task_name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput_rps": round(requests / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2),
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def run(concurrency_levels: list, requests: int, profile: str) -> list:
+    model = f"FAKE:{profile}"
+    results = []
+    with tempfile.TemporaryDirectory() as workspace:
+        _configure(workspace, max(concurrency_levels))
+        payloads = _task_payloads(workspace)
+        missing = set(TASK_REGISTRY) - set(payloads)
+        if missing:
+            raise SystemExit(f"FAIL: no benchmark payload for task(s): {', '.join(sorted(missing))}.")
+
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for task_name in TASK_REGISTRY:
+                # One request first, so client creation and chain building are not part of the measurement.
+                await client.post(f"/tasks/{task_name}", json={"model": model, "data": payloads[task_name]})
+                for concurrency in concurrency_levels:
+                    results.append(await _measure(client, task_name, payloads[task_name], model, concurrency, requests))
+    return results
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Regressions of `results` against `baseline`: p95 latency or throughput worse than `tolerance` (a fraction)."""
+    previous = {(entry["task"], entry["concurrency"]): entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        before = previous.get((entry["task"], entry["concurrency"]))
+        if before is None:
+            continue
+        label = f"{entry['task']} @ {entry['concurrency']}"
+        if entry["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {before['latency_ms']['p95']}ms -> {entry['latency_ms']['p95']}ms")
+        if entry["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {before['throughput_rps']} -> {entry['throughput_rps']} req/s")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per task and concurrency level.")
+    parser.add_argument("--profile", default="default", help="FAKE provider profile (see fake_provider in llm_settings.yaml).")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against the JSON results of an earlier run.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+
+    # The services log every request; keep the report readable.
+    real_stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            results = asyncio.run(run(concurrency_levels, args.requests, args.profile))
+        finally:
+            sys.stdout = real_stdout
+
+    print(f"{'task':<14} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'rss MB':>8}")
+    for entry in results:
+        latency = entry["latency_ms"]
+        print(f"{entry['task']:<14} {entry['concurrency']:>5} {entry['throughput_rps']:>9.1f} {latency['p50']:>9.1f} "
+              f"{latency['p95']:>9.1f} {latency['p99']:>9.1f} {entry['errors']:>7} {entry['peak_rss_mb']:>8.1f}")
+
+    if args.output:
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "profile": args.profile,
+            "requests": args.requests,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    failed = [entry for entry in results if entry["errors"]]
+    if failed:
+        for entry in failed:
+            print(f"FAIL: {entry['task']} @ {entry['concurrency']}: {entry['errors']} failed requests, e.g. {entry['first_error']}", file=sys.stderr)
+        sys.exit(1)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        if regressions:
+            print("FAIL: regressions against the baseline:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+    print("OK: every task served all benchmark requests.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/async_load.py
+"""
+Load test for the async task endpoint.
+
+Fires N concurrent `/tasks/optimizer` requests against the FastAPI app, backed by a fake chat model
+that sleeps for a fixed delay. With a non-blocking execution path all requests overlap, so the batch
+finishes in roughly the time of a single request.
+
+Usage: python -m benchmarks.async_load [--requests 20] [--delay 0.5]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+from api_main import app
+from config.settings import LLM_SETTINGS_CONFIG
+
+
+async def _post_optimizer(client: httpx.AsyncClient, model: str, index: int) -> float:
+    started = time.perf_counter()
+    response = await client.post(
+        "/tasks/optimizer", json={"model": model, "data": {"raw_prompt": f"prompt #{index}"}}
+    )
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def run(requests: int, delay: float) -> tuple[float, float]:
+    LLM_SETTINGS_CONFIG.setdefault("fake_provider", {}).setdefault("profiles", {})["bench_async_load"] = {
+        "time_to_first_token_seconds": delay, "tokens_per_second": 0,
+        "responses": [{"contains": "", "response": "optimized prompt"}],
+    }
+    # Give the fake provider enough router slots that the per-provider limit does not queue the burst.
+    routing = LLM_SETTINGS_CONFIG.setdefault("routing", {})
+    routing.setdefault("providers", {})["FAKE"] = {"max_concurrency": requests}
+    model = "FAKE:bench_async_load"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        single = await _post_optimizer(client, model, 0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(_post_optimizer(client, model, i) for i in range(requests)))
+        concurrent = time.perf_counter() - started
+    return single, concurrent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.5, help="Fake LLM latency in seconds.")
+    args = parser.parse_args()
+
+    single, concurrent = asyncio.run(run(args.requests, args.delay))
+    print(f"1 request:            {single:.3f}s")
+    print(f"{args.requests} concurrent requests: {concurrent:.3f}s")
+
+    # Allow generous scheduling overhead; a blocking path would take ~requests * delay.
+    if concurrent > 2 * single:
+        print("FAIL: concurrent requests did not overlap.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: concurrent requests completed in roughly the time of one.")
+
+
+if __name__ == "__main__":
+    main()
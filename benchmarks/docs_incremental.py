@@ -0,0 +1,78 @@
+# benchmarks/docs_incremental.py
+"""
+Benchmark for the incremental map step of the documentation task.
+
+Generates a synthetic project, runs DocsService twice against a fake delayed chat model and reports
+how many files each run sent to the LLM. The second run over the unchanged tree must make zero map
+calls; after touching one file, only that file is summarised again.
+
+Usage: python -m benchmarks.docs_incremental [--files 200] [--delay 0.05]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from config.settings import LLM_SETTINGS_CONFIG
+from core.progress import progress_reporter
+from services.docs_service import DocsService
+
+
+def _write_project(root: str, files: int) -> None:
+    for index in range(files):
+        package = os.path.join(root, f"pkg_{index % 10}")
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f"module_{index}.py"), "w", encoding="utf-8") as f:
+            f.write(f"def function_{index}():\n    return {index}\n")
+
+
+async def _run_docs(project_path: str, model: str) -> tuple[float, dict]:
+    progress: dict = {}
+    started = time.perf_counter()
+    with progress_reporter(lambda fields: progress.update(fields) if fields.get("stage") == "map" else None):
+        await DocsService().aexecute(project_path, model_override=model)
+    return time.perf_counter() - started, progress
+
+
+async def run(files: int, delay: float) -> list[tuple[str, float, dict]]:
+    LLM_SETTINGS_CONFIG.setdefault("fake_provider", {}).setdefault("profiles", {})["bench_docs"] = {
+        "time_to_first_token_seconds": delay, "tokens_per_second": 0,
+        "responses": [{"contains": "", "response": json.dumps({"documentation_markdown": "# Project"})}],
+    }
+    model = "FAKE:bench_docs"
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        project_path = os.path.join(workdir, "project")
+        _write_project(project_path, files)
+        # Point the pipeline at a throwaway summary cache so the benchmark starts cold.
+        LLM_SETTINGS_CONFIG.setdefault("documentation_pipeline", {})["summary_cache_path"] = os.path.join(workdir, "summaries.sqlite3")
+
+        results.append(("cold run", *await _run_docs(project_path, model)))
+        results.append(("unchanged tree", *await _run_docs(project_path, model)))
+        with open(os.path.join(project_path, "pkg_0", "module_0.py"), "a", encoding="utf-8") as f:
+            f.write("# touched\n")
+        results.append(("one file changed", *await _run_docs(project_path, model)))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05, help="Fake LLM latency in seconds.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.files, args.delay))
+    for label, elapsed, progress in results:
+        print(f"{label:<18} {elapsed:7.3f}s  map calls: {progress['summarized']:>5}  reused: {progress['cached']:>5}")
+
+    if results[1][2]["summarized"] != 0 or results[2][2]["summarized"] != 1:
+        print("FAIL: unchanged files were summarised again.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: the unchanged tree made zero map calls.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/file_scan.py
+"""
+Benchmark of project scanning for the documentation task.
+
+Builds a synthetic tree (sources plus `node_modules`, `.git` and `venv` noise) and compares the legacy
+loader (one `DirectoryLoader` per glob pattern, as DocsService used to do) with the single-pass
+`iter_source_documents` walker. Reports wall time, peak traced memory and the number of documents.
+The walker is consumed one document at a time, the way the map step consumes it.
+
+Usage: python -m benchmarks.file_scan [--files 100000] [--skip-legacy]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+from core.file_discovery import iter_source_documents
+
+_EXTENSIONS = [".py", ".js", ".ts", ".rb", ".go", ".md", ".json", ".txt"]
+
+
+def build_tree(root: str, files: int) -> None:
+    """Spreads `files` files over sources (60%) and directories that should be pruned (40%)."""
+    noise_roots = ["node_modules", ".git/objects", "venv/lib"]
+    for index in range(files):
+        if index % 10 < 6:
+            directory = os.path.join(root, "src", f"pkg_{index % 50}", f"mod_{index % 7}")
+        else:
+            directory = os.path.join(root, noise_roots[index % 3], f"dep_{index % 200}")
+        os.makedirs(directory, exist_ok=True)
+        extension = _EXTENSIONS[index % len(_EXTENSIONS)]
+        with open(os.path.join(directory, f"file_{index}{extension}"), "w", encoding="utf-8") as f:
+            f.write(f"# file {index}\nvalue = {index}\n")
+
+
+def load_with_directory_loaders(root: str) -> int:
+    from langchain_community.document_loaders import DirectoryLoader, TextLoader
+
+    glob_patterns = ["**/*.py", "**/*.js", "**/*.ts", "**/*.rb", "**/*.go", "**/*.md"]
+    exclude_patterns = ["**/__pycache__/**", "**/.git/**", "**/venv/**"]
+    docs = []
+    for pattern in glob_patterns:
+        loader = DirectoryLoader(
+            root, glob=pattern, exclude=exclude_patterns, loader_cls=TextLoader,
+            recursive=True, show_progress=False, use_multithreading=True, silent_errors=True,
+        )
+        docs.extend(loader.load())
+    return len(docs)
+
+
+def load_with_walker(root: str) -> int:
+    count = 0
+    for _ in iter_source_documents(root):
+        count += 1
+    return count
+
+
+def measure(func: Callable[[str], int], root: str) -> tuple[float, float, int]:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = func(root)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024), count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only measure the single-pass walker.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Building a synthetic tree with {args.files} files...")
+        build_tree(root, args.files)
+
+        runs = [("single-pass walker", load_with_walker)]
+        if not args.skip_legacy:
+            runs.insert(0, ("DirectoryLoader x6", load_with_directory_loaders))
+        for label, func in runs:
+            elapsed, peak_mb, count = measure(func, root)
+            print(f"{label:<20} {elapsed:8.2f}s  peak {peak_mb:8.2f} MiB  {count} documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# benchmarks/patch_edits.py
+"""
+Benchmark for patch-based edits and staged, atomic commits in the editing agent.
+
+For a large file with a growing number of one-line edits, it compares the tokens an agent has to generate
+to rewrite the whole file with `write_file` against a unified diff and search/replace blocks for
+`apply_patch`, and checks that each patch produces exactly the intended file. It then replays a scripted
+agent run that patches two files (nothing is written until the run finishes), and injects a write failure
+into a multi-file commit to check that the files already written are rolled back.
+
+Usage: python -m benchmarks.patch_edits [--lines 600]
+"""
+import argparse
+import asyncio
+import difflib
+import os
+import sys
+import tempfile
+from unittest import mock
+
+from config.llm_providers import LLM_PROVIDERS, LLMProvider
+from config.settings import LLM_SETTINGS_CONFIG
+from core.fake_llm import ScriptedFakeChatModel
+from core.tokens import count_tokens
+from services.editing_service import EditingService
+from tools import patching
+from tools.tool_session import ToolSession
+
+EDIT_COUNTS = (1, 5, 20)
+
+
+def _original(lines: int) -> str:
+    return "".join(f"def handler_{number}(request):\n    return respond(request, code={number})\n\n" for number in range(lines // 3))
+
+
+def _edited(original: str, edits: int) -> str:
+    lines = original.splitlines(keepends=True)
+    step = len(lines) // edits
+    for index in range(edits):
+        number = index * step + 1  # a 'return ...' line
+        lines[number] = lines[number].replace("respond(", "respond_cached(")
+    return "".join(lines)
+
+
+def _unified_diff(path: str, original: str, edited: str) -> str:
+    return "".join(difflib.unified_diff(
+        original.splitlines(keepends=True), edited.splitlines(keepends=True), fromfile=f"a/{path}", tofile=f"b/{path}"
+    ))
+
+
+def _search_replace(path: str, original: str, edited: str) -> str:
+    blocks = []
+    matcher = difflib.SequenceMatcher(a=original.splitlines(), b=edited.splitlines(), autojunk=False)
+    old_lines, new_lines = matcher.a, matcher.b
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        # One line of context above keeps each SEARCH section unique.
+        search = old_lines[max(old_start - 1, 0):old_end]
+        replace = old_lines[max(old_start - 1, 0):old_start] + new_lines[new_start:new_end]
+        blocks.append("\n".join([path, "<<<<<<< SEARCH", *search, "=======", *replace, ">>>>>>> REPLACE"]))
+    return "\n".join(blocks)
+
+
+def _action(tool: str, action_input: str) -> str:
+    return f"Thought: I will make the change.\nAction: {tool}\nAction Input: {action_input}"
+
+
+def measure_tokens(lines: int) -> dict:
+    path = "app/handlers.py"
+    original = _original(lines)
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        os.makedirs(os.path.join(workspace, "app"))
+        with open(os.path.join(workspace, path), "w", encoding="utf-8") as f:
+            f.write(original)
+        for edits in EDIT_COUNTS:
+            edited = _edited(original, edits)
+            patches = {"unified diff": _unified_diff(path, original, edited), "search/replace": _search_replace(path, original, edited)}
+            for patch in patches.values():
+                session = ToolSession(root=workspace, stage_writes=True)
+                outcome = session.apply_patch(patch)
+                if session._read_text(path) != edited:
+                    raise AssertionError(f"The patch did not produce the intended file ({outcome}).")
+            results[edits] = {
+                "write_file": count_tokens(_action("write_file", f"{path}\n{edited}")),
+                **{name: count_tokens(_action("apply_patch", patch)) for name, patch in patches.items()},
+            }
+    return results
+
+
+class _ScriptedProvider(LLMProvider):
+    def __init__(self, steps):
+        self.steps = steps
+
+    def create_llm(self, model_name: str, llm_settings: dict) -> ScriptedFakeChatModel:
+        return ScriptedFakeChatModel(steps=[{"response": step} for step in self.steps])
+
+
+async def replay_staged_run() -> dict:
+    """An agent run that patches two files; returns what was on disk mid-run and after it."""
+    with tempfile.TemporaryDirectory() as workspace:
+        for name in ("a.py", "b.py"):
+            with open(os.path.join(workspace, name), "w", encoding="utf-8") as f:
+                f.write("VALUE = 1\n")
+        patch = "\n".join(
+            f"{name}\n<<<<<<< SEARCH\nVALUE = 1\n=======\nVALUE = 2\n>>>>>>> REPLACE" for name in ("a.py", "b.py")
+        )
+        seen_mid_run = {}
+        LLM_PROVIDERS["SCRIPTED_PATCH"] = _ScriptedProvider([
+            _action("apply_patch", patch),
+            _action("read_file", "a.py"),
+            "Thought: Done.\nFinal Answer: VALUE is now 2 in both files.",
+        ])
+        tool_settings = LLM_SETTINGS_CONFIG.setdefault("editing_tools", {})
+        LLM_SETTINGS_CONFIG["agent_traces"] = {"enabled": False}
+        tool_settings.update({"workspace_root": workspace, "staged_writes": True})
+        service = EditingService()
+        original_read = ToolSession.read_file
+
+        def read_and_check(session, file_path):
+            # The agent reads its own edit back; the disk must still hold the old content.
+            with open(os.path.join(workspace, file_path.strip()), encoding="utf-8") as f:
+                seen_mid_run["disk"] = f.read()
+            return original_read(session, file_path)
+
+        with mock.patch.object(ToolSession, "read_file", read_and_check):
+            result = await service.aexecute("Set VALUE to 2 everywhere.", model_override="SCRIPTED_PATCH:trace")
+        on_disk = {}
+        for name in ("a.py", "b.py"):
+            with open(os.path.join(workspace, name), encoding="utf-8") as f:
+                on_disk[name] = f.read()
+        return {"mid_run": seen_mid_run.get("disk"), "after": on_disk, "files_written": result["files_written"]}
+
+
+def check_rollback() -> bool:
+    """Stages three files and fails the third write; the first two must keep their old content."""
+    with tempfile.TemporaryDirectory() as workspace:
+        names = ("one.txt", "two.txt", "three.txt")
+        for name in names:
+            with open(os.path.join(workspace, name), "w", encoding="utf-8") as f:
+                f.write("old\n")
+        session = ToolSession(root=workspace, stage_writes=True)
+        for name in names:
+            session.write_file(name, "new\n")
+
+        real_write = patching._atomic_write
+
+        def failing_write(path, data):
+            if path.endswith("three.txt") and data == b"new\n":
+                raise OSError("disk full (injected)")
+            real_write(path, data)
+
+        with mock.patch.object(patching, "_atomic_write", failing_write):
+            try:
+                session.commit()
+                return False
+            except OSError:
+                pass
+        contents = []
+        for name in names:
+            with open(os.path.join(workspace, name), encoding="utf-8") as f:
+                contents.append(f.read())
+        leftovers = [name for name in os.listdir(workspace) if name.endswith(".tmp")]
+        return all(content == "old\n" for content in contents) and not leftovers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=600, help="Lines in the edited file.")
+    args = parser.parse_args()
+
+    tokens = measure_tokens(args.lines)
+    print(f"{'edits':>5} {'write_file':>11} {'unified diff':>13} {'search/replace':>15}   (generated tokens, {args.lines}-line file)")
+    for edits, counts in tokens.items():
+        print(f"{edits:>5} {counts['write_file']:>11} {counts['unified diff']:>13} {counts['search/replace']:>15}")
+
+    staged = asyncio.run(replay_staged_run())
+    print(f"staged run: on disk mid-run {staged['mid_run']!r}, files written {staged['files_written']}")
+    rolled_back = check_rollback()
+    print(f"rollback after an injected write failure: {'yes' if rolled_back else 'no'}")
+
+    smallest, largest = tokens[EDIT_COUNTS[0]], tokens[EDIT_COUNTS[-1]]
+    if any(smallest[name] * 10 > smallest["write_file"] for name in ("unified diff", "search/replace")):
+        print("FAIL: a one-line patch should cost a small fraction of rewriting the file.", file=sys.stderr)
+        sys.exit(1)
+    if largest["unified diff"] <= smallest["unified diff"] * 5:
+        print("FAIL: patch size should grow with the number of edits.", file=sys.stderr)
+        sys.exit(1)
+    if staged["mid_run"] != "VALUE = 1\n" or set(staged["after"].values()) != {"VALUE = 2\n"} or sorted(staged["files_written"]) != ["a.py", "b.py"]:
+        print("FAIL: staged edits should reach the disk together, only when the run finishes.", file=sys.stderr)
+        sys.exit(1)
+    if not rolled_back:
+        print("FAIL: a failed commit did not restore the files it had already written.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: patch edits cost tokens in proportion to the diff, and multi-file commits are atomic.")
+
+
+if __name__ == "__main__":
+    main()
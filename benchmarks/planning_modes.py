@@ -0,0 +1,76 @@
+# benchmarks/planning_modes.py
+"""
+Benchmark for the routing modes of the planning task.
+
+Runs PlanningService against a fake delayed chat model in each `planning_pipeline.routing_mode` and
+reports the end-to-end latency of a backend and a frontend feature. The classifier mode makes two
+sequential calls; keywords and speculative (on a backend route) should take about one call.
+
+Usage: python -m benchmarks.planning_modes [--delay 0.3] [--runs 5]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from config.settings import LLM_SETTINGS_CONFIG
+from services.planning_service import ROUTING_MODES, PlanningService
+
+FEATURES = {
+    # The fake model gives the same answer to every prompt, so each route gets a FAKE profile whose answer
+    # is the matching classification.
+    "backend": ("Add a REST API endpoint that exports invoices from the database as CSV", "bench_backend"),
+    "frontend": ("Add a dark mode toggle button to the settings page layout", "bench_frontend"),
+}
+
+
+async def _time_plan(service: PlanningService, description: str, model: str, runs: int) -> float:
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await service.aexecute(description, model_override=model)
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies)
+
+
+async def run(delay: float, runs: int) -> dict:
+    profiles = LLM_SETTINGS_CONFIG.setdefault("fake_provider", {}).setdefault("profiles", {})
+    for route, (_, profile) in FEATURES.items():
+        profiles[profile] = {
+            "time_to_first_token_seconds": delay, "tokens_per_second": 0, "responses": [{"contains": "", "response": f"{route} plan"}],
+        }
+
+    results = {}
+    for routing_mode in ROUTING_MODES:
+        LLM_SETTINGS_CONFIG.setdefault("planning_pipeline", {})["routing_mode"] = routing_mode
+        service = PlanningService()
+        for route, (description, profile) in FEATURES.items():
+            results[(routing_mode, route)] = await _time_plan(service, description, f"FAKE:{profile}", runs)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.3, help="Fake LLM latency in seconds.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.delay, args.runs))
+    print(f"{'mode':<12} {'backend':>9} {'frontend':>9}   (median of {args.runs}, LLM delay {args.delay}s)")
+    for routing_mode in ROUTING_MODES:
+        print(f"{routing_mode:<12} {results[(routing_mode, 'backend')]:>8.3f}s {results[(routing_mode, 'frontend')]:>8.3f}s")
+
+    # One LLM call plus generous overhead; the classifier mode needs two.
+    single_call = 1.5 * args.delay
+    if results[("keywords", "backend")] > single_call or results[("keywords", "frontend")] > single_call:
+        print("FAIL: keywords mode should take about one LLM call.", file=sys.stderr)
+        sys.exit(1)
+    if results[("speculative", "backend")] > single_call:
+        print("FAIL: speculative mode should take about one LLM call on a backend route.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: keywords and speculative routing remove the classifier round-trip from the critical path.")
+
+
+if __name__ == "__main__":
+    main()
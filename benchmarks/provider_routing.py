@@ -0,0 +1,120 @@
+# benchmarks/provider_routing.py
+"""
+Scenarios for the provider router, run against scripted fake chat models.
+
+- failover:    the primary always errors; every call is answered by the fallback, and after the
+               circuit opens the primary is no longer called.
+- timeout:     the primary hangs; calls fail over once `timeout_seconds` runs out.
+- hedging:     the primary is occasionally slow; hedging after a short threshold cuts the tail latency.
+- concurrency: many concurrent calls to one provider never exceed its slot limit.
+
+Usage: python -m benchmarks.provider_routing [--calls 40]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import List
+
+from core.fake_llm import ScriptedFakeChatModel
+from core.llm_router import CircuitBreaker, ProviderGate, ProviderRouter, ProviderSlots, RouteCandidate
+
+
+def _candidate(model_id: str, steps: List[dict], max_concurrency: int = 16, failure_threshold: int = 5) -> RouteCandidate:
+    gate = ProviderGate(
+        name=model_id.split(":", 1)[0],
+        slots=ProviderSlots(max_concurrency),
+        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_seconds=60),
+    )
+    return RouteCandidate(model_id, ScriptedFakeChatModel(steps=steps), gate)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def _timed_calls(router: ProviderRouter, calls: int, concurrent: bool = False) -> List[float]:
+    async def call(index: int) -> float:
+        started = time.perf_counter()
+        await router.ainvoke(f"prompt #{index}")
+        return time.perf_counter() - started
+
+    if concurrent:
+        return list(await asyncio.gather(*(call(index) for index in range(calls))))
+    return [await call(index) for index in range(calls)]
+
+
+async def failover(calls: int) -> bool:
+    primary = _candidate("PRIMARY:model", [{"delay": 0.01, "error": "connection refused"}], failure_threshold=5)
+    fallback = _candidate("FALLBACK:model", [{"delay": 0.01, "response": "ok"}])
+    router = ProviderRouter([primary, fallback])
+    await _timed_calls(router, calls)
+    print(f"failover:    {calls} calls answered; primary called {primary.llm.calls}x, fallback {fallback.llm.calls}x, "
+          f"primary circuit {primary.gate.breaker.state}")
+    return primary.llm.calls == 5 and fallback.llm.calls == calls and primary.gate.breaker.state == CircuitBreaker.OPEN
+
+
+async def timeout(calls: int) -> bool:
+    primary = _candidate("PRIMARY:model", [{"delay": 5, "response": "late"}], failure_threshold=calls + 1)
+    fallback = _candidate("FALLBACK:model", [{"delay": 0.01, "response": "ok"}])
+    router = ProviderRouter([primary, fallback], timeout_seconds=0.1)
+    latencies = await _timed_calls(router, min(calls, 5), concurrent=True)
+    print(f"timeout:     max latency {max(latencies):.3f}s with a 0.1s timeout and a primary that takes 5s")
+    return max(latencies) < 0.5
+
+
+async def hedging(calls: int) -> bool:
+    # One call in five takes 1s on the primary; the fallback is a little slower than a normal primary call.
+    steps = [{"delay": 1.0, "response": "slow"}] + [{"delay": 0.02, "response": "ok"}] * 4
+    results = {}
+    for hedge_after in (None, 0.1):
+        primary = _candidate("PRIMARY:model", steps)
+        fallback = _candidate("FALLBACK:model", [{"delay": 0.05, "response": "ok"}])
+        router = ProviderRouter([primary, fallback], hedge_after_seconds=hedge_after)
+        latencies = await _timed_calls(router, calls)
+        results[hedge_after] = latencies
+        print(f"hedging:     hedge_after={hedge_after}: p50 {statistics.median(latencies):.3f}s, "
+              f"p95 {_percentile(latencies, 0.95):.3f}s, fallback calls {fallback.llm.calls}")
+    return _percentile(results[0.1], 0.95) < _percentile(results[None], 0.95) / 2
+
+
+async def concurrency(calls: int) -> bool:
+    provider = _candidate("LOCAL:model", [{"delay": 0.05, "response": "ok"}], max_concurrency=4)
+    router = ProviderRouter([provider])
+    peak = 0
+
+    async def watch() -> None:
+        nonlocal peak
+        while True:
+            peak = max(peak, provider.gate.slots.stats()["in_use"])
+            await asyncio.sleep(0.005)
+
+    watcher = asyncio.create_task(watch())
+    started = time.perf_counter()
+    await _timed_calls(router, calls, concurrent=True)
+    elapsed = time.perf_counter() - started
+    watcher.cancel()
+    print(f"concurrency: {calls} concurrent calls, limit 4, peak in flight {peak}, {elapsed:.3f}s")
+    return peak <= 4
+
+
+async def run(calls: int) -> bool:
+    outcomes = [await scenario(calls) for scenario in (failover, timeout, hedging, concurrency)]
+    return all(outcomes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=40)
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args.calls)):
+        print("FAIL: at least one routing scenario did not behave as expected.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: failover, timeouts, hedging and per-provider limits behaved as expected.")
+
+
+if __name__ == "__main__":
+    main()
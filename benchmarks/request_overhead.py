@@ -0,0 +1,142 @@
+# benchmarks/request_overhead.py
+"""
+Microbenchmark of the per-request overhead of each task, excluding the LLM.
+
+Every task runs against a fake chat model that answers instantly, so what is measured is the work done
+around the model call. "before" builds a new service and all of its chains (model lookup, output parser,
+format instructions, prompt partials, runnable composition, agent executor) on every request, as the API
+used to; "after" reuses the singleton service and the chains cached by the CHAIN_FACTORY.
+
+Two numbers are reported per task: the setup (getting a service and its chains ready) and the whole
+request with the instant model. The setup is what the cache removes; the rest of the request is running
+the chain itself, which is the same in both modes, so whole-request numbers are noisier.
+
+Usage: python -m benchmarks.request_overhead [--requests 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from config.settings import LLM_SETTINGS_CONFIG
+from core.chain_factory import CHAIN_FACTORY
+from services.analysis_service import AnalysisService
+from services.docs_service import DocsService
+from services.editing_service import EditingService
+from services.optimizer_service import OptimizerService
+from services.planning_service import PlanningService
+
+
+# The method each service uses to get its chains ready for a request.
+_SETUP_METHODS = {
+    "optimizer": "_build_chain",
+    "planning": "_build_chain",
+    "analysis": "_build_chain",
+    "documentation": "_build_chains",
+    "editing": "_build_agent_executor",
+}
+
+
+def _tasks(workspace: str) -> dict:
+    """task name -> (service class, request kwargs, instant fake model answering in the task's format)."""
+    source_file = os.path.join(workspace, "module.py")
+    with open(source_file, "w", encoding="utf-8") as f:
+        f.write("def handler(value):\n    return value * 2\n")
+    answers = {
+        "bench_text": "An optimized prompt.",
+        "bench_analysis": json.dumps({"analysis_markdown": "Clean.", "passed": True}),
+        "bench_docs": json.dumps({"documentation_markdown": "# Docs"}),
+        "bench_agent": "Thought: Nothing to do.\nFinal Answer: Done.",
+    }
+    profiles = LLM_SETTINGS_CONFIG.setdefault("fake_provider", {}).setdefault("profiles", {})
+    for profile, answer in answers.items():
+        profiles[profile] = {"time_to_first_token_seconds": 0, "tokens_per_second": 0, "responses": [{"contains": "", "response": answer}]}
+    return {
+        "optimizer": (OptimizerService, {"raw_prompt": "write a poem"}, "FAKE:bench_text"),
+        "planning": (PlanningService, {"description": "Add a REST API endpoint"}, "FAKE:bench_text"),
+        "analysis": (AnalysisService, {"file_path": source_file}, "FAKE:bench_analysis"),
+        "documentation": (DocsService, {"project_path": workspace}, "FAKE:bench_docs"),
+        "editing": (EditingService, {"instruction": "Do nothing."}, "FAKE:bench_agent"),
+    }
+
+
+def _setup_us(task_name: str, service_class, model: str, requests: int, reuse: bool) -> float:
+    CHAIN_FACTORY.enabled = reuse
+    CHAIN_FACTORY.clear()
+    singleton = service_class()
+    getattr(singleton, _SETUP_METHODS[task_name])(model)  # warm up clients and prompts
+    durations = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        service = singleton if reuse else service_class()
+        getattr(service, _SETUP_METHODS[task_name])(model)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1e6
+
+
+async def _request_ms(service_class, kwargs: dict, model: str, requests: int, reuse: bool) -> float:
+    CHAIN_FACTORY.enabled = reuse
+    CHAIN_FACTORY.clear()
+    singleton = service_class()
+    await singleton.aexecute(model_override=model, **kwargs)
+    durations = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        service = singleton if reuse else service_class()
+        await service.aexecute(model_override=model, **kwargs)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+async def run(requests: int) -> dict:
+    # Measure the chains, not the response cache, and keep the runs quiet and self-contained.
+    LLM_SETTINGS_CONFIG.setdefault("response_cache", {})["tasks"] = {}
+    LLM_SETTINGS_CONFIG.setdefault("documentation_pipeline", {})["summary_cache_path"] = ""
+    LLM_SETTINGS_CONFIG.setdefault("planning_pipeline", {})["routing_mode"] = "keywords"
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        LLM_SETTINGS_CONFIG.setdefault("editing_tools", {})["workspace_root"] = workspace
+        LLM_SETTINGS_CONFIG["agent_traces"] = {"enabled": False}
+        for task_name, (service_class, kwargs, model) in _tasks(workspace).items():
+            results[task_name] = {
+                "setup": tuple(_setup_us(task_name, service_class, model, requests, reuse) for reuse in (False, True)),
+                "request": tuple([await _request_ms(service_class, kwargs, model, requests, reuse) for reuse in (False, True)]),
+            }
+    CHAIN_FACTORY.enabled = True
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    # The services log every request; keep the table readable.
+    real_stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            results = asyncio.run(run(args.requests))
+        finally:
+            sys.stdout = real_stdout
+
+    print(f"{'':<14} {'setup (us, median)':^26}   {'whole request (ms, median)':^26}")
+    print(f"{'task':<14} {'before':>8} {'after':>8} {'saved':>8}   {'before':>8} {'after':>8} {'saved':>8}")
+    for task_name, timings in results.items():
+        (setup_before, setup_after), (request_before, request_after) = timings["setup"], timings["request"]
+        print(f"{task_name:<14} {setup_before:>8.1f} {setup_after:>8.1f} {setup_before - setup_after:>8.1f}   "
+              f"{request_before:>8.3f} {request_after:>8.3f} {request_before - request_after:>8.3f}")
+
+    slower = [task_name for task_name, timings in results.items() if timings["setup"][1] >= timings["setup"][0]]
+    if slower:
+        print(f"FAIL: cached chains did not reduce the setup time of: {', '.join(slower)}.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: cached chains and singleton services cut the per-request setup of every task.")
+
+
+if __name__ == "__main__":
+    main()
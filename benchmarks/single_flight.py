@@ -0,0 +1,164 @@
+# benchmarks/single_flight.py
+"""
+Benchmark for single-flight deduplication of identical concurrent requests.
+
+Fires bursts of identical `/tasks/analysis` and `/tasks/documentation` requests against a slow FAKE model
+and counts the LLM calls actually made, with single-flight on and off. Also checks that a changed input file
+starts a new execution, that an error reaches every waiter, that cancelling one waiter leaves the shared work
+running for the others, and that the work is cancelled once every waiter is gone.
+
+Usage: python -m benchmarks.single_flight [--requests 8] [--delay 0.3]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from api_main import SINGLE_FLIGHT, app
+from config.settings import LLM_SETTINGS_CONFIG
+from core.llm_router import ROUTE_ATTEMPTS
+
+MODEL = "FAKE:bench_slow"
+
+
+def _llm_calls(outcome: str = "ok") -> int:
+    return int(ROUTE_ATTEMPTS.value(provider="FAKE", model=MODEL, outcome=outcome))
+
+
+def _configure(workspace: str, delay: float) -> None:
+    LLM_SETTINGS_CONFIG.setdefault("response_cache", {})["tasks"] = {}
+    LLM_SETTINGS_CONFIG.setdefault("llm_client_cache", {})["warm_up"] = False
+    LLM_SETTINGS_CONFIG.setdefault("documentation_pipeline", {})["summary_cache_path"] = ""
+    LLM_SETTINGS_CONFIG.setdefault("fake_provider", {}).setdefault("profiles", {})["bench_slow"] = {
+        "time_to_first_token_seconds": delay, "tokens_per_second": 0,
+    }
+    LLM_SETTINGS_CONFIG.setdefault("routing", {}).setdefault("providers", {})["FAKE"] = {"max_concurrency": 64}
+    LLM_SETTINGS_CONFIG["admission"] = {"enabled": False}
+    LLM_SETTINGS_CONFIG["single_flight"] = {"enabled": True}
+    for index in range(4):
+        with open(os.path.join(workspace, f"module_{index}.py"), "w", encoding="utf-8") as f:
+            f.write(f"def handler_{index}(value):\n    return value * {index}\n")
+
+
+async def _post(client: httpx.AsyncClient, task_name: str, data: dict) -> httpx.Response:
+    return await client.post(f"/tasks/{task_name}", json={"model": MODEL, "data": data})
+
+
+async def _burst(client: httpx.AsyncClient, task_name: str, data: dict, requests: int) -> dict:
+    calls_before = _llm_calls()
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(_post(client, task_name, data) for _ in range(requests)))
+    return {
+        "seconds": time.perf_counter() - started,
+        "llm_calls": _llm_calls() - calls_before,
+        "statuses": sorted({response.status_code for response in responses}),
+        "shared": sum(1 for response in responses if response.headers.get("X-Single-Flight") == "shared"),
+        "same_result": len({response.text for response in responses}) == 1,
+    }
+
+
+async def run(requests: int, delay: float) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        _configure(workspace, delay)
+        source_file = os.path.join(workspace, "module_0.py")
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            await _post(client, "optimizer", {"raw_prompt": "warm up"})
+            for enabled in (False, True):
+                LLM_SETTINGS_CONFIG["single_flight"]["enabled"] = enabled
+                label = "on" if enabled else "off"
+                results[f"analysis {label}"] = await _burst(client, "analysis", {"file_path": source_file}, requests)
+                results[f"documentation {label}"] = await _burst(client, "documentation", {"project_path": workspace}, requests)
+
+            # A request for the same file after it changed must not join the execution that read the old content.
+            calls_before = _llm_calls()
+            first = asyncio.ensure_future(_post(client, "analysis", {"file_path": source_file}))
+            await asyncio.sleep(delay / 3)
+            with open(source_file, "a", encoding="utf-8") as f:
+                f.write("\nLIMIT = 10\n")
+            second = await _post(client, "analysis", {"file_path": source_file})
+            await first
+            results["changed file"] = {"llm_calls": _llm_calls() - calls_before, "second": second.headers.get("X-Single-Flight")}
+
+            executions_before = SINGLE_FLIGHT.executions
+            missing = await asyncio.gather(*(_post(client, "analysis", {"file_path": os.path.join(workspace, "missing.py")}) for _ in range(requests)))
+            results["error"] = {
+                "statuses": sorted({response.status_code for response in missing}),
+                "executions": SINGLE_FLIGHT.executions - executions_before,
+            }
+
+            # Cancel one of three waiters: the other two still get the result of the one LLM call.
+            calls_before = _llm_calls()
+            waiters = [asyncio.ensure_future(_post(client, "analysis", {"file_path": source_file})) for _ in range(3)]
+            await asyncio.sleep(delay / 3)
+            waiters[0].cancel()
+            survivors = await asyncio.gather(*waiters[1:])
+            results["one cancelled"] = {"llm_calls": _llm_calls() - calls_before, "statuses": [response.status_code for response in survivors]}
+
+            # Cancel every waiter: the shared execution is abandoned and its LLM call cancelled.
+            abandoned_before, cancelled_before = SINGLE_FLIGHT.abandoned, _llm_calls("cancelled")
+            waiters = [asyncio.ensure_future(_post(client, "documentation", {"project_path": workspace})) for _ in range(2)]
+            await asyncio.sleep(delay / 3)
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            await asyncio.sleep(0.05)
+            results["all cancelled"] = {
+                "abandoned": SINGLE_FLIGHT.abandoned - abandoned_before,
+                "cancelled_llm_calls": _llm_calls("cancelled") - cancelled_before,
+                "in_flight": SINGLE_FLIGHT.stats()["in_flight"],
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=8, help="Identical concurrent requests per burst.")
+    parser.add_argument("--delay", type=float, default=0.3, help="Fake LLM latency in seconds.")
+    args = parser.parse_args()
+
+    real_stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            results = asyncio.run(run(args.requests, args.delay))
+        finally:
+            sys.stdout = real_stdout
+
+    print(f"{args.requests} identical concurrent requests per burst")
+    print(f"{'burst':<20} {'seconds':>8} {'LLM calls':>10} {'shared':>7} {'statuses':>10} {'same result':>12}")
+    for name in ("analysis off", "analysis on", "documentation off", "documentation on"):
+        burst = results[name]
+        print(f"{name:<20} {burst['seconds']:>8.3f} {burst['llm_calls']:>10} {burst['shared']:>7} {str(burst['statuses']):>10} {str(burst['same_result']):>12}")
+    for name in ("changed file", "error", "one cancelled", "all cancelled"):
+        print(f"{name:<20} {results[name]}")
+
+    failures = []
+    for task_name in ("analysis", "documentation"):
+        off, on = results[f"{task_name} off"], results[f"{task_name} on"]
+        if on["statuses"] != [200] or not on["same_result"] or on["shared"] != args.requests - 1:
+            failures.append(f"every {task_name} request should get the shared result")
+        if on["llm_calls"] * args.requests != off["llm_calls"]:
+            failures.append(f"identical {task_name} requests should make the LLM calls of a single request")
+    if results["changed file"]["llm_calls"] != 2 or results["changed file"]["second"] != "leader":
+        failures.append("a request for a changed file should start its own execution")
+    if results["error"] != {"statuses": [500], "executions": 1}:
+        failures.append("an error of the shared execution should reach every waiter")
+    if results["one cancelled"] != {"llm_calls": 1, "statuses": [200, 200]}:
+        failures.append("cancelling one waiter should not cancel the shared execution")
+    if results["all cancelled"]["abandoned"] != 1 or not results["all cancelled"]["cancelled_llm_calls"] or results["all cancelled"]["in_flight"]:
+        failures.append("the shared execution should be cancelled once every waiter is gone")
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: identical in-flight requests share one execution, its result and its errors.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/startup.py
+"""
+Benchmark of the API's cold start: import time, startup time, first request and peak memory.
+
+Each configuration runs in a fresh interpreter (a cold container), which imports `api_main`, runs the
+app's startup, serves one optimizer request against the FAKE provider and reports its peak RSS:
+
+- eager:          every task, all services imported at startup (`preload_services`), as the API used to;
+- lazy:           every task, services imported when first requested;
+- optimizer only: ENABLED_TASKS=optimizer, as a container that only serves the optimizer would run.
+
+With --importtime, the slowest imports of the optimizer-only start are listed (from `python -X importtime`).
+
+Usage: python -m benchmarks.startup [--runs 3] [--importtime]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURATIONS = {
+    "eager": {"ENABLED_TASKS": "", "preload": True},
+    "lazy": {"ENABLED_TASKS": "", "preload": False},
+    "optimizer only": {"ENABLED_TASKS": "optimizer", "preload": False},
+}
+
+
+def child(preload: bool) -> None:
+    """Runs inside the fresh interpreter and prints its measurements as JSON."""
+    started = time.perf_counter()
+    import asyncio
+    import resource
+
+    import httpx
+
+    from config.settings import LLM_SETTINGS_CONFIG
+    LLM_SETTINGS_CONFIG.setdefault("server", {})["preload_services"] = preload
+    LLM_SETTINGS_CONFIG.setdefault("response_cache", {})["tasks"] = {}
+    import api_main
+    imported = time.perf_counter()
+
+    async def serve() -> tuple:
+        async with api_main.app.router.lifespan_context(api_main.app):
+            ready = time.perf_counter()
+            transport = httpx.ASGITransport(app=api_main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                response = await client.post("/tasks/optimizer", json={"model": "FAKE:instant", "data": {"raw_prompt": "write a poem"}})
+                response.raise_for_status()
+            return ready, time.perf_counter()
+
+    real_stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            ready, answered = asyncio.run(serve())
+        finally:
+            sys.stdout = real_stdout
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "startup_ms": (ready - started) * 1000,
+        "first_request_ms": (answered - started) * 1000,
+        "peak_rss_mb": peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024,
+        "modules": len(sys.modules),
+    }))
+
+
+def _run_child(configuration: dict, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-m", "benchmarks.startup", "--child"]
+    if configuration["preload"]:
+        command.append("--preload")
+    env = {**os.environ, "ENABLED_TASKS": configuration["ENABLED_TASKS"]}
+    result = subprocess.run(command, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"FAIL: the startup run failed:\n{result.stderr[-2000:]}")
+    return result
+
+
+def _slowest_imports(stderr: str, count: int) -> list:
+    """(cumulative ms, module) of the slowest top-level imports in `python -X importtime` output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if not module.startswith("  "):  # only imports made directly by the program, not nested ones
+            imports.append((int(cumulative) / 1000, module.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per configuration; the median is reported.")
+    parser.add_argument("--importtime", action="store_true", help="List the slowest imports of the optimizer-only start.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--preload", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.preload)
+        return
+
+    results = {}
+    for name, configuration in CONFIGURATIONS.items():
+        runs = [json.loads(_run_child(configuration).stdout.strip().splitlines()[-1]) for _ in range(args.runs)]
+        results[name] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+    print(f"{'configuration':<16} {'import ms':>10} {'ready ms':>10} {'1st req ms':>11} {'peak RSS MB':>12} {'modules':>8}")
+    for name, result in results.items():
+        print(f"{name:<16} {result['import_ms']:>10.0f} {result['startup_ms']:>10.0f} {result['first_request_ms']:>11.0f} "
+              f"{result['peak_rss_mb']:>12.1f} {result['modules']:>8.0f}")
+
+    if args.importtime:
+        stderr = _run_child(CONFIGURATIONS["optimizer only"], importtime=True).stderr
+        print("\nslowest top-level imports (optimizer only):")
+        for milliseconds, module in _slowest_imports(stderr, 10):
+            print(f"  {milliseconds:>8.1f} ms  {module}")
+
+    eager, optimizer_only = results["eager"], results["optimizer only"]
+    if optimizer_only["startup_ms"] >= eager["startup_ms"] or optimizer_only["peak_rss_mb"] >= eager["peak_rss_mb"]:
+        print("FAIL: an optimizer-only server should start faster and use less memory than an eager one.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: lazily loaded services and the enabled task list cut startup time and memory.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/structured_output.py
+"""
+Benchmark for the structured-output layer of the analysis and documentation tasks.
+
+A FAKE model answers each analysis request with a different kind of malformed JSON (picked by a marker in
+the analysed file) and the documentation reduce step with fenced JSON and a trailing comma. The same requests
+run in three modes:
+
+- strict: no native JSON mode, no local repair, no re-asks (how answers were parsed before);
+- repair: the JSON block is cut out and repaired locally, then up to two re-asks;
+- native: as repair, with the provider's native JSON mode (the FAKE model then answers with valid JSON only).
+
+Reports the status, LLM calls and prompt tokens of every case, and the outcome counts per task.
+Checks that repair mode turns the malformed answers into results without extra LLM calls, that a re-ask sends
+much less than the original prompt, and that an answer that cannot be fixed fails after `max_reasks` re-asks.
+
+Usage: python -m benchmarks.structured_output
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import httpx
+
+from api_main import app
+from config.settings import LLM_SETTINGS_CONFIG
+from core.structured_output import STRUCTURED_OUTPUT_STATS
+
+MODEL = "FAKE:bench_malformed"
+MAX_REASKS = 2
+# Padding that makes the analysed files (and so the original prompts) large next to a re-ask prompt.
+_PADDING = "".join(f"def helper_{index}(value):\n    return value + {index}\n\n" for index in range(150))
+
+# Analysis cases: marker in the file -> the FAKE model's answer.
+CASES = {
+    "clean": None,
+    "fenced": 'Here is my review:\n```json\n{"analysis_markdown": "Names are clear.", "passed": true,}\n```\nLet me know if you need more.',
+    "python literals": "{'analysis_markdown': 'Functions are short.', 'passed': True}",
+    "truncated": '{"passed": False, "analysis_markdown": "## Review\\n- The helpers are short and well named',
+    "wrong schema": '{"review": "Looks fine.", "ok": true}',
+    "unfixable": "I cannot analyse this file.",
+}
+MODES = {
+    "strict": {"native_mode": False, "local_repair": False, "max_reasks": 0},
+    "repair": {"native_mode": False, "local_repair": True, "max_reasks": MAX_REASKS},
+    "native": {"native_mode": True, "local_repair": True, "max_reasks": MAX_REASKS},
+}
+
+
+def _marker(case: str) -> str:
+    return "CASE_" + case.upper().replace(" ", "_")
+
+
+def _configure(workspace: str) -> dict:
+    LLM_SETTINGS_CONFIG.setdefault("response_cache", {})["tasks"] = {}
+    LLM_SETTINGS_CONFIG.setdefault("llm_client_cache", {})["warm_up"] = False
+    LLM_SETTINGS_CONFIG.setdefault("documentation_pipeline", {})["summary_cache_path"] = ""
+    LLM_SETTINGS_CONFIG.setdefault("analysis_pipeline", {})["manifest_path"] = ""
+    LLM_SETTINGS_CONFIG["admission"] = {"enabled": False}
+    LLM_SETTINGS_CONFIG["single_flight"] = {"enabled": False}
+    responses = [{"contains": _marker(case), "response": answer} for case, answer in CASES.items() if answer is not None]
+    # The unfixable answer stays unfixable when it is sent back in a re-ask.
+    responses.append({"contains": CASES["unfixable"], "response": CASES["unfixable"]})
+    responses.append({
+        "contains": "cohesive and well-structured `README.md`",
+        "response": '```json\n{"documentation_markdown": "# Project\\n\\nHandlers for values.",}\n```',
+    })
+    LLM_SETTINGS_CONFIG.setdefault("fake_provider", {}).setdefault("profiles", {})["bench_malformed"] = {
+        "time_to_first_token_seconds": 0, "tokens_per_second": 0, "responses": responses,
+    }
+    files = {}
+    for case in CASES:
+        path = os.path.join(workspace, f"{case.replace(' ', '_')}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# {_marker(case)}\n{_PADDING}")
+        files[case] = path
+    docs_dir = os.path.join(workspace, "project")
+    os.makedirs(docs_dir)
+    with open(os.path.join(docs_dir, "handlers.py"), "w", encoding="utf-8") as f:
+        f.write("def handler(value):\n    return value * 2\n")
+    files["documentation"] = docs_dir
+    return files
+
+
+def _summary(response: httpx.Response) -> dict:
+    body = response.json()
+    timings = body.get("timings") or {}
+    return {
+        "status": response.status_code,
+        "llm_calls": timings.get("stages", {}).get("llm_call", {}).get("count", "-"),
+        "prompt_tokens": timings.get("tokens", {}).get("prompt", "-"),
+    }
+
+
+async def run() -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        files = _configure(workspace)
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for mode, settings in MODES.items():
+                LLM_SETTINGS_CONFIG["structured_output"] = dict(settings, reask_max_output_chars=8000)
+                before = STRUCTURED_OUTPUT_STATS.stats()
+                cases = {}
+                for case in CASES:
+                    response = await client.post("/tasks/analysis?timings=true", json={"model": MODEL, "data": {"file_path": files[case]}})
+                    cases[case] = _summary(response)
+                response = await client.post("/tasks/documentation?timings=true", json={"model": MODEL, "data": {"project_path": files["documentation"]}})
+                cases["documentation"] = _summary(response)
+                after = STRUCTURED_OUTPUT_STATS.stats()
+                outcomes = {
+                    task: {key: counts[key] - before.get(task, {}).get(key, 0) for key in ("parsed", "repaired", "reasked", "failed", "reasks")}
+                    for task, counts in after.items()
+                }
+                results[mode] = {"cases": cases, "outcomes": outcomes}
+    return results
+
+
+def main() -> None:
+    real_stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            results = asyncio.run(run())
+        finally:
+            sys.stdout = real_stdout
+
+    names = [*CASES, "documentation"]
+    print(f"{'case':<16} " + " ".join(f"{mode + ' status/calls/prompt tok':>30}" for mode in MODES))
+    for name in names:
+        cells = []
+        for mode in MODES:
+            case = results[mode]["cases"][name]
+            cell = f"{case['status']} / {case['llm_calls']} / {case['prompt_tokens']}"
+            cells.append(f"{cell:>30}")
+        print(f"{name:<16} " + " ".join(cells))
+    for mode in MODES:
+        print(f"{mode:<8} outcomes: {results[mode]['outcomes']}")
+
+    failures = []
+    strict, repair, native = (results[mode]["cases"] for mode in MODES)
+    if any(strict[case]["status"] != 500 for case in ("python literals", "wrong schema", "unfixable")) or strict["documentation"]["status"] != 500:
+        failures.append("the strict parser should reject the malformed answers (otherwise this benchmark measures nothing)")
+    for case in ("clean", "fenced", "python literals", "truncated"):
+        if repair[case]["status"] != 200 or repair[case]["llm_calls"] != 1:
+            failures.append(f"the '{case}' answer should be parsed or repaired locally, without another LLM call")
+    if repair["documentation"]["status"] != 200:
+        failures.append("the documentation reduce answer should be repaired locally")
+    wrong_schema = repair["wrong schema"]
+    if wrong_schema["status"] != 200 or wrong_schema["llm_calls"] != 2:
+        failures.append("an answer with the wrong schema should be fixed by a single re-ask")
+    elif wrong_schema["prompt_tokens"] > 1.5 * repair["clean"]["prompt_tokens"]:
+        failures.append("a re-ask should send the bad output and the error, not the original prompt again")
+    # The wrong-schema answer takes one re-ask, the unfixable one all of them.
+    if repair["unfixable"]["status"] != 500 or results["repair"]["outcomes"]["analysis"]["reasks"] != 1 + MAX_REASKS:
+        failures.append(f"an unfixable answer should fail after {MAX_REASKS} re-asks")
+    if any(native[case]["status"] != 200 for case in ("clean", "fenced", "truncated", "unfixable", "documentation")):
+        failures.append("in native JSON mode every answer that is valid JSON should be parsed")
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: malformed structured outputs are repaired locally first, and re-asks are bounded and small.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# benchmarks/workspace_index.py
+"""
+Benchmark of the workspace file index against walking and reading the filesystem on every request.
+
+Builds a large synthetic tree (sources, a `.gitignore`, ignored and `node_modules` noise, a few multi-MB
+files) and runs the same rounds of queries the tasks and editing tools make: the source listing of the
+documentation task, an editing-tool tree of the root, reads of every listed file and of the large files, and the
+directory fingerprint used by the incremental pipelines. Three ways:
+
+- walker: `core.file_discovery` (one walk and one read per query, as before);
+- inotify: a WorkspaceIndex kept current by inotify (Linux);
+- mtime: a WorkspaceIndex kept current by directory-mtime rescans.
+
+After the timed rounds, another process-like change (one file edited, one added in a new directory, one
+deleted, a pattern added to `.gitignore`) is made behind the index's back, and the next round must see it.
+Checks that every index answer equals the walker's, and that repeated rounds are much faster from the index.
+
+Usage: python -m benchmarks.workspace_index [--files 20000] [--rounds 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from core import file_discovery
+from core.file_discovery import DEFAULT_MAX_FILE_BYTES, DEFAULT_SOURCE_EXTENSIONS
+from core.workspace_index import WorkspaceIndex
+
+_EXTENSIONS = [".py", ".js", ".ts", ".go", ".md", ".json", ".txt", ".log"]
+LARGE_FILES = 4
+LARGE_FILE_BYTES = 2 * 1024 * 1024
+RESCAN_INTERVAL_SECONDS = 0.2
+
+
+def build_tree(root: str, files: int) -> list:
+    """Spreads `files` files over sources (70%), and ignored and excluded directories (30%); returns the large files."""
+    with open(os.path.join(root, ".gitignore"), "w", encoding="utf-8") as f:
+        f.write("*.log\ngenerated/\n")
+    noise_roots = ["node_modules", "generated", "src/generated"]
+    for index in range(files):
+        if index % 10 < 7:
+            directory = os.path.join(root, "src", f"pkg_{index % 40}", f"mod_{index % 9}")
+        else:
+            directory = os.path.join(root, noise_roots[index % 3], f"dep_{index % 100}")
+        os.makedirs(directory, exist_ok=True)
+        extension = _EXTENSIONS[index % len(_EXTENSIONS)]
+        with open(os.path.join(directory, f"file_{index}{extension}"), "w", encoding="utf-8") as f:
+            f.write(f"# file {index}\nvalue = {index}\n" + "def handler(value):\n    return value\n" * (index % 20))
+    large = []
+    for index in range(LARGE_FILES):
+        path = os.path.join(root, "src", f"pkg_{index}", f"large_{index}.py")
+        line = f"DATA_{index} = '{'x' * 70}'\n"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(line * (LARGE_FILE_BYTES // len(line)))
+        large.append(path)
+    return large
+
+
+class WalkerQueries:
+    """The queries answered by walking and reading the filesystem each time."""
+
+    def listing(self, root: str) -> list:
+        return list(file_discovery.iter_source_files(root, DEFAULT_SOURCE_EXTENSIONS, max_file_bytes=DEFAULT_MAX_FILE_BYTES))
+
+    def tree(self, root: str) -> list:
+        return list(file_discovery.iter_tree(root, max_depth=3))
+
+    def read(self, path: str) -> str:
+        return file_discovery.read_text_file(path)
+
+    def fingerprint(self, root: str) -> str:
+        return file_discovery.path_fingerprint(root)
+
+
+class IndexQueries:
+    """The same queries answered by a WorkspaceIndex."""
+
+    def __init__(self, root: str, watch: bool):
+        self.index = WorkspaceIndex(root, watch=watch, rescan_interval_seconds=RESCAN_INTERVAL_SECONDS)
+
+    def listing(self, root: str) -> list:
+        return [indexed.path for indexed in self.index.source_files(root, DEFAULT_SOURCE_EXTENSIONS, DEFAULT_MAX_FILE_BYTES)]
+
+    def tree(self, root: str) -> list:
+        return self.index.tree(root, 3)
+
+    def read(self, path: str) -> str:
+        return self.index.read_text(path)
+
+    def fingerprint(self, root: str) -> str:
+        return self.index.fingerprint(root)
+
+
+def run_round(queries, root: str, large: list) -> tuple:
+    """One round of queries; returns (seconds per query kind, answers)."""
+    seconds, answers = {}, {}
+    started = time.perf_counter()
+    answers["listing"] = queries.listing(root)
+    seconds["listing"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    answers["tree"] = queries.tree(root)
+    seconds["tree"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    answers["reads"] = [queries.read(path) for path in answers["listing"]]
+    seconds["reads"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    answers["large reads"] = [queries.read(path) for path in large]
+    seconds["large reads"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    answers["fingerprint"] = queries.fingerprint(root)
+    seconds["fingerprint"] = time.perf_counter() - started
+    return seconds, answers
+
+
+def change_tree(root: str) -> None:
+    """Edits, adds and deletes files and extends the .gitignore, the way another process would."""
+    with open(os.path.join(root, "src", "pkg_0", "mod_0", "file_0.py"), "a", encoding="utf-8") as f:
+        f.write("CHANGED = True\n")
+    os.makedirs(os.path.join(root, "src", "pkg_new", "sub"))
+    with open(os.path.join(root, "src", "pkg_new", "sub", "added.py"), "w", encoding="utf-8") as f:
+        f.write("ADDED = 1\n")
+    os.remove(os.path.join(root, "src", "pkg_1", "mod_1", "file_1.js"))
+    with open(os.path.join(root, ".gitignore"), "a", encoding="utf-8") as f:
+        f.write("pkg_2/\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds of queries after the first one.")
+    args = parser.parse_args()
+
+    real_stdout = sys.stdout
+    failures = []
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Building a synthetic tree with {args.files} files and {LARGE_FILES} files of {LARGE_FILE_BYTES >> 20} MiB...")
+        large = build_tree(root, args.files)
+
+        with open(os.devnull, "w") as devnull:
+            sys.stdout = devnull
+            try:
+                modes = {"walker": WalkerQueries(), "inotify": IndexQueries(root, watch=True), "mtime": IndexQueries(root, watch=False)}
+            finally:
+                sys.stdout = real_stdout
+        if modes["inotify"].index.stats()["watch"] != "inotify":
+            print("inotify is not available here; the 'inotify' run uses mtime scans too.")
+
+        timings = {}
+        for name, queries in modes.items():
+            first, expected = run_round(queries, root, large)
+            rounds = [run_round(queries, root, large) for _ in range(args.rounds)]
+            timings[name] = {"first": first, "repeated": {kind: min(seconds[kind] for seconds, _ in rounds) for kind in first}}
+            if name != "walker":
+                for kind, answer in rounds[-1][1].items():
+                    if answer != walker_answers[kind]:
+                        failures.append(f"the {name} index answers the '{kind}' query differently from the walker")
+            else:
+                walker_answers = expected
+
+        change_tree(root)
+        time.sleep(RESCAN_INTERVAL_SECONDS * 1.5)
+        after_change = {name: run_round(queries, root, large) for name, queries in modes.items()}
+        for name in ("inotify", "mtime"):
+            for kind, answer in after_change[name][1].items():
+                if answer != after_change["walker"][1][kind]:
+                    failures.append(f"after the tree changed, the {name} index answers the '{kind}' query differently from the walker")
+
+    kinds = list(timings["walker"]["first"])
+    listed = len(walker_answers["listing"])
+    print(f"{listed} source files listed and read per round; best of {args.rounds} repeated rounds (first round in brackets), ms")
+    print(f"{'mode':<10} " + " ".join(f"{kind:>24}" for kind in kinds) + f" {'after change':>14}")
+    for name in modes:
+        cells = [f"{timings[name]['repeated'][kind] * 1000:.1f} ({timings[name]['first'][kind] * 1000:.1f})" for kind in kinds]
+        changed = sum(after_change[name][0].values()) * 1000
+        print(f"{name:<10} " + " ".join(f"{cell:>24}" for cell in cells) + f" {changed:>14.1f}")
+    for name in ("inotify", "mtime"):
+        stats = modes[name].index.stats()
+        print(f"{name} index: {stats['files']} files, {stats['directories']} directories, {stats['full_scans']} full scan(s), "
+              f"{stats['mtime_scans']} mtime scan(s), {stats['directories_listed']} directory listings, "
+              f"{stats['mmap_reads']} mmap reads, text cache {stats['text_cache']}")
+
+    walker_total = sum(timings["walker"]["repeated"].values())
+    for name in ("inotify", "mtime"):
+        repeated = timings[name]["repeated"]
+        if sum(repeated.values()) * 2 > walker_total:
+            failures.append(f"repeated rounds from the {name} index should be at least 2x faster than walking the tree")
+        for kind in kinds:
+            if repeated[kind] > timings["walker"]["repeated"][kind]:
+                failures.append(f"the {name} index should answer the '{kind}' query faster than the walker")
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: the workspace index answers like the walker, sees external changes, and repeated queries are much faster.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,171 @@
-import os
 from abc import ABC, abstractmethod
+from typing import Any, Iterable, Type
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel
+
+from core.llm_router import ProviderRouter, RouteCandidate, get_provider_gate
+from core.lru import LRUCache
+from core.response_cache import with_response_cache
+from core.structured_output import structured_output_parser
+from config.settings import (
+    resolve_model_for_task,
+    get_llm_settings_for_task,
+    get_section_settings,
+    getenv,
+)
 
 class LLMProvider(ABC):
     @abstractmethod
     def create_llm(self, model_name: str, llm_settings: dict) -> BaseChatModel:
         pass
 
+    def bind_structured_output(self, llm: BaseChatModel, schema: Type[BaseModel]) -> Runnable:
+        """`llm` in the provider's native JSON or tool-calling mode, for answers validated against `schema`."""
+        return llm
+
 class OllamaProvider(LLMProvider):
     def create_llm(self, model_name: str, llm_settings: dict) -> BaseChatModel:
         from langchain_ollama import ChatOllama
-        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        base_url = getenv("OLLAMA_BASE_URL", "http://localhost:11434")
         return ChatOllama(model=model_name, base_url=base_url, **llm_settings)
 
+    def bind_structured_output(self, llm: BaseChatModel, schema: Type[BaseModel]) -> Runnable:
+        return llm.bind(format="json")
+
 class OpenAIProvider(LLMProvider):
     def create_llm(self, model_name: str, llm_settings: dict) -> BaseChatModel:
         from langchain_openai import ChatOpenAI
         return ChatOpenAI(model_name=model_name, **llm_settings)
 
+    def bind_structured_output(self, llm: BaseChatModel, schema: Type[BaseModel]) -> Runnable:
+        return llm.bind(response_format={"type": "json_object"})
+
 class GeminiProvider(LLMProvider):
     def create_llm(self, model_name: str, llm_settings: dict) -> BaseChatModel:
         from langchain_google_genai import ChatGoogleGenerativeAI
         return ChatGoogleGenerativeAI(model=model_name, convert_system_message_to_human=True, **llm_settings)
 
+    def bind_structured_output(self, llm: BaseChatModel, schema: Type[BaseModel]) -> Runnable:
+        return llm.bind_tools([schema], tool_choice=schema.__name__)
+
 class AnthropicProvider(LLMProvider):
     def create_llm(self, model_name: str, llm_settings: dict) -> BaseChatModel:
         from langchain_anthropic import ChatAnthropic
         return ChatAnthropic(model_name=model_name, **llm_settings)
 
+    def bind_structured_output(self, llm: BaseChatModel, schema: Type[BaseModel]) -> Runnable:
+        return llm.bind_tools([schema], tool_choice=schema.__name__)
+
+class FakeProvider(LLMProvider):
+    """
+    Offline, deterministic answers for benchmarks and local runs (see `fake_provider` in llm_settings.yaml).
+    The model name is a profile under `fake_provider.profiles`, or `default` for the section's own values.
+    """
+    def create_llm(self, model_name: str, llm_settings: dict) -> BaseChatModel:
+        from core.fake_llm import FakeChatModel
+        fake_settings = dict(get_section_settings("fake_provider"))
+        profiles = fake_settings.pop("profiles", None) or {}
+        if model_name != "default":
+            if model_name not in profiles:
+                raise ValueError(f"Unknown FAKE profile: '{model_name}'. Available: {['default', *profiles]}")
+            fake_settings.update(profiles[model_name])
+        return FakeChatModel(**fake_settings)
+
+    def bind_structured_output(self, llm: BaseChatModel, schema: Type[BaseModel]) -> Runnable:
+        return llm.bind(format="json")
+
 LLM_PROVIDERS: dict[str, LLMProvider] = {
     "OLLAMA": OllamaProvider(),
     "OPENAI": OpenAIProvider(),
     "GEMINI": GeminiProvider(),
     "ANTHROPIC": AnthropicProvider(),
+    "FAKE": FakeProvider(),
 }
 
+_client_cache_settings = get_section_settings("llm_client_cache")
+LLM_CLIENT_CACHE = LRUCache(max_size=int(_client_cache_settings.get("max_size", 16)), name="llm_clients")
+
+def freeze_settings(value: Any) -> Any:
+    """Turns nested settings (dicts, lists, sets) into a hashable, order-independent value."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze_settings(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_settings(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(freeze_settings(item) for item in value)
+    return value
+
 def get_llm_instance(provider: str, model_name: str, llm_settings: dict) -> BaseChatModel:
+    """
+    Returns a pooled chat model client for (provider, model_name, llm_settings).
+    Clients are created on first use and reused afterwards, so their HTTP connection pools survive across requests.
+    """
     provider_upper = provider.upper()
     if provider_upper not in LLM_PROVIDERS:
         raise ValueError(f"Unknown or unsupported provider: '{provider}'. Supported: {list(LLM_PROVIDERS.keys())}")
-    return LLM_PROVIDERS[provider_upper].create_llm(model_name, llm_settings)
+    cache_key = (provider_upper, model_name, freeze_settings(llm_settings))
+    return LLM_CLIENT_CACHE.get_or_create(
+        cache_key, lambda: LLM_PROVIDERS[provider_upper].create_llm(model_name, dict(llm_settings))
+    )
+
+def resolve_model_candidates(task_name: str, model_override: str | None = None) -> list[tuple[str, str]]:
+    """
+    The ordered (provider, model) candidates of a task: `routing.tasks.<task>.candidates` from llm_settings.yaml,
+    or the single model resolved from the environment. A model requested explicitly is the only candidate.
+    """
+    identifiers = [] if model_override else get_section_settings("routing", task_name).get("candidates") or []
+    if not identifiers:
+        return [resolve_model_for_task(task_name, model_override)]
+    return [resolve_model_for_task(task_name, identifier) for identifier in identifiers]
+
+def _candidate_llm(provider: str, model_name: str, llm_settings: dict, output_schema: Type[BaseModel] | None) -> Runnable:
+    llm = get_llm_instance(provider, model_name, llm_settings)
+    if output_schema is None:
+        return llm
+    return LLM_PROVIDERS[provider.upper()].bind_structured_output(llm, output_schema)
+
+def get_task_llm(task_name: str, model_override: str | None = None, output_schema: Type[BaseModel] | None = None) -> tuple[Runnable, str]:
+    """
+    Returns the LLM step for a task's chains and the identifier of its first candidate model.
+    Calls go through a ProviderRouter (per-provider concurrency limits, circuit breakers, failover and
+    optional hedging, see the `routing` section of llm_settings.yaml), behind the response cache when enabled.
+    With `output_schema`, each candidate that has a native JSON or tool-calling mode is called in it,
+    unless `structured_output.native_mode` is off for the task. Either way only answers that parse into
+    `output_schema` without a re-ask are kept by the response cache.
+    """
+    llm_settings = get_llm_settings_for_task(task_name)
+    native_schema = output_schema
+    if output_schema is not None and not get_section_settings("structured_output", task_name).get("native_mode", True):
+        native_schema = None
+    candidates = [
+        RouteCandidate(f"{provider}:{model_name}", _candidate_llm(provider, model_name, llm_settings, native_schema), get_provider_gate(provider))
+        for provider, model_name in resolve_model_candidates(task_name, model_override)
+    ]
+    routing_settings = get_section_settings("routing", task_name)
+    router = ProviderRouter(
+        candidates,
+        timeout_seconds=float(routing_settings.get("timeout_seconds") or 0),
+        hedge_after_seconds=float(routing_settings.get("hedge_after_seconds") or 0),
+    )
+    model_used = candidates[0].model_id
+    accept = None
+    if output_schema is not None:
+        validator = structured_output_parser(output_schema, None, task_name)
+        accept = lambda text: validator.parse(text)[0] is not None
+    return with_response_cache(router, task_name, model_used, llm_settings, accept=accept), model_used
+
+def warm_up_llm_cache(task_names: Iterable[str]) -> list[str]:
+    """
+    Pre-builds the clients for the candidate models of each task (routing candidates, or DEFAULT_MODEL_NAME / <TASK>_MODEL_IDENTIFIER).
+    A client that cannot be built (missing SDK or API key) is reported and skipped; it will fail again on first use.
+    """
+    warmed = []
+    for task_name in task_names:
+        try:
+            for provider, model_name in resolve_model_candidates(task_name):
+                get_llm_instance(provider, model_name, get_llm_settings_for_task(task_name))
+                warmed.append(f"{task_name}={provider}:{model_name}")
+        except Exception as e:
+            print(f"WARNING: Could not warm up the LLM client for task '{task_name}': {e}")
+    return warmed
@@ -1,11 +1,183 @@
 import os
+import threading
+from typing import Dict, Iterable, Optional, Set
 from langchain_core.prompts import ChatPromptTemplate
 
+# Prompts are resolved from the project root, not the current working directory.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPTS_DIR = os.path.join(PROJECT_ROOT, "prompts")
+
+class PromptRegistry:
+    """
+    Loads and compiles every `<name>.md` template in a directory once, then serves them from memory.
+    Templates can be checked against the input variables their services provide, and the directory
+    can be polled so edited templates are picked up without a restart.
+    """
+
+    def __init__(self, prompts_dir: str):
+        self.prompts_dir = prompts_dir
+        self._templates: Dict[str, ChatPromptTemplate] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._expected_variables: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self.lookups = 0
+        # Bumped whenever the set of compiled templates changes, so cached chains built from them can be told apart.
+        self.version = 0
+        self.reloads = 0
+        self.reload_failures = 0
+
+    def expect_variables(self, expected: Dict[str, Iterable[str]]) -> None:
+        """
+        Declares, per template name, the exact input variables the using service fills in.
+        Templates that are already loaded are checked right away; raises ValueError listing every mismatch.
+        """
+        with self._lock:
+            for name, variables in expected.items():
+                self._expected_variables[name] = set(variables)
+            if not self._loaded:
+                return
+            errors = []
+            for name in expected:
+                template = self._templates.get(name)
+                if template is None:
+                    errors.append(f"Prompt file not found for task '{name}' at '{self._path_for(name)}'.")
+                    continue
+                try:
+                    self._check_variables(name, template)
+                except ValueError as e:
+                    errors.append(str(e))
+        if errors:
+            raise ValueError("Invalid prompt templates:\n" + "\n".join(errors))
+
+    def load_all(self) -> None:
+        """Compiles every template. Raises ValueError listing all templates that fail validation."""
+        templates, mtimes, errors = {}, {}, []
+        files = self._template_files()
+        for name, path in files.items():
+            try:
+                templates[name] = self._compile(name, path)
+                mtimes[name] = os.path.getmtime(path)
+            except ValueError as e:
+                errors.append(str(e))
+        missing = sorted(set(self._expected_variables) - set(files))
+        errors.extend(f"Prompt file not found for task '{name}' at '{self._path_for(name)}'." for name in missing)
+        if errors:
+            raise ValueError("Invalid prompt templates:\n" + "\n".join(errors))
+        with self._lock:
+            self._templates, self._mtimes, self._loaded = templates, mtimes, True
+            self.version += 1
+
+    def get(self, name: str) -> ChatPromptTemplate:
+        if not self._loaded:
+            self.load_all()
+        with self._lock:
+            self.lookups += 1
+            template = self._templates.get(name)
+        if template is None:
+            raise ValueError(f"Prompt file not found for task '{name}' at '{self._path_for(name)}'.")
+        return template
+
+    def reload_changed(self) -> int:
+        """Recompiles templates whose file changed, was added or was removed. Returns how many were reloaded."""
+        reloaded = 0
+        files = self._template_files()
+        for name, path in files.items():
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if self._mtimes.get(name) == mtime:
+                continue
+            try:
+                template = self._compile(name, path)
+            except ValueError as e:
+                # Keep serving the last good version of the template.
+                print(f"WARNING: Not reloading prompt '{name}': {e}")
+                self.reload_failures += 1
+                self._mtimes[name] = mtime
+                continue
+            with self._lock:
+                self._templates[name] = template
+                self._mtimes[name] = mtime
+                self.reloads += 1
+                self.version += 1
+            reloaded += 1
+            print(f"INFO: Reloaded prompt template '{name}'.")
+        for name in set(self._mtimes) - set(files):
+            if name in self._expected_variables:
+                continue  # A service still needs it; keep the last loaded version.
+            with self._lock:
+                self._templates.pop(name, None)
+                self._mtimes.pop(name, None)
+                self.version += 1
+        return reloaded
+
+    def start_watching(self, interval_seconds: float = 2.0) -> None:
+        """Polls the prompts directory in a daemon thread and reloads changed templates."""
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+
+        def watch() -> None:
+            while not self._stop_watching.wait(interval_seconds):
+                try:
+                    self.reload_changed()
+                except Exception as e:
+                    print(f"WARNING: Prompt reload failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="prompt-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "templates": len(self._templates),
+                "lookups": self.lookups,
+                "reloads": self.reloads,
+                "reload_failures": self.reload_failures,
+                "version": self.version,
+                "watching": self._watcher is not None,
+            }
+
+    def _compile(self, name: str, path: str) -> ChatPromptTemplate:
+        with open(path, 'r', encoding='utf-8') as f:
+            template = ChatPromptTemplate.from_template(f.read())
+        self._check_variables(name, template)
+        return template
+
+    def _check_variables(self, name: str, template: ChatPromptTemplate) -> None:
+        expected = self._expected_variables.get(name)
+        if expected is not None:
+            actual = set(template.input_variables)
+            if actual != expected:
+                raise ValueError(
+                    f"Prompt '{name}' uses variables {sorted(actual)}, but its service provides {sorted(expected)}."
+                )
+
+    def _template_files(self) -> Dict[str, str]:
+        try:
+            names = os.listdir(self.prompts_dir)
+        except FileNotFoundError:
+            return {}
+        return {
+            os.path.splitext(file_name)[0]: os.path.join(self.prompts_dir, file_name)
+            for file_name in names
+            if file_name.endswith(".md")
+        }
+
+    def _path_for(self, name: str) -> str:
+        return os.path.join(self.prompts_dir, f"{name}.md")
+
+PROMPT_REGISTRY = PromptRegistry(PROMPTS_DIR)
+
 def get_prompt_template_for_task(task_name: str) -> ChatPromptTemplate:
-    file_path = os.path.join("prompts", f"{task_name}.md")
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            prompt_text = f.read()
-        return ChatPromptTemplate.from_template(prompt_text)
-    except FileNotFoundError:
-        raise ValueError(f"Prompt file not found for task '{task_name}' at '{file_path}'.")
+    return PROMPT_REGISTRY.get(task_name)
@@ -1,28 +1,61 @@
+import functools
 import os
-import yaml
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS_PATH = os.path.join(PROJECT_ROOT, "config", "llm_settings.yaml")
 
 def _load_yaml_config(file_path: str) -> dict:
+    import yaml
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+            # libyaml's loader, when PyYAML was built with it, parses the settings several times faster.
+            return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
     except FileNotFoundError:
         return {}
     except Exception as e:
         raise IOError(f"Error loading or parsing YAML file {file_path}: {e}")
 
-LLM_SETTINGS_CONFIG = _load_yaml_config("config/llm_settings.yaml")
+@functools.lru_cache(maxsize=None)
+def load_settings() -> dict:
+    """
+    The settings of llm_settings.yaml, read (with the .env file) on the first call rather than at import,
+    so processes that never look at them do not pay for parsing. Every call returns the same dict:
+    changes made to it in place are seen by every reader.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    return _load_yaml_config(SETTINGS_PATH) or {}
+
+def __getattr__(name: str):
+    # `LLM_SETTINGS_CONFIG` is the dict of `load_settings()`, loaded when it is first imported.
+    if name == "LLM_SETTINGS_CONFIG":
+        return load_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def getenv(name: str, default: str | None = None) -> str | None:
+    """`os.getenv`, after the variables of the .env file have been loaded."""
+    load_settings()
+    return os.getenv(name, default)
 
 def get_llm_settings_for_task(task_name: str) -> dict:
-    default_settings = LLM_SETTINGS_CONFIG.get("default", {})
-    task_settings = LLM_SETTINGS_CONFIG.get("tasks", {}).get(task_name, {})
+    settings = load_settings()
+    default_settings = settings.get("default", {})
+    task_settings = settings.get("tasks", {}).get(task_name, {})
     final_settings = default_settings.copy()
     final_settings.update(task_settings)
     return final_settings
 
+def get_section_settings(section: str, task_name: str | None = None) -> dict:
+    """
+    Returns the settings of a top-level section of llm_settings.yaml (e.g. 'llm_client_cache'),
+    with the entries under `<section>.tasks.<task_name>` layered on top when a task is given.
+    """
+    section_config = load_settings().get(section) or {}
+    final_settings = {key: value for key, value in section_config.items() if key != "tasks"}
+    if task_name:
+        final_settings.update((section_config.get("tasks") or {}).get(task_name) or {})
+    return final_settings
+
 def resolve_model_for_task(task_name: str, requested_model_identifier: str | None = None) -> tuple[str, str]:
     if requested_model_identifier:
         try:
@@ -32,7 +65,7 @@ def resolve_model_for_task(task_name: str, requested_model_identifier: str | Non
             raise ValueError("Invalid model identifier format in request.")
 
     task_specific_env_var = f"{task_name.upper()}_MODEL_IDENTIFIER"
-    task_specific_identifier = os.getenv(task_specific_env_var)
+    task_specific_identifier = getenv(task_specific_env_var)
     if task_specific_identifier:
         try:
             provider, model_name = task_specific_identifier.split(":", 1)
@@ -40,6 +73,6 @@ def resolve_model_for_task(task_name: str, requested_model_identifier: str | Non
         except ValueError:
             raise ValueError(f"Invalid identifier format in env var {task_specific_env_var}.")
 
-    provider = os.getenv("DEFAULT_PROVIDER", "OLLAMA")
-    model_name = os.getenv("DEFAULT_MODEL_NAME", "llama3:8b")
+    provider = getenv("DEFAULT_PROVIDER", "OLLAMA")
+    model_name = getenv("DEFAULT_MODEL_NAME", "llama3:8b")
     return provider, model_name
@@ -0,0 +1,145 @@
+# core/admission.py
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from core.exceptions import AdmissionRejectedError
+from core.metrics import METRICS
+from config.settings import get_section_settings
+
+ADMISSION_REJECTIONS = METRICS.counter(
+    "ai_task_admission_rejections_total", "Task requests rejected by admission control, by reason (queue_full, queue_timeout).", ["task", "reason"]
+)
+
+# Weight of the latest request in the running average of how long a task holds its slot.
+_HOLD_TIME_SMOOTHING = 0.2
+
+
+class TaskAdmission:
+    """
+    Admission control of one task on the event loop: at most `max_concurrency` requests run at once and
+    up to `max_queue` more wait for a slot in FIFO order. A request arriving at a full queue is rejected
+    at once (429); one that waits longer than `max_queue_wait_seconds` is rejected too (503). Both carry
+    a Retry-After estimate from the average time a request holds its slot.
+    """
+
+    def __init__(self, task_name: str, max_concurrency: int, max_queue: int, max_queue_wait_seconds: Optional[float] = None):
+        if max_concurrency < 1:
+            raise ValueError(f"Task '{task_name}' needs a concurrency limit of at least 1, got {max_concurrency}.")
+        self.task_name = task_name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max(max_queue, 0)
+        self.max_queue_wait_seconds = max_queue_wait_seconds or None
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.average_hold_seconds = 1.0
+        self._waiters: deque = deque()
+
+    def retry_after_seconds(self) -> int:
+        """Seconds until the requests ahead of a new one would have drained, by the average hold time."""
+        ahead = self.running + len(self._waiters)
+        return max(1, math.ceil(self.average_hold_seconds * ahead / self.max_concurrency))
+
+    def _reject(self, reason: str, status_code: int, message: str) -> AdmissionRejectedError:
+        self.rejected += 1
+        ADMISSION_REJECTIONS.inc(task=self.task_name, reason=reason)
+        return AdmissionRejectedError(message, status_code=status_code, retry_after_seconds=self.retry_after_seconds())
+
+    async def acquire(self) -> float:
+        """Waits for a slot and returns the seconds spent in the queue, or raises AdmissionRejectedError."""
+        if self.running < self.max_concurrency and not self._waiters:
+            self.running += 1
+            self.admitted += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(
+                "queue_full", 429,
+                f"Task '{self.task_name}' is at capacity ({self.running} running, {len(self._waiters)} queued); retry later.",
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_queue_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                # The slot was handed over just as the wait ended; pass it on.
+                self.release()
+            else:
+                future.cancel()
+                self._waiters.remove(future)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(
+                "queue_timeout", 503,
+                f"Task '{self.task_name}' did not get a slot within {self.max_queue_wait_seconds}s; retry later.",
+            )
+        self.admitted += 1
+        return time.monotonic() - started
+
+    def release(self, held_seconds: Optional[float] = None) -> None:
+        """Frees a slot, handing it straight to the first waiter; `held_seconds` feeds the Retry-After estimate."""
+        if held_seconds is not None:
+            self.average_hold_seconds += _HOLD_TIME_SMOOTHING * (held_seconds - self.average_hold_seconds)
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.running -= 1
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[float]:
+        """Holds a slot for the duration of the block; yields the seconds spent in the queue."""
+        queue_wait = await self.acquire()
+        started = time.monotonic()
+        try:
+            yield queue_wait
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "average_hold_seconds": round(self.average_hold_seconds, 3),
+        }
+
+
+_TASK_ADMISSIONS: Dict[str, TaskAdmission] = {}
+_admissions_lock = threading.Lock()
+
+
+def get_task_admission(task_name: str) -> Optional[TaskAdmission]:
+    """
+    Returns the process-wide admission control of a task, sized from the `admission` section of
+    llm_settings.yaml, or None when admission control is disabled.
+    """
+    with _admissions_lock:
+        admission = _TASK_ADMISSIONS.get(task_name)
+        if admission is None:
+            settings = get_section_settings("admission", task_name)
+            if not settings.get("enabled", True):
+                return None
+            admission = TaskAdmission(
+                task_name,
+                max_concurrency=int(settings.get("max_concurrency", 8)),
+                max_queue=int(settings.get("max_queue", 32)),
+                max_queue_wait_seconds=float(settings.get("max_queue_wait_seconds") or 0),
+            )
+            _TASK_ADMISSIONS[task_name] = admission
+        return admission
+
+
+def task_admission_stats() -> dict:
+    with _admissions_lock:
+        admissions = dict(_TASK_ADMISSIONS)
+    return {task_name: admission.stats() for task_name, admission in admissions.items()}
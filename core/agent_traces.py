@@ -0,0 +1,383 @@
+# core/agent_traces.py
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult, LLMResult
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.tools import BaseTool, StructuredTool
+from pydantic import PrivateAttr
+
+from config.settings import get_section_settings
+from core.instrumentation import _token_usage
+from core.metrics import METRICS
+from core.tokens import count_tokens
+
+# Bumped when the layout of a trace record changes incompatibly.
+TRACE_FORMAT_VERSION = 1
+# Tools the AgentExecutor runs itself: an unparsable LLM output, and an action naming a tool that does not exist.
+PARSING_ERROR_TOOL = "_Exception"
+INVALID_TOOL = "invalid_tool"
+
+AGENT_TRACES = METRICS.counter("ai_agent_traces_total", "Agent runs written to the trace file, by outcome.", ["task", "status"])
+
+
+class TraceReplayError(RuntimeError):
+    """Raised when a replayed agent asks for an LLM call the recorded run did not make."""
+
+
+def prompt_version(template: ChatPromptTemplate) -> str:
+    """A short hash of the template text, which tells apart runs made with different versions of a prompt."""
+    text = "\n".join(getattr(getattr(message, "prompt", None), "template", "") for message in template.messages)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _message_text(messages: Sequence[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+def _output_text(output: Any) -> str:
+    return str(getattr(output, "content", output))
+
+
+class AgentTraceRecorder(BaseCallbackHandler):
+    """
+    Collects the steps of one agent run from its callbacks: each LLM call (input, output, token counts,
+    latency) and each tool call (tool, input, output, latency), in the order they finished.
+
+    A ReAct prompt only grows by the scratchpad from one call to the next, so each LLM input is stored as the
+    text after the part it shares with the previous input (`input_offset` characters); `llm_inputs` rebuilds
+    the full inputs. Tool outputs longer than `max_tool_output_chars` (0 = no limit) are cut, which a replay
+    reports. `finish` returns the run's record.
+    """
+
+    # Run inline on the event loop, so steps are recorded in order.
+    run_inline = True
+
+    def __init__(self, task_name: str, model: str, instruction: str, prompt_version: str,
+                 max_tool_output_chars: int = 0, mode: str = "live"):
+        self.record: Dict[str, Any] = {
+            "format": TRACE_FORMAT_VERSION,
+            "run_id": uuid.uuid4().hex,
+            "mode": mode,
+            "task": task_name,
+            "model": model,
+            "prompt_version": prompt_version,
+            "instruction": instruction,
+            "started_at": round(time.time(), 3),
+        }
+        self.max_tool_output_chars = max_tool_output_chars
+        self.steps: List[Dict[str, Any]] = []
+        self._pending: Dict[UUID, Tuple[float, Dict[str, Any]]] = {}
+        self._last_input = ""
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    # LLM calls
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start_llm(run_id, _message_text(messages[0]) if messages else "")
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start_llm(run_id, prompts[0] if prompts else "")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        step = self._finish_step(run_id)
+        if step is None:
+            return
+        output = response.generations[0][0].text if response.generations and response.generations[0] else ""
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if not (prompt_tokens or completion_tokens):
+            prompt_tokens, completion_tokens = step.pop("_prompt_tokens"), count_tokens(output)
+        step.pop("_prompt_tokens", None)
+        step.update(output=output, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        step = self._finish_step(run_id)
+        if step is not None:
+            step.pop("_prompt_tokens", None)
+            step.update(output="", prompt_tokens=0, completion_tokens=0, error=f"{type(error).__name__}: {error}")
+
+    # Tools
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or ""
+        self._start(run_id, {"type": "tool", "tool": name, "input": input_str})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        step = self._finish_step(run_id)
+        if step is None:
+            return
+        text = _output_text(output)
+        step["output_chars"] = len(text)
+        if 0 < self.max_tool_output_chars < len(text):
+            text = text[:self.max_tool_output_chars]
+            step["output_truncated"] = True
+        step["output"] = text
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        step = self._finish_step(run_id)
+        if step is not None:
+            step.update(output="", output_chars=0, error=f"{type(error).__name__}: {error}")
+
+    def _start_llm(self, run_id: UUID, text: str) -> None:
+        with self._lock:
+            offset = len(os.path.commonprefix([self._last_input, text]))
+            self._last_input = text
+        self._start(run_id, {"type": "llm", "input_offset": offset, "input": text[offset:], "_prompt_tokens": count_tokens(text)})
+
+    def _start(self, run_id: UUID, step: Dict[str, Any]) -> None:
+        with self._lock:
+            self._pending[run_id] = (time.perf_counter(), step)
+
+    def _finish_step(self, run_id: UUID) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+            if pending is None:
+                return None
+            started, step = pending
+            step["seconds"] = round(time.perf_counter() - started, 4)
+            self.steps.append(step)
+        return step
+
+    def use_recorded_latencies(self, trace: Dict[str, Any], prefill_tokens_per_second: float = 0.0) -> None:
+        """
+        Gives each step of a replay the latency of the step it replays, so replays can be compared in simulated
+        wall time. With `prefill_tokens_per_second`, an LLM call is also charged (or credited) the prompt tokens
+        it sends beyond (or below) the recorded call's.
+        """
+        for kind in ("llm", "tool"):
+            recorded = [step for step in trace.get("steps", []) if step["type"] == kind]
+            replayed = [step for step in self.steps if step["type"] == kind]
+            for step, original in zip(replayed, recorded):
+                seconds = original.get("seconds", 0.0)
+                if kind == "llm" and prefill_tokens_per_second > 0:
+                    seconds += (step.get("prompt_tokens", 0) - original.get("prompt_tokens", 0)) / prefill_tokens_per_second
+                step["seconds"] = round(max(seconds, 0.0), 4)
+
+    def finish(self, status: str, output: Optional[str] = None, error: Optional[str] = None, **extra: Any) -> Dict[str, Any]:
+        """The run's record: metadata, outcome, totals and steps."""
+        with self._lock:
+            steps = list(self.steps)
+        llm_steps = [step for step in steps if step["type"] == "llm"]
+        tool_steps = [step for step in steps if step["type"] == "tool"]
+        record = dict(self.record)
+        record.update(
+            status=status,
+            wall_seconds=round(time.perf_counter() - self._started, 4),
+            simulated_seconds=round(sum(step.get("seconds", 0.0) for step in steps), 4),
+            iterations=len(llm_steps),
+            tool_calls=sum(1 for step in tool_steps if step["tool"] not in (PARSING_ERROR_TOOL, INVALID_TOOL)),
+            parsing_errors=sum(1 for step in tool_steps if step["tool"] == PARSING_ERROR_TOOL),
+            invalid_tool_calls=sum(1 for step in tool_steps if step["tool"] == INVALID_TOOL),
+            prompt_tokens=sum(step.get("prompt_tokens", 0) for step in llm_steps),
+            completion_tokens=sum(step.get("completion_tokens", 0) for step in llm_steps),
+            output=output,
+            error=error,
+            **extra,
+        )
+        record["steps"] = steps
+        return record
+
+
+def llm_inputs(trace: Dict[str, Any]) -> List[str]:
+    """The full input of every LLM call of a recorded run, rebuilt from the stored differences."""
+    inputs, previous = [], ""
+    for step in trace.get("steps", []):
+        if step["type"] == "llm":
+            previous = previous[:step.get("input_offset", 0)] + step.get("input", "")
+            inputs.append(previous)
+    return inputs
+
+
+# --- Trace file ---
+class AgentTraceStore:
+    """An append-only JSONL file with one compact record per agent run."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.appended = 0
+
+    def append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.appended += 1
+
+    def read(self, task_name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """The records in the order they were written; a line cut short (e.g. by a crash) is skipped."""
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if task_name is None or record.get("task") == task_name:
+                    yield record
+
+
+_trace_stores: Dict[str, AgentTraceStore] = {}
+_trace_stores_lock = threading.Lock()
+
+
+def get_agent_trace_store(path: Optional[str] = None) -> AgentTraceStore:
+    """The process-wide store for `path` (default: `agent_traces.path`), so concurrent runs append through one lock."""
+    path = path or get_section_settings("agent_traces").get("path", ".data/agent_traces.jsonl")
+    with _trace_stores_lock:
+        if path not in _trace_stores:
+            _trace_stores[path] = AgentTraceStore(path)
+        return _trace_stores[path]
+
+
+def agent_trace_recorder(task_name: str, model: str, instruction: str, template: ChatPromptTemplate) -> Optional[AgentTraceRecorder]:
+    """A recorder for a new run of the task's agent, or None when `agent_traces` is disabled for the task."""
+    settings = get_section_settings("agent_traces", task_name)
+    if not settings.get("enabled", True):
+        return None
+    return AgentTraceRecorder(
+        task_name, model, instruction, prompt_version(template), max_tool_output_chars=int(settings.get("max_tool_output_chars", 0))
+    )
+
+
+def write_agent_trace(record: Dict[str, Any]) -> None:
+    """Appends a finished run to the trace file. A failed write is logged: it never fails the run itself."""
+    try:
+        get_agent_trace_store().append(record)
+    except OSError as e:
+        print(f"WARNING: Could not write the trace of agent run {record.get('run_id')}: {e}")
+        return
+    AGENT_TRACES.inc(task=record.get("task", "unknown"), status=record.get("status", "unknown"))
+
+
+# --- Replay ---
+class ReplayChatModel(BaseChatModel):
+    """
+    Answers with the LLM outputs of a recorded run, in order, without any network I/O. Prompt tokens are
+    counted on the prompt actually sent (so a changed prompt shows up); completion tokens are the recorded ones.
+    Raises TraceReplayError when asked for more calls than the run made.
+    """
+
+    outputs: List[str]
+    completion_tokens: List[int] = []
+    _next: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def from_trace(cls, trace: Dict[str, Any]) -> "ReplayChatModel":
+        steps = [step for step in trace.get("steps", []) if step["type"] == "llm" and "error" not in step]
+        return cls(outputs=[step["output"] for step in steps], completion_tokens=[step.get("completion_tokens", 0) for step in steps])
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        with self._lock:
+            index = self._next
+            self._next += 1
+        if index >= len(self.outputs):
+            raise TraceReplayError(f"The replayed agent made LLM call #{index + 1}; the recorded run made {len(self.outputs)}.")
+        text = self.outputs[index]
+        prompt_tokens = count_tokens(_message_text(messages))
+        completion_tokens = self.completion_tokens[index] if index < len(self.completion_tokens) else count_tokens(text)
+        usage = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+
+class RecordedToolOutputs:
+    """
+    The outputs of a recorded run's tool calls, handed out in call order, so a replay needs no workspace.
+    A call to another tool than the recorded one at that position is counted in `divergences`.
+    """
+
+    def __init__(self, trace: Dict[str, Any]):
+        self._steps = [
+            step for step in trace.get("steps", [])
+            if step["type"] == "tool" and step["tool"] not in (PARSING_ERROR_TOOL, INVALID_TOOL)
+        ]
+        self.truncated = sum(1 for step in self._steps if step.get("output_truncated"))
+        self.divergences = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def call(self, name: str) -> str:
+        with self._lock:
+            index = self._next
+            self._next += 1
+            if index >= len(self._steps) or self._steps[index]["tool"] != name:
+                self.divergences += 1
+                return f"Error: the recorded run made no '{name}' call at this step."
+            step = self._steps[index]
+        return step.get("error") or step.get("output", "")
+
+    def tools(self, templates: Iterable[BaseTool]) -> List[BaseTool]:
+        """Tools with the names, descriptions and arguments of `templates` that answer from the recording."""
+        def answer(name: str):
+            # Typed like the live tools' functions: the signature is part of the tool description in the prompt.
+            def run(*args, **kwargs) -> str:
+                return self.call(name)
+            return run
+        return [
+            StructuredTool.from_function(func=answer(template.name), name=template.name, description=template.description, args_schema=template.args_schema)
+            for template in templates
+        ]
+
+
+# --- Comparison report ---
+_REPORT_FIELDS = ("iterations", "tool_calls", "parsing_errors", "prompt_tokens", "completion_tokens", "simulated_seconds", "wall_seconds")
+
+
+def compare_traces(records: Iterable[Dict[str, Any]], group_by: Sequence[str] = ("mode", "prompt_version")) -> List[Dict[str, Any]]:
+    """
+    Per group of runs (by default: live or replay, and prompt version), in order of first appearance: the
+    number of runs and failures, and the mean iterations, tool calls, parsing errors, tokens and seconds.
+    `simulated_seconds` adds up the LLM and tool latencies of the steps (for replays, the recorded ones).
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(tuple(record.get(field) for field in group_by), []).append(record)
+    rows = []
+    for key, runs in groups.items():
+        row: Dict[str, Any] = dict(zip(group_by, key))
+        row["runs"] = len(runs)
+        row["failed"] = sum(1 for run in runs if run.get("status") != "ok")
+        for field in _REPORT_FIELDS:
+            row[field] = round(sum(run.get(field) or 0 for run in runs) / len(runs), 4)
+        rows.append(row)
+    return rows
+
+
+def format_report(rows: List[Dict[str, Any]], group_by: Sequence[str] = ("mode", "prompt_version"), baseline: int = 0) -> str:
+    """`compare_traces` rows as a table; every other row also shows its change against row `baseline`."""
+    if not rows:
+        return "No agent runs recorded."
+    columns = ["runs", "failed", *_REPORT_FIELDS]
+    widths = {column: max(len(column), 16) for column in columns}
+    group_width = max(len(" / ".join(str(row[field]) for field in group_by)) for row in rows) + 2
+    lines = [f"{' / '.join(group_by):<{group_width}}" + " ".join(f"{column:>{widths[column]}}" for column in columns)]
+    base = rows[baseline] if 0 <= baseline < len(rows) else None
+    for index, row in enumerate(rows):
+        cells = []
+        for column in columns:
+            value = row[column]
+            cell = f"{value:.2f}" if isinstance(value, float) else str(value)
+            if base is not None and index != baseline and column in _REPORT_FIELDS and base[column]:
+                cell += f" ({(value - base[column]) / base[column]:+.0%})"
+            cells.append(f"{cell:>{widths[column]}}")
+        lines.append(f"{' / '.join(str(row[field]) for field in group_by):<{group_width}}" + " ".join(cells))
+    return "\n".join(lines)
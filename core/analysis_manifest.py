@@ -0,0 +1,48 @@
+# core/analysis_manifest.py
+import time
+from typing import Dict, Iterable, Tuple
+
+from core.sqlite_store import SQLiteStore, StoreRegistry
+
+
+class AnalysisManifest:
+    """
+    Per-directory record of the last analysis of each file, stored in SQLite: the file's content key
+    (a hash of its content and of everything else that shapes the result) and the result as JSON.
+    A file whose key is unchanged since the last run does not need to be analysed again.
+    """
+
+    def __init__(self, sqlite_path: str):
+        self.sqlite_path = sqlite_path
+        self._store = SQLiteStore(sqlite_path, [
+            "CREATE TABLE IF NOT EXISTS files ("
+            "root TEXT NOT NULL, path TEXT NOT NULL, content_key TEXT NOT NULL, result TEXT NOT NULL, "
+            "analysed_at REAL NOT NULL, PRIMARY KEY (root, path))"
+        ])
+
+    def load(self, root: str) -> Dict[str, Tuple[str, str]]:
+        """{relative path: (content key, result JSON)} for every file recorded under `root`."""
+        with self._store.connection() as connection:
+            rows = connection.execute("SELECT path, content_key, result FROM files WHERE root = ?", (root,))
+            return {path: (content_key, result) for path, content_key, result in rows.fetchall()}
+
+    def put(self, root: str, path: str, content_key: str, result: str) -> None:
+        with self._store.connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO files (root, path, content_key, result, analysed_at) VALUES (?, ?, ?, ?, ?)",
+                (root, path, content_key, result, time.time()),
+            )
+            connection.commit()
+
+    def prune(self, root: str, paths: Iterable[str]) -> None:
+        """Forgets files under `root` that are no longer there."""
+        with self._store.connection() as connection:
+            connection.executemany("DELETE FROM files WHERE root = ? AND path = ?", [(root, path) for path in paths])
+            connection.commit()
+
+
+_manifests = StoreRegistry(AnalysisManifest)
+
+def get_analysis_manifest(sqlite_path: str) -> AnalysisManifest:
+    """Returns the process-wide AnalysisManifest for `sqlite_path`, so all requests share one connection."""
+    return _manifests.get(sqlite_path)
@@ -0,0 +1,58 @@
+# core/chain_factory.py
+from typing import Any, Callable, Iterable, Optional
+
+from core.lru import LRUCache
+from config.llm_providers import freeze_settings, resolve_model_candidates
+from config.prompt_loader import PROMPT_REGISTRY
+from config.settings import get_llm_settings_for_task, get_section_settings
+
+# Settings sections read while a task's LLM step is built (see `get_task_llm`).
+_LLM_SECTIONS = ("routing", "response_cache", "structured_output")
+
+
+class ChainFactory:
+    """
+    Builds each task's runnables once and serves them from a bounded LRU cache.
+
+    A chain is keyed by its task and name, the task's candidate models, the settings that shape it
+    and the version of the prompt registry, so a changed setting, a different model or a reloaded
+    prompt builds a new chain instead of serving a stale one. Chains must not hold per-request state.
+    """
+
+    def __init__(self, max_size: int, enabled: bool = True):
+        self.enabled = enabled
+        self._cache = LRUCache(max_size=max_size, name="chains")
+
+    def get(
+        self,
+        task_name: str,
+        chain_name: str,
+        model_override: Optional[str],
+        build: Callable[[], Any],
+        settings_sections: Iterable[str] = (),
+    ) -> Any:
+        """Returns the cached result of `build()` for this task, chain, model and settings, building it on a miss."""
+        if not self.enabled:
+            return build()
+        key = (
+            task_name,
+            chain_name,
+            tuple(resolve_model_candidates(task_name, model_override)),
+            freeze_settings(get_llm_settings_for_task(task_name)),
+            tuple(freeze_settings(get_section_settings(section, task_name)) for section in (*_LLM_SECTIONS, *settings_sections)),
+            PROMPT_REGISTRY.version,
+        )
+        return self._cache.get_or_create(key, build)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "enabled": self.enabled}
+
+
+_chain_cache_settings = get_section_settings("chain_cache")
+CHAIN_FACTORY = ChainFactory(
+    max_size=int(_chain_cache_settings.get("max_size", 64)),
+    enabled=_chain_cache_settings.get("enabled", True),
+)
@@ -0,0 +1,24 @@
+# core/concurrency.py
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from config.settings import get_section_settings
+
+_execution_settings = get_section_settings("execution")
+
+# Bounded pool for services (or steps) that only have a synchronous implementation.
+# Keeping it bounded stops a burst of blocking calls from spawning an unbounded number of threads.
+SYNC_TASK_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(_execution_settings.get("sync_worker_threads", 8)),
+    thread_name_prefix="sync-task",
+)
+
+async def run_in_worker_thread(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Runs a blocking callable in SYNC_TASK_EXECUTOR without blocking the event loop, preserving contextvars."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(SYNC_TASK_EXECUTOR, call)
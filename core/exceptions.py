@@ -5,3 +5,21 @@ class ServiceExecutionError(Exception):
         self.message = message
         self.original_exception = original_exception
         super().__init__(self.message)
+
+class ProviderUnavailableError(Exception):
+    """Raised by the provider router when every candidate model failed, timed out or had its circuit open."""
+    def __init__(self, message: str, errors: list = None):
+        self.message = message
+        self.errors = errors or []
+        super().__init__(self.message)
+
+class AdmissionRejectedError(Exception):
+    """
+    Raised when a task request is not admitted: its queue is full (status 429) or it waited in the queue
+    for too long (status 503). `retry_after_seconds` estimates when a retry is likely to be admitted.
+    """
+    def __init__(self, message: str, status_code: int, retry_after_seconds: int):
+        self.message = message
+        self.status_code = status_code
+        self.retry_after_seconds = retry_after_seconds
+        super().__init__(self.message)
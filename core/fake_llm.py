@@ -0,0 +1,178 @@
+# core/fake_llm.py
+import asyncio
+import itertools
+import json
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from core.tokens import count_tokens
+
+# The JSON schema that PydanticOutputParser puts in its format instructions.
+_OUTPUT_SCHEMA_PATTERN = re.compile(r"output schema:\s*```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+_WORD_PATTERN = re.compile(r"\S+\s*")
+_FILLER = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore".split()
+
+
+def instance_from_schema(schema: Dict[str, Any], definitions: Optional[Dict[str, Any]] = None, name: str = "value") -> Any:
+    """Builds a small value that validates against a (Pydantic-generated) JSON schema."""
+    definitions = definitions if definitions is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return instance_from_schema(definitions[schema["$ref"].rsplit("/", 1)[-1]], definitions, name)
+    for combinator in ("anyOf", "oneOf", "allOf"):
+        options = [option for option in schema.get(combinator, []) if option.get("type") != "null"]
+        if options:
+            return instance_from_schema(options[0], definitions, name)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "default" in schema:
+        return schema["default"]
+    schema_type = schema.get("type", "object" if "properties" in schema else "string")
+    if schema_type == "object":
+        return {key: instance_from_schema(value, definitions, key) for key, value in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [instance_from_schema(schema.get("items", {}), definitions, name)]
+    if schema_type == "boolean":
+        return True
+    if schema_type in ("integer", "number"):
+        return schema.get("minimum", 0)
+    return f"Fake {name}."
+
+
+def _is_json(text: str) -> bool:
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    A deterministic chat model for offline runs and benchmarks; it never touches the network.
+
+    The answer depends only on the prompt: the first scripted response whose `contains` text occurs in it,
+    else JSON built from the output schema in the prompt's format instructions (Pydantic-parsed tasks),
+    else a ReAct final answer when the prompt asks for one, else `output_words` words of filler text.
+    Called with `format="json"` (its native JSON mode), it answers with valid JSON only, like Ollama does.
+    Latency is `time_to_first_token_seconds` plus the output tokens at `tokens_per_second` (0 = no delay);
+    streams are emitted in chunks of `chunk_tokens` words. Every message carries usage metadata.
+    """
+
+    time_to_first_token_seconds: float = 0.0
+    tokens_per_second: float = 0.0
+    output_words: int = 64
+    chunk_tokens: int = 4
+    responses: List[Dict[str, str]] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def respond(self, prompt: str, json_mode: bool = False) -> str:
+        for scripted in self.responses:
+            if scripted.get("contains", "") in prompt:
+                if json_mode and not _is_json(scripted["response"]):
+                    break
+                return scripted["response"]
+        schema_match = _OUTPUT_SCHEMA_PATTERN.search(prompt)
+        if schema_match:
+            try:
+                return json.dumps(instance_from_schema(json.loads(schema_match.group(1))))
+            except (ValueError, KeyError):
+                pass
+        if json_mode:
+            return "{}"
+        filler = " ".join(_FILLER[index % len(_FILLER)] for index in range(max(self.output_words, 1)))
+        if "Final Answer:" in prompt and "Action:" in prompt:
+            return f"Thought: I now know the final answer.\nFinal Answer: {filler}"
+        return filler
+
+    def _answer(self, messages: List[BaseMessage], format: Optional[str] = None) -> tuple:
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = self.respond(prompt, json_mode=format == "json")
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(text)
+        usage = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        return text, usage
+
+    def _generation_seconds(self, text: str) -> float:
+        return count_tokens(text) / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _chunks(self, text: str) -> List[str]:
+        words = _WORD_PATTERN.findall(text) or [text]
+        size = max(self.chunk_tokens, 1)
+        return ["".join(words[index:index + size]) for index in range(0, len(words), size)]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        text, usage = self._answer(messages, kwargs.get("format"))
+        time.sleep(self.time_to_first_token_seconds + self._generation_seconds(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        text, usage = self._answer(messages, kwargs.get("format"))
+        await asyncio.sleep(self.time_to_first_token_seconds + self._generation_seconds(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        text, usage = self._answer(messages, kwargs.get("format"))
+        time.sleep(self.time_to_first_token_seconds)
+        chunks = self._chunks(text)
+        for index, chunk in enumerate(chunks):
+            if index:
+                time.sleep(self._generation_seconds(chunk))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk, usage_metadata=usage if index == len(chunks) - 1 else None))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        text, usage = self._answer(messages, kwargs.get("format"))
+        await asyncio.sleep(self.time_to_first_token_seconds)
+        chunks = self._chunks(text)
+        for index, chunk in enumerate(chunks):
+            if index:
+                await asyncio.sleep(self._generation_seconds(chunk))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk, usage_metadata=usage if index == len(chunks) - 1 else None))
+
+
+class ScriptedFakeChatModel(BaseChatModel):
+    """
+    A chat model that plays back a script, one step per call, cycling when it runs out.
+    Each step is `{"delay": seconds, "response": text}` or `{"delay": seconds, "error": message}`;
+    an error step raises RuntimeError after its delay. `calls` counts the calls made so far.
+    """
+
+    steps: List[Dict[str, Any]]
+    _step_iterator: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def _next_step(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._step_iterator is None:
+                self._step_iterator = itertools.cycle(self.steps)
+            self.calls += 1
+            return next(self._step_iterator)
+
+    @staticmethod
+    def _result(step: Dict[str, Any]) -> ChatResult:
+        if "error" in step:
+            raise RuntimeError(step["error"])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=step.get("response", "fake response")))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        step = self._next_step()
+        time.sleep(step.get("delay", 0))
+        return self._result(step)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        step = self._next_step()
+        await asyncio.sleep(step.get("delay", 0))
+        return self._result(step)
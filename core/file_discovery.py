@@ -0,0 +1,272 @@
+# core/file_discovery.py
+import hashlib
+import os
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+DEFAULT_SOURCE_EXTENSIONS = frozenset({".py", ".js", ".ts", ".rb", ".go", ".md"})
+# Directories that never contain project sources; they are pruned without being entered.
+DEFAULT_EXCLUDED_DIRS = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "venv", ".venv", "__pycache__",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox", "dist", "build",
+})
+DEFAULT_MAX_FILE_BYTES = 1_000_000
+# A file with a NUL byte in its first BINARY_SNIFF_BYTES bytes is treated as binary.
+BINARY_SNIFF_BYTES = 8192
+
+
+# --- .gitignore Support ---
+def _glob_to_regex(pattern: str) -> str:
+    regex = ""
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            regex += "(?:.*/)?"
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            regex += ".*"
+            index += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                body = pattern[index + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += f"[{body}]"
+                index = end
+        elif char == "\\" and index + 1 < len(pattern):
+            index += 1
+            regex += re.escape(pattern[index])
+        else:
+            regex += re.escape(char)
+        index += 1
+    return regex
+
+
+class GitIgnoreRule:
+    """One line of a .gitignore file, matched against paths relative to the directory holding that file."""
+
+    def __init__(self, pattern: str):
+        self.negated = pattern.startswith("!")
+        if self.negated:
+            pattern = pattern[1:]
+        self.directory_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # A slash anywhere but at the end anchors the pattern to the .gitignore's directory.
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        prefix = "^" if anchored else "(?:^|.*/)"
+        self._regex = re.compile(prefix + _glob_to_regex(pattern) + "$")
+
+    def matches(self, relative_path: str, is_dir: bool) -> bool:
+        if self.directory_only and not is_dir:
+            return False
+        return self._regex.match(relative_path) is not None
+
+
+def parse_gitignore(text: str) -> List[GitIgnoreRule]:
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("\\#") or line.startswith("\\!"):
+            line = line[1:]
+        rules.append(GitIgnoreRule(line))
+    return rules
+
+
+def load_gitignore(directory: str) -> List[GitIgnoreRule]:
+    """The rules of the directory's .gitignore; none when it has no readable one."""
+    try:
+        with open(os.path.join(directory, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+            return parse_gitignore(f.read())
+    except OSError:
+        return []
+
+
+def is_ignored(scopes: List[Tuple[str, List[GitIgnoreRule]]], relative_path: str, is_dir: bool) -> bool:
+    """Applies every .gitignore from the root down to the path's directory; the last matching rule wins."""
+    ignored = False
+    for base, rules in scopes:
+        if base:
+            if not relative_path.startswith(base + "/"):
+                continue
+            path_in_scope = relative_path[len(base) + 1:]
+        else:
+            path_in_scope = relative_path
+        for rule in rules:
+            if rule.matches(path_in_scope, is_dir):
+                ignored = not rule.negated
+    return ignored
+
+
+# --- Walker ---
+def iter_source_files(
+    root: str,
+    extensions: Optional[Iterable[str]] = DEFAULT_SOURCE_EXTENSIONS,
+    excluded_dirs: Iterable[str] = DEFAULT_EXCLUDED_DIRS,
+    max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+    respect_gitignore: bool = True,
+) -> Iterator[str]:
+    """
+    Walks `root` once and yields the paths of candidate source files, in a stable order.
+    Excluded and git-ignored directories are pruned before they are entered; files are filtered by
+    extension (any extension when `extensions` is None) and size from the directory entry alone.
+    Symlinks are not followed.
+    """
+    extensions = frozenset(extensions) if extensions is not None else None
+    excluded_dirs = frozenset(excluded_dirs)
+    root = os.path.abspath(root)
+
+    # Each stack entry is (absolute dir, path relative to root, .gitignore scopes that apply inside it).
+    root_scopes = [("", load_gitignore(root))] if respect_gitignore else []
+    stack = [(root, "", root_scopes)]
+    while stack:
+        directory, relative_dir, scopes = stack.pop()
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file(follow_symlinks=False):
+                    continue
+                if is_dir:
+                    if entry.name in excluded_dirs or (scopes and is_ignored(scopes, relative_path, True)):
+                        continue
+                    subdirectories.append((entry.path, relative_path))
+                    continue
+                if extensions is not None and os.path.splitext(entry.name)[1] not in extensions:
+                    continue
+                if max_file_bytes is not None and entry.stat(follow_symlinks=False).st_size > max_file_bytes:
+                    continue
+                if scopes and is_ignored(scopes, relative_path, False):
+                    continue
+            except OSError:
+                continue
+            yield entry.path
+
+        # Reverse so the stack pops subdirectories in name order.
+        for path, relative_path in reversed(subdirectories):
+            child_scopes = scopes
+            if respect_gitignore:
+                rules = load_gitignore(path)
+                if rules:
+                    child_scopes = scopes + [(relative_path, rules)]
+            stack.append((path, relative_path, child_scopes))
+
+
+def iter_tree(
+    root: str,
+    max_depth: int = 3,
+    excluded_dirs: Iterable[str] = DEFAULT_EXCLUDED_DIRS,
+    respect_gitignore: bool = True,
+) -> Iterator[Tuple[str, bool, int]]:
+    """
+    Yields (path relative to `root`, is_dir, depth) for the files and directories up to `max_depth` levels
+    below `root`, depth-first in name order, pruned like `iter_source_files`. Symlinks are not followed.
+    """
+    excluded_dirs = frozenset(excluded_dirs)
+    root = os.path.abspath(root)
+    root_scopes = [("", load_gitignore(root))] if respect_gitignore else []
+    # Each stack entry is (absolute path, path relative to root, is_dir, .gitignore scopes, depth).
+    stack = [(root, "", True, root_scopes, 0)]
+    while stack:
+        path, relative_path, is_dir, scopes, depth = stack.pop()
+        if depth:
+            yield relative_path, is_dir, depth
+        if not is_dir or depth >= max_depth:
+            continue
+        if respect_gitignore and depth:
+            rules = load_gitignore(path)
+            if rules:
+                scopes = scopes + [(relative_path, rules)]
+        try:
+            with os.scandir(path) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        children = []
+        for entry in entries:
+            child_relative = f"{relative_path}/{entry.name}" if relative_path else entry.name
+            try:
+                child_is_dir = entry.is_dir(follow_symlinks=False)
+                if not child_is_dir and not entry.is_file(follow_symlinks=False):
+                    continue
+            except OSError:
+                continue
+            if child_is_dir and entry.name in excluded_dirs:
+                continue
+            if scopes and is_ignored(scopes, child_relative, child_is_dir):
+                continue
+            children.append((entry.path, child_relative, child_is_dir, scopes, depth + 1))
+        # Reverse so the stack pops children in name order.
+        stack.extend(reversed(children))
+
+
+def read_text_file(path: str) -> Optional[str]:
+    """Returns the file's text, or None when it looks binary or is not valid UTF-8."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def iter_source_documents(root: str, **walk_options) -> Iterator[Document]:
+    """Lazily yields one Document per readable text source file under `root` (see `iter_source_files`)."""
+    for path in iter_source_files(root, **walk_options):
+        text = read_text_file(path)
+        if text is not None:
+            yield Document(page_content=text, metadata={"source": path})
+
+
+def path_fingerprint(path: str) -> str:
+    """
+    A cheap identity of what is currently at `path`: the hash of a file's bytes, or for a directory the hash of
+    the path, size and modification time of every file `iter_source_files` would visit (any extension, any size).
+    Two calls return the same value only while the content is unchanged. A missing path gives ''.
+    """
+    if os.path.isfile(path):
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except OSError:
+            return ""
+        return digest.hexdigest()
+    if not os.path.isdir(path):
+        return ""
+    digest = hashlib.sha256()
+    for file_path in iter_source_files(path, extensions=None, max_file_bytes=None):
+        try:
+            stat = os.stat(file_path, follow_symlinks=False)
+        except OSError:
+            continue
+        digest.update(f"{file_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
@@ -0,0 +1,191 @@
+# core/instrumentation.py
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import Runnable
+
+from core.metrics import METRICS
+
+# --- Metrics ---
+TASK_REQUEST_SECONDS = METRICS.histogram(
+    "ai_task_request_seconds", "End-to-end latency of task requests.", ["task", "model", "status"]
+)
+TASK_STAGE_SECONDS = METRICS.histogram(
+    "ai_task_stage_seconds",
+    "Latency of each stage of a task: prompt_render, llm_call, time_to_first_token, output_parsing, tool_call, "
+    "and the time spent waiting: queue_wait (admission), rate_limit_wait (provider rate limit).",
+    ["task", "model", "stage"],
+)
+LLM_TOKENS = METRICS.counter("ai_llm_tokens_total", "Prompt and completion tokens reported by the provider.", ["task", "model", "kind"])
+LLM_RETRIES = METRICS.counter("ai_llm_retries_total", "Retries of LLM calls and chain steps.", ["task", "model"])
+STAGE_ERRORS = METRICS.counter("ai_task_stage_errors_total", "Failed stages (LLM calls, parsing, tools).", ["task", "model", "stage"])
+TASK_REQUESTS = METRICS.counter("ai_task_requests_total", "Task requests by outcome.", ["task", "model", "status"])
+
+# --- Per-request Timings ---
+_request_timings: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("request_timings", default=None)
+_timings_lock = threading.Lock()
+
+@contextmanager
+def track_timings() -> Iterator[Dict[str, Any]]:
+    """
+    Collects the stage timings and token counts of every instrumented chain run inside the block.
+    The yielded dict is filled in place: {"total_ms", "stages": {stage: {"count", "total_ms"}}, "tokens": {...}}.
+    """
+    timings: Dict[str, Any] = {"stages": {}, "tokens": {"prompt": 0, "completion": 0}}
+    token = _request_timings.set(timings)
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        _request_timings.reset(token)
+
+def _add_to_request(stage: Optional[str] = None, seconds: float = 0.0, tokens: Optional[Dict[str, int]] = None) -> None:
+    timings = _request_timings.get()
+    if timings is None:
+        return
+    with _timings_lock:
+        if stage is not None:
+            entry = timings["stages"].setdefault(stage, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + seconds * 1000, 1)
+        for kind, count in (tokens or {}).items():
+            timings["tokens"][kind] += count
+
+def record_wait(stage: str, seconds: float, task: str, model: str) -> None:
+    """Records time a task spent waiting (e.g. `queue_wait`, `rate_limit_wait`) as a stage, also in the current request's timings."""
+    TASK_STAGE_SECONDS.observe(seconds, task=task, model=model, stage=stage)
+    _add_to_request(stage, seconds)
+
+def record_task_request(task_name: str, model: str, status: str, seconds: float) -> None:
+    TASK_REQUEST_SECONDS.observe(seconds, task=task_name, model=model, status=status)
+    TASK_REQUESTS.inc(task=task_name, model=model, status=status)
+
+# --- Callback Handler ---
+def _classify_chain(name: str) -> Optional[str]:
+    if name.endswith("PromptTemplate"):
+        return "prompt_render"
+    if name.endswith("OutputParser") or name.endswith("Parser"):
+        return "output_parsing"
+    return None
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records stage latencies, token usage, retries and errors of the chains it is attached to.
+    Task and model labels come from the run metadata set by `instrument` and are inherited by child runs.
+    """
+
+    # Run inline on the event loop instead of being dispatched to a thread for async runs.
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict[UUID, tuple] = {}
+        self._first_token_seen: set = set()
+        self._lock = threading.Lock()
+
+    # Chains: only prompt templates and output parsers are timed; the LLM has its own events.
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Any, *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or ""
+        stage = _classify_chain(name)
+        if stage is not None:
+            self._start(run_id, stage, metadata)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, failed=True)
+
+    # LLM calls
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start(run_id, "llm_call", metadata)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start(run_id, "llm_call", metadata)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run_id in self._first_token_seen:
+                return
+            self._first_token_seen.add(run_id)
+        _, started, task, model = run
+        seconds = time.perf_counter() - started
+        TASK_STAGE_SECONDS.observe(seconds, task=task, model=model, stage="time_to_first_token")
+        _add_to_request("time_to_first_token", seconds)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._finish(run_id)
+        if run is None:
+            return
+        _, _, task, model = run
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if prompt_tokens or completion_tokens:
+            LLM_TOKENS.inc(prompt_tokens, task=task, model=model, kind="prompt")
+            LLM_TOKENS.inc(completion_tokens, task=task, model=model, kind="completion")
+            _add_to_request(tokens={"prompt": prompt_tokens, "completion": completion_tokens})
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, failed=True)
+
+    # Tools
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start(run_id, "tool_call", metadata)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, failed=True)
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+        task, model = (run[2], run[3]) if run else ("unknown", "unknown")
+        LLM_RETRIES.inc(task=task, model=model)
+
+    def _start(self, run_id: UUID, stage: str, metadata: Optional[Dict[str, Any]]) -> None:
+        metadata = metadata or {}
+        with self._lock:
+            self._runs[run_id] = (stage, time.perf_counter(), metadata.get("task", "unknown"), metadata.get("model", "unknown"))
+
+    def _finish(self, run_id: UUID, failed: bool = False) -> Optional[tuple]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            self._first_token_seen.discard(run_id)
+        if run is None:
+            return None
+        stage, started, task, model = run
+        seconds = time.perf_counter() - started
+        TASK_STAGE_SECONDS.observe(seconds, task=task, model=model, stage=stage)
+        _add_to_request(stage, seconds)
+        if failed:
+            STAGE_ERRORS.inc(task=task, model=model, stage=stage)
+        return run
+
+def _token_usage(response: LLMResult) -> tuple[int, int]:
+    """Reads token counts from the message usage metadata, falling back to the provider's llm_output."""
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+    if not (prompt_tokens or completion_tokens) and response.llm_output:
+        usage = response.llm_output.get("token_usage") or response.llm_output.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+        completion_tokens = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
+    return prompt_tokens, completion_tokens
+
+METRICS_HANDLER = MetricsCallbackHandler()
+
+def instrument(chain: Runnable, task_name: str, model_used: str) -> Runnable:
+    """Attaches the metrics handler and the task/model labels to every run of `chain` and its steps."""
+    return chain.with_config(callbacks=[METRICS_HANDLER], metadata={"task": task_name, "model": model_used})
@@ -0,0 +1,267 @@
+# core/jobs.py
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pydantic import BaseModel, Field
+from pydantic_core import to_jsonable_python
+
+from core.exceptions import ServiceExecutionError
+from core.progress import progress_reporter
+from core.sqlite_store import SQLiteStore
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    @property
+    def is_terminal(self) -> bool:
+        return self in (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    task_name: str
+    model: Optional[str] = None
+    data: Dict[str, Any] = Field(default_factory=dict)
+    status: JobStatus = JobStatus.QUEUED
+    result: Any = None
+    error: Optional[str] = None
+    progress: Dict[str, Any] = Field(default_factory=dict)
+    created_at: float = Field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+# --- Job Stores ---
+class JobStore(ABC):
+    """Persists job state. Implementations must be safe to call from the event loop and from worker threads."""
+
+    @abstractmethod
+    def save(self, job: Job) -> None:
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        pass
+
+
+class InMemoryJobStore(JobStore):
+    """
+    Keeps jobs in a dict. State is lost on restart; suitable for a single API process.
+    Finished jobs are forgotten once more than `max_finished` have finished after them, or `finished_ttl_seconds`
+    after they finished (0 disables either limit); queued and running jobs are always kept.
+    """
+
+    def __init__(self, max_finished: int = 1000, finished_ttl_seconds: float = 3600):
+        self.max_finished = max_finished
+        self.finished_ttl_seconds = finished_ttl_seconds
+        self._jobs: Dict[str, Job] = {}
+        # Finished job ids in the order they finished -> when they finished.
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, job: Job) -> None:
+        with self._lock:
+            self._jobs[job.id] = job.model_copy(deep=True)
+            if job.status.is_terminal:
+                self._finished[job.id] = job.finished_at or time.time()
+                self._finished.move_to_end(job.id)
+                self._evict_finished_locked()
+
+    def _evict_finished_locked(self) -> None:
+        expired_before = time.time() - self.finished_ttl_seconds
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            over_count = self.max_finished > 0 and len(self._finished) > self.max_finished
+            expired = self.finished_ttl_seconds > 0 and finished_at < expired_before
+            if not (over_count or expired):
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job else None
+
+
+class SQLiteJobStore(JobStore):
+    """Keeps jobs in a SQLite file so their status and results survive restarts of the API process."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._store = SQLiteStore(db_path, [
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, task_name TEXT NOT NULL, status TEXT NOT NULL, "
+            "payload TEXT NOT NULL, updated_at REAL NOT NULL)"
+        ], on_open=self._fail_interrupted_jobs)
+
+    def save(self, job: Job) -> None:
+        with self._store.connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO jobs (id, task_name, status, payload, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job.id, job.task_name, job.status.value, job.model_dump_json(), time.time()),
+            )
+            connection.commit()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._store.connection() as connection:
+            row = connection.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.model_validate_json(row[0]) if row else None
+
+    @staticmethod
+    def _fail_interrupted_jobs(connection: sqlite3.Connection) -> None:
+        """Jobs left queued or running by a previous process can never finish, so they are marked as failed."""
+        rows = connection.execute(
+            "SELECT payload FROM jobs WHERE status IN (?, ?)", (JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+        ).fetchall()
+        for (payload,) in rows:
+            job = Job.model_validate_json(payload)
+            job.status = JobStatus.FAILED
+            job.error = "The job was interrupted by a restart of the API server."
+            job.finished_at = time.time()
+            connection.execute(
+                "UPDATE jobs SET status = ?, payload = ?, updated_at = ? WHERE id = ?",
+                (job.status.value, job.model_dump_json(), time.time(), job.id),
+            )
+
+
+def create_job_store(settings: dict) -> JobStore:
+    store_type = settings.get("store", "memory")
+    if store_type == "memory":
+        return InMemoryJobStore(
+            max_finished=int(settings.get("max_finished_jobs", 1000)),
+            finished_ttl_seconds=float(settings.get("finished_ttl_seconds", 3600)),
+        )
+    if store_type == "sqlite":
+        return SQLiteJobStore(settings.get("sqlite_path", ".data/jobs.sqlite3"))
+    raise ValueError(f"Unknown job store: '{store_type}'. Supported: ['memory', 'sqlite']")
+
+
+# --- Job Manager ---
+JobRunner = Callable[[], Awaitable[Any]]
+
+
+class JobManager:
+    """
+    Runs jobs as asyncio tasks on the API's event loop.
+    Each task type gets its own semaphore, so at most `concurrency_for(task_name)` jobs of that type run at once
+    and the rest wait in the QUEUED state. Progress is saved at most once per `progress_save_interval_seconds`
+    per job (the latest values are saved when the interval ends); every status change is saved at once.
+    """
+
+    def __init__(self, store: JobStore, concurrency_for: Callable[[str], int], progress_save_interval_seconds: float = 0.5):
+        self.store = store
+        self._concurrency_for = concurrency_for
+        self.progress_save_interval_seconds = progress_save_interval_seconds
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._progress_saved_at: Dict[str, float] = {}
+        self._pending_progress_saves: Dict[str, asyncio.TimerHandle] = {}
+
+    def submit(self, task_name: str, data: dict, model: Optional[str], runner: JobRunner) -> Job:
+        job = Job(task_name=task_name, model=model, data=data)
+        self.store.save(job)
+        task = asyncio.create_task(self._run(job, runner), name=f"job-{job.id}")
+        self._running[job.id] = task
+        task.add_done_callback(lambda _: self._running.pop(job.id, None))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancels a queued or running job. Finished jobs are returned unchanged.
+        Work a sync-only service already handed to a worker thread runs to completion, but its result is discarded.
+        """
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        return self.store.get(job_id)
+
+    async def shutdown(self) -> None:
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: Job, runner: JobRunner) -> None:
+        try:
+            async with self._semaphore(job.task_name):
+                job.status = JobStatus.RUNNING
+                job.started_at = time.time()
+                self.store.save(job)
+                loop = asyncio.get_running_loop()
+                with progress_reporter(lambda fields: self._report_progress(loop, job, fields)):
+                    result = await runner()
+            job.result = to_jsonable_python(result, fallback=str)
+            job.status = JobStatus.SUCCEEDED
+        except asyncio.CancelledError:
+            job.status = JobStatus.CANCELLED
+            raise
+        except ServiceExecutionError as e:
+            job.status = JobStatus.FAILED
+            job.error = e.message
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+        finally:
+            pending_save = self._pending_progress_saves.pop(job.id, None)
+            if pending_save is not None:
+                pending_save.cancel()
+            self._progress_saved_at.pop(job.id, None)
+            job.finished_at = time.time()
+            self.store.save(job)
+
+    def _report_progress(self, loop: asyncio.AbstractEventLoop, job: Job, fields: dict) -> None:
+        """Progress may come from worker threads; the job is only changed and saved on the event loop that runs it."""
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._update_progress(job, fields)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._update_progress, job, fields)
+
+    def _update_progress(self, job: Job, fields: dict) -> None:
+        # Updates handed over from a worker thread may arrive after the job has finished.
+        if job.status.is_terminal:
+            return
+        job.progress.update(fields)
+        if job.id in self._pending_progress_saves:
+            return
+        wait = self._progress_saved_at.get(job.id, float("-inf")) + self.progress_save_interval_seconds - time.monotonic()
+        if wait <= 0:
+            self._save_progress(job)
+        else:
+            self._pending_progress_saves[job.id] = asyncio.get_running_loop().call_later(wait, self._save_progress, job)
+
+    def _save_progress(self, job: Job) -> None:
+        self._pending_progress_saves.pop(job.id, None)
+        if job.status.is_terminal:
+            return
+        self._progress_saved_at[job.id] = time.monotonic()
+        self.store.save(job)
+
+    def _semaphore(self, task_name: str) -> asyncio.Semaphore:
+        if task_name not in self._semaphores:
+            self._semaphores[task_name] = asyncio.Semaphore(max(1, int(self._concurrency_for(task_name))))
+        return self._semaphores[task_name]
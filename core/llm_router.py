@@ -0,0 +1,590 @@
+# core/llm_router.py
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from core.exceptions import ProviderUnavailableError
+from core.instrumentation import record_wait
+from core.metrics import METRICS
+from config.settings import get_section_settings
+
+ROUTE_ATTEMPTS = METRICS.counter(
+    "ai_llm_route_attempts_total",
+    "LLM calls started by the provider router, by outcome (ok, error, timeout, cancelled, circuit_open).",
+    ["provider", "model", "outcome"],
+)
+ROUTE_HEDGES = METRICS.counter(
+    "ai_llm_route_hedges_total", "Hedged calls fired because the running call exceeded the hedge threshold.", ["provider", "model"]
+)
+
+_END = object()
+
+
+def routed_model(message: Any) -> Optional[str]:
+    """The `provider:model` of the candidate that produced a message (or its first chunk), when a ProviderRouter did."""
+    return (getattr(message, "response_metadata", None) or {}).get("routed_model")
+
+
+def _tag_routed_model(message: Any, candidate: "RouteCandidate") -> Any:
+    if isinstance(message, BaseMessage):
+        message.response_metadata["routed_model"] = candidate.model_id
+    return message
+
+
+class ProviderSlots:
+    """
+    A counting semaphore that can be acquired from worker threads and from the event loop alike,
+    so sync and async callers share one concurrency limit per provider. Slots are handed to waiters in FIFO order.
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError(f"A provider needs at least one concurrency slot, got {limit}.")
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self.in_use < self.limit and not self._waiters:
+                self.in_use += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        # The releasing side hands its slot over before setting the event, so `in_use` is already counted.
+        event.wait()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_use < self.limit and not self._waiters:
+                self.in_use += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, future))
+                    granted = False
+                except ValueError:
+                    granted = True
+            if granted:
+                # The slot was handed over just as the waiter was cancelled; pass it on.
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self.in_use -= 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: asyncio.Future) -> None:
+        # A waiter cancelled after it was taken off the queue passes the slot on from `aacquire`.
+        if not future.done():
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"limit": self.limit, "in_use": self.in_use, "waiting": len(self._waiters)}
+
+
+class TokenBucket:
+    """
+    Rate limit of a provider: `rate_per_second` calls on average, with bursts of up to `burst` calls.
+    Each caller reserves the next token and waits until it is due, so callers are paced instead of rejected.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int = 1):
+        if rate_per_second <= 0:
+            raise ValueError(f"A rate limit needs a positive rate, got {rate_per_second}.")
+        self.rate_per_second = rate_per_second
+        self.burst = max(int(burst), 1)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self.waits = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Takes a token, going into debt if none is left; returns how long to wait until the token is due."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second)
+            self._updated_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            self.waits += 1
+            return -self._tokens / self.rate_per_second
+
+    def _refund(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def acquire(self) -> float:
+        wait_seconds = self._reserve()
+        if wait_seconds:
+            time.sleep(wait_seconds)
+        return wait_seconds
+
+    async def aacquire(self) -> float:
+        wait_seconds = self._reserve()
+        if wait_seconds:
+            try:
+                await asyncio.sleep(wait_seconds)
+            except asyncio.CancelledError:
+                self._refund()
+                raise
+        return wait_seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            tokens = min(self.burst, self._tokens + (time.monotonic() - self._updated_at) * self.rate_per_second)
+            return {"rate_per_second": self.rate_per_second, "burst": self.burst, "tokens": round(tokens, 2), "waits": self.waits}
+
+
+class CircuitBreaker:
+    """
+    Stops sending calls to a provider after `failure_threshold` consecutive failures. After `reset_seconds`
+    a single trial call is let through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def record_abandoned(self) -> None:
+        """A call that was cancelled (e.g. the losing side of a hedge) says nothing about the provider's health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.consecutive_failures}
+
+
+@dataclass
+class ProviderGate:
+    """The concurrency slots, circuit breaker and optional rate limit shared by every model of one provider."""
+
+    name: str
+    slots: ProviderSlots
+    breaker: CircuitBreaker
+    rate_limit: Optional[TokenBucket] = None
+
+    def stats(self) -> dict:
+        stats = {**self.slots.stats(), "circuit": self.breaker.stats()}
+        if self.rate_limit is not None:
+            stats["rate_limit"] = self.rate_limit.stats()
+        return stats
+
+
+_PROVIDER_GATES: Dict[str, ProviderGate] = {}
+_gates_lock = threading.Lock()
+
+
+def get_provider_gate(provider: str) -> ProviderGate:
+    """Returns the process-wide gate of a provider, sized from the `routing` section of llm_settings.yaml."""
+    provider_upper = provider.upper()
+    with _gates_lock:
+        gate = _PROVIDER_GATES.get(provider_upper)
+        if gate is None:
+            settings = get_section_settings("routing")
+            provider_settings = (settings.get("providers") or {}).get(provider_upper) or {}
+            breaker_settings = {**(settings.get("circuit_breaker") or {}), **(provider_settings.get("circuit_breaker") or {})}
+            requests_per_minute = float(provider_settings.get("requests_per_minute") or 0)
+            gate = ProviderGate(
+                name=provider_upper,
+                slots=ProviderSlots(int(provider_settings.get("max_concurrency", settings.get("max_concurrency", 16)))),
+                breaker=CircuitBreaker(
+                    failure_threshold=int(breaker_settings.get("failure_threshold", 5)),
+                    reset_seconds=float(breaker_settings.get("reset_seconds", 30.0)),
+                ),
+                rate_limit=TokenBucket(requests_per_minute / 60, int(provider_settings.get("burst", 1))) if requests_per_minute else None,
+            )
+            _PROVIDER_GATES[provider_upper] = gate
+        return gate
+
+
+def provider_gate_stats() -> dict:
+    with _gates_lock:
+        gates = dict(_PROVIDER_GATES)
+    return {name: gate.stats() for name, gate in gates.items()}
+
+
+@dataclass
+class RouteCandidate:
+    """One `provider:model` the router may call, with the gate of its provider."""
+
+    model_id: str
+    llm: Runnable
+    gate: ProviderGate
+
+    def record(self, outcome: str) -> None:
+        ROUTE_ATTEMPTS.inc(provider=self.gate.name, model=self.model_id, outcome=outcome)
+
+    def _record_rate_limit_wait(self, seconds: float, config: Optional[RunnableConfig]) -> None:
+        if seconds:
+            task = ((config or {}).get("metadata") or {}).get("task", "unknown")
+            record_wait("rate_limit_wait", seconds, task=task, model=self.model_id)
+
+    def wait_for_rate_limit(self, config: Optional[RunnableConfig]) -> None:
+        if self.gate.rate_limit is not None:
+            self._record_rate_limit_wait(self.gate.rate_limit.acquire(), config)
+
+    async def await_rate_limit(self, config: Optional[RunnableConfig]) -> None:
+        if self.gate.rate_limit is not None:
+            self._record_rate_limit_wait(await self.gate.rate_limit.aacquire(), config)
+
+
+@dataclass
+class _SyncAttempt:
+    candidate: RouteCandidate
+    started_at: float
+    acquired: bool = False
+    abandoned: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+# Threads that run the calls of synchronous `invoke`s, so the caller can time them out and hedge them.
+_SYNC_ATTEMPT_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-router")
+
+
+class ProviderRouter(Runnable[LanguageModelInput, BaseMessage]):
+    """
+    Calls an ordered list of candidate models in place of a single chat model.
+
+    Each call goes to the first candidate whose circuit is closed, waiting for its provider's rate limit
+    (when one is set) and then for one of its provider's slots.
+    On an error, or when `timeout_seconds` (slot wait included) runs out, the next candidate is tried.
+    With `hedge_after_seconds` set, a call still running after that long gets a second call to the next
+    candidate and whichever answers first wins; the other is cancelled. Streams fail over only until
+    their first chunk, and are not hedged. The answer (or first chunk) names the candidate that produced it
+    in `response_metadata["routed_model"]`, see `routed_model`.
+    """
+
+    def __init__(self, candidates: List[RouteCandidate], timeout_seconds: Optional[float] = None, hedge_after_seconds: Optional[float] = None):
+        if not candidates:
+            raise ValueError("ProviderRouter needs at least one candidate model.")
+        self.candidates = candidates
+        self.timeout_seconds = timeout_seconds or None
+        self.hedge_after_seconds = hedge_after_seconds or None
+
+    def _allowed_candidates(self, errors: List[str]) -> Iterator[RouteCandidate]:
+        for candidate in self.candidates:
+            if candidate.gate.breaker.allow():
+                yield candidate
+            else:
+                candidate.record("circuit_open")
+                errors.append(f"{candidate.model_id}: circuit open")
+
+    def _unavailable(self, errors: List[str]) -> ProviderUnavailableError:
+        return ProviderUnavailableError(f"No candidate model could answer: {'; '.join(errors)}", errors)
+
+    # --- Async ---
+    async def _aattempt(self, candidate: RouteCandidate, input: LanguageModelInput, config: Optional[RunnableConfig], kwargs: dict) -> BaseMessage:
+        acquired = False
+
+        async def call() -> BaseMessage:
+            nonlocal acquired
+            await candidate.await_rate_limit(config)
+            await candidate.gate.slots.aacquire()
+            acquired = True
+            return await candidate.llm.ainvoke(input, config, **kwargs)
+
+        try:
+            result = await asyncio.wait_for(call(), self.timeout_seconds) if self.timeout_seconds else await call()
+        except asyncio.TimeoutError:
+            # Waiting for a slot is saturation, not a provider failure; only a timed-out call counts against it.
+            candidate.gate.breaker.record_failure() if acquired else candidate.gate.breaker.record_abandoned()
+            candidate.record("timeout")
+            raise TimeoutError(f"no answer within {self.timeout_seconds}s")
+        except asyncio.CancelledError:
+            candidate.gate.breaker.record_abandoned()
+            candidate.record("cancelled")
+            raise
+        except Exception:
+            candidate.gate.breaker.record_failure()
+            candidate.record("error")
+            raise
+        finally:
+            if acquired:
+                candidate.gate.slots.release()
+        candidate.gate.breaker.record_success()
+        candidate.record("ok")
+        return _tag_routed_model(result, candidate)
+
+    async def ainvoke(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        errors: List[str] = []
+        remaining = self._allowed_candidates(errors)
+        running: Dict[asyncio.Task, RouteCandidate] = {}
+        hedged = False
+
+        def launch() -> Optional[RouteCandidate]:
+            candidate = next(remaining, None)
+            if candidate is not None:
+                running[asyncio.ensure_future(self._aattempt(candidate, input, config, kwargs))] = candidate
+            return candidate
+
+        try:
+            launch()
+            while running:
+                hedge_timeout = self.hedge_after_seconds if not hedged else None
+                done, _ = await asyncio.wait(running, timeout=hedge_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if (candidate := launch()) is not None:
+                        ROUTE_HEDGES.inc(provider=candidate.gate.name, model=candidate.model_id)
+                    continue
+                for task in done:
+                    candidate = running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(f"{candidate.model_id}: {task.exception()}")
+                if not running:
+                    launch()
+            raise self._unavailable(errors)
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def astream(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[BaseMessage]:
+        errors: List[str] = []
+        for candidate in self._allowed_candidates(errors):
+            acquired = False
+            stream = None
+
+            async def first_chunk() -> Any:
+                nonlocal acquired, stream
+                await candidate.await_rate_limit(config)
+                await candidate.gate.slots.aacquire()
+                acquired = True
+                stream = candidate.llm.astream(input, config, **kwargs)
+                return await anext(stream, _END)
+
+            try:
+                try:
+                    first = await asyncio.wait_for(first_chunk(), self.timeout_seconds) if self.timeout_seconds else await first_chunk()
+                except asyncio.TimeoutError:
+                    candidate.gate.breaker.record_failure() if acquired else candidate.gate.breaker.record_abandoned()
+                    candidate.record("timeout")
+                    errors.append(f"{candidate.model_id}: no first chunk within {self.timeout_seconds}s")
+                    continue
+                except asyncio.CancelledError:
+                    candidate.gate.breaker.record_abandoned()
+                    candidate.record("cancelled")
+                    raise
+                except Exception as e:
+                    candidate.gate.breaker.record_failure()
+                    candidate.record("error")
+                    errors.append(f"{candidate.model_id}: {e}")
+                    continue
+
+                # Chunks have been sent to the caller from here on, so a later error cannot fail over.
+                try:
+                    if first is not _END:
+                        yield _tag_routed_model(first, candidate)
+                        async for chunk in stream:
+                            yield chunk
+                except Exception:
+                    candidate.gate.breaker.record_failure()
+                    candidate.record("error")
+                    raise
+                except BaseException:
+                    # Closed or cancelled by the consumer (e.g. a client that disconnected): release a half-open trial.
+                    candidate.gate.breaker.record_abandoned()
+                    candidate.record("cancelled")
+                    raise
+                candidate.gate.breaker.record_success()
+                candidate.record("ok")
+                return
+            finally:
+                if acquired:
+                    candidate.gate.slots.release()
+                if stream is not None:
+                    try:
+                        await stream.aclose()
+                    except RuntimeError:
+                        # Closed by the event loop's finaliser while a cancelled read still owns it; nothing left to do.
+                        pass
+        raise self._unavailable(errors)
+
+    # --- Sync ---
+    def _run_sync_attempt(self, attempt: _SyncAttempt, input: LanguageModelInput, config: Optional[RunnableConfig], kwargs: dict) -> BaseMessage:
+        candidate = attempt.candidate
+        candidate.wait_for_rate_limit(config)
+        candidate.gate.slots.acquire()
+        with attempt.lock:
+            attempt.acquired = True
+        try:
+            result = candidate.llm.invoke(input, config, **kwargs)
+        except Exception:
+            with attempt.lock:
+                if not attempt.abandoned:
+                    candidate.gate.breaker.record_failure()
+                    candidate.record("error")
+            raise
+        finally:
+            candidate.gate.slots.release()
+        with attempt.lock:
+            if not attempt.abandoned:
+                candidate.gate.breaker.record_success()
+                candidate.record("ok")
+        return _tag_routed_model(result, candidate)
+
+    def _abandon(self, attempt: _SyncAttempt, outcome: str) -> None:
+        """Gives up on a call still running in its thread; the thread releases the slot when the call returns."""
+        with attempt.lock:
+            attempt.abandoned = True
+            timed_out_in_call = outcome == "timeout" and attempt.acquired
+        candidate = attempt.candidate
+        candidate.gate.breaker.record_failure() if timed_out_in_call else candidate.gate.breaker.record_abandoned()
+        candidate.record(outcome)
+
+    def invoke(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        errors: List[str] = []
+        remaining = self._allowed_candidates(errors)
+        running: Dict[Future, _SyncAttempt] = {}
+        started = time.monotonic()
+        hedged = False
+
+        def launch() -> Optional[RouteCandidate]:
+            candidate = next(remaining, None)
+            if candidate is not None:
+                attempt = _SyncAttempt(candidate=candidate, started_at=time.monotonic())
+                # Callbacks and per-request context (timings, cache outcomes) follow the call into the thread.
+                context = contextvars.copy_context()
+                running[_SYNC_ATTEMPT_EXECUTOR.submit(context.run, self._run_sync_attempt, attempt, input, config, kwargs)] = attempt
+            return candidate
+
+        try:
+            launch()
+            while running:
+                now = time.monotonic()
+                wake_ups = [attempt.started_at + self.timeout_seconds - now for attempt in running.values()] if self.timeout_seconds else []
+                if self.hedge_after_seconds and not hedged:
+                    wake_ups.append(started + self.hedge_after_seconds - now)
+                done, _ = wait(list(running), timeout=max(min(wake_ups), 0) if wake_ups else None, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    attempt = running.pop(future)
+                    if future.exception() is None:
+                        return future.result()
+                    errors.append(f"{attempt.candidate.model_id}: {future.exception()}")
+
+                now = time.monotonic()
+                if self.timeout_seconds:
+                    for future, attempt in list(running.items()):
+                        if now - attempt.started_at >= self.timeout_seconds:
+                            running.pop(future)
+                            self._abandon(attempt, "timeout")
+                            errors.append(f"{attempt.candidate.model_id}: no answer within {self.timeout_seconds}s")
+                if self.hedge_after_seconds and not hedged and now - started >= self.hedge_after_seconds and running:
+                    hedged = True
+                    if (candidate := launch()) is not None:
+                        ROUTE_HEDGES.inc(provider=candidate.gate.name, model=candidate.model_id)
+                if not running:
+                    launch()
+            raise self._unavailable(errors)
+        finally:
+            for future, attempt in running.items():
+                if future.cancel():
+                    # Never started: release the half-open trial `_allowed_candidates` may have reserved for it.
+                    attempt.candidate.gate.breaker.record_abandoned()
+                    attempt.candidate.record("cancelled")
+                else:
+                    self._abandon(attempt, "cancelled")
+
+    def stream(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[BaseMessage]:
+        # Synchronous streams fail over on errors before the first chunk; they have no timeout.
+        errors: List[str] = []
+        for candidate in self._allowed_candidates(errors):
+            candidate.wait_for_rate_limit(config)
+            candidate.gate.slots.acquire()
+            try:
+                chunks = candidate.llm.stream(input, config, **kwargs)
+                try:
+                    first = next(chunks, _END)
+                except Exception as e:
+                    candidate.gate.breaker.record_failure()
+                    candidate.record("error")
+                    errors.append(f"{candidate.model_id}: {e}")
+                    continue
+                except BaseException:
+                    candidate.gate.breaker.record_abandoned()
+                    candidate.record("cancelled")
+                    raise
+                try:
+                    if first is not _END:
+                        yield _tag_routed_model(first, candidate)
+                        yield from chunks
+                except Exception:
+                    candidate.gate.breaker.record_failure()
+                    candidate.record("error")
+                    raise
+                except BaseException:
+                    # Closed by the consumer (GeneratorExit): release a half-open trial.
+                    candidate.gate.breaker.record_abandoned()
+                    candidate.record("cancelled")
+                    raise
+                candidate.gate.breaker.record_success()
+                candidate.record("ok")
+                return
+            finally:
+                candidate.gate.slots.release()
+        raise self._unavailable(errors)
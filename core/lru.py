@@ -0,0 +1,100 @@
+# core/lru.py
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """
+    A size-bounded mapping with least-recently-used eviction and hit/miss/eviction counters.
+
+    All operations hold a plain `threading.Lock` and never await, so one instance can be shared
+    between request handlers on the event loop and worker threads.
+    """
+
+    def __init__(self, max_size: int, name: str = "cache"):
+        if max_size < 1:
+            raise ValueError(f"LRUCache '{name}' needs a max_size of at least 1, got {max_size}.")
+        self.name = name
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per key being created, so a slow factory never blocks lookups of other keys. A key keeps its
+        # lock until a value is stored, so callers that arrive after a failed factory queue behind the retry.
+        self._creation_locks: dict[Hashable, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._put_locked(key, value)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for `key`, building it with `factory` exactly once on a miss. When the factory
+        raises, the next caller waiting for the key (or arriving later) builds it again; never two at once.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            creation_lock = self._creation_locks.setdefault(key, threading.Lock())
+
+        with creation_lock:
+            with self._lock:
+                if key in self._entries:
+                    # Another thread built it while we were waiting.
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                self.misses += 1
+            value = factory()
+            with self._lock:
+                self._put_locked(key, value)
+                self._creation_locks.pop(key, None)
+            return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _put_locked(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,23 @@
+# core/progress.py
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+ProgressCallback = Callable[[dict], None]
+
+_progress_callback: contextvars.ContextVar[Optional[ProgressCallback]] = contextvars.ContextVar("progress_callback", default=None)
+
+@contextmanager
+def progress_reporter(callback: ProgressCallback) -> Iterator[None]:
+    """Routes every `report_progress` call made inside the block (including worker threads) to `callback`."""
+    token = _progress_callback.set(callback)
+    try:
+        yield
+    finally:
+        _progress_callback.reset(token)
+
+def report_progress(**fields: Any) -> None:
+    """Publishes progress of the running task. A no-op when nobody is listening (e.g. plain /tasks calls)."""
+    callback = _progress_callback.get()
+    if callback is not None:
+        callback(fields)
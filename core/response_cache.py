@@ -0,0 +1,260 @@
+# core/response_cache.py
+import contextvars
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from core.concurrency import run_in_worker_thread
+from core.llm_router import routed_model
+from core.lru import LRUCache
+from core.sqlite_store import SQLiteStore
+from config.settings import get_section_settings
+
+# --- Storage Tiers ---
+class ResponseCache:
+    """
+    Two-tier cache of LLM responses: an in-memory LRU in front of a SQLite file.
+    Both tiers honour the same TTL; a hit on disk is promoted to memory.
+    `alookup`/`astore` answer memory hits on the event loop and hand the disk tier to a worker thread.
+    """
+
+    def __init__(self, max_entries: int, sqlite_path: Optional[str], ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self._memory = LRUCache(max_size=max_entries, name="responses")
+        self._disk = SQLiteStore(
+            sqlite_path,
+            ["CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, text TEXT NOT NULL, expires_at REAL NOT NULL)"],
+            on_open=self._delete_expired,
+        ) if sqlite_path else None
+        self.disk_hits = 0
+
+    def lookup(self, key: str) -> Optional[str]:
+        text = self._lookup_memory(key)
+        if text is not None or self._disk is None:
+            return text
+        return self._lookup_disk(key)
+
+    async def alookup(self, key: str) -> Optional[str]:
+        text = self._lookup_memory(key)
+        if text is not None or self._disk is None:
+            return text
+        return await run_in_worker_thread(self._lookup_disk, key)
+
+    def store(self, key: str, text: str) -> None:
+        expires_at = self._store_memory(key, text)
+        if self._disk is not None:
+            self._store_disk(key, text, expires_at)
+
+    async def astore(self, key: str, text: str) -> None:
+        expires_at = self._store_memory(key, text)
+        if self._disk is not None:
+            await run_in_worker_thread(self._store_disk, key, text, expires_at)
+
+    def _lookup_memory(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        text, expires_at = entry
+        if expires_at > time.time():
+            return text
+        self._memory.pop(key)
+        return None
+
+    def _lookup_disk(self, key: str) -> Optional[str]:
+        with self._disk.connection() as connection:
+            row = connection.execute("SELECT text, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            text, expires_at = row
+            if expires_at <= time.time():
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                connection.commit()
+                return None
+            self.disk_hits += 1
+        self._memory.put(key, (text, expires_at))
+        return text
+
+    def _store_memory(self, key: str, text: str) -> float:
+        expires_at = time.time() + self.ttl_seconds
+        self._memory.put(key, (text, expires_at))
+        return expires_at
+
+    def _store_disk(self, key: str, text: str, expires_at: float) -> None:
+        with self._disk.connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, text, expires_at) VALUES (?, ?, ?)", (key, text, expires_at)
+            )
+            connection.commit()
+
+    def stats(self) -> dict:
+        return {**self._memory.stats(), "disk_hits": self.disk_hits, "ttl_seconds": self.ttl_seconds}
+
+    @staticmethod
+    def _delete_expired(connection: sqlite3.Connection) -> None:
+        connection.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide ResponseCache, built from the `response_cache` section on first use."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            settings = get_section_settings("response_cache")
+            _response_cache = ResponseCache(
+                max_entries=int(settings.get("memory_max_entries", 512)),
+                sqlite_path=settings.get("sqlite_path"),
+                ttl_seconds=float(settings.get("ttl_seconds", 86400)),
+            )
+        return _response_cache
+
+# --- Per-request Hit/Miss Tracking ---
+_cache_outcomes: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("response_cache_outcomes", default=None)
+
+@contextmanager
+def track_cache_outcomes() -> Iterator[List[str]]:
+    """Collects the 'hit'/'miss' outcome of every cached LLM call made inside the block (including worker threads)."""
+    outcomes: List[str] = []
+    token = _cache_outcomes.set(outcomes)
+    try:
+        yield outcomes
+    finally:
+        _cache_outcomes.reset(token)
+
+def summarize_cache_outcomes(outcomes: List[str]) -> str:
+    """Summarises a request's outcomes for the X-Response-Cache header: hit, miss, partial or bypass."""
+    if not outcomes:
+        return "bypass"
+    if all(outcome == "hit" for outcome in outcomes):
+        return "hit"
+    if all(outcome == "miss" for outcome in outcomes):
+        return "miss"
+    return "partial"
+
+def _record(outcome: str) -> None:
+    outcomes = _cache_outcomes.get()
+    if outcomes is not None:
+        outcomes.append(outcome)
+
+# --- Chain Integration ---
+class CachedChatModel(Runnable[LanguageModelInput, BaseMessage]):
+    """
+    Wraps the LLM step of a chain (`prompt | CachedChatModel(llm) | parser`) and answers from the ResponseCache
+    when the same task, model, settings and rendered prompt were seen before. The parser still runs on hits.
+    Because the key is the rendered prompt, analysis entries are keyed on the file's content, not its path.
+
+    Only answers worth replaying are stored: answers `accept(text)` rejects (e.g. output the chain's parser
+    cannot read) are not, nor are answers the router got from another model than `model_identifier` after a failover.
+    """
+
+    def __init__(self, llm: Runnable, cache: ResponseCache, task_name: str, model_identifier: str, llm_settings: dict,
+                 accept: Optional[Callable[[str], bool]] = None):
+        self.llm = llm
+        self.cache = cache
+        self.model_identifier = model_identifier
+        self.accept = accept
+        self._key_prefix = json.dumps([task_name, model_identifier, llm_settings], sort_keys=True, default=str)
+
+    def cache_key(self, input: LanguageModelInput) -> str:
+        if isinstance(input, PromptValue):
+            rendered = input.to_string()
+        elif isinstance(input, str):
+            rendered = input
+        else:
+            rendered = json.dumps([message.model_dump() for message in input], sort_keys=True, default=str)
+        return hashlib.sha256(f"{self._key_prefix}\n{rendered}".encode("utf-8")).hexdigest()
+
+    def invoke(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        key = self.cache_key(input)
+        cached = self.cache.lookup(key)
+        if cached is not None:
+            _record("hit")
+            return AIMessage(content=cached)
+        _record("miss")
+        message = self.llm.invoke(input, config, **kwargs)
+        if self._cacheable(message.content, [message]):
+            self.cache.store(key, message.content)
+        return message
+
+    async def ainvoke(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        key = self.cache_key(input)
+        cached = await self.cache.alookup(key)
+        if cached is not None:
+            _record("hit")
+            return AIMessage(content=cached)
+        _record("miss")
+        message = await self.llm.ainvoke(input, config, **kwargs)
+        if self._cacheable(message.content, [message]):
+            await self.cache.astore(key, message.content)
+        return message
+
+    def stream(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[BaseMessage]:
+        key = self.cache_key(input)
+        cached = self.cache.lookup(key)
+        if cached is not None:
+            _record("hit")
+            yield AIMessageChunk(content=cached)
+            return
+        _record("miss")
+        chunks = []
+        for chunk in self.llm.stream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        text = _joined_text(chunks)
+        if self._cacheable(text, chunks):
+            self.cache.store(key, text)
+
+    async def astream(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[BaseMessage]:
+        key = self.cache_key(input)
+        cached = await self.cache.alookup(key)
+        if cached is not None:
+            _record("hit")
+            yield AIMessageChunk(content=cached)
+            return
+        _record("miss")
+        chunks = []
+        async for chunk in self.llm.astream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        text = _joined_text(chunks)
+        if self._cacheable(text, chunks):
+            await self.cache.astore(key, text)
+
+    def _cacheable(self, content: Any, messages: List[BaseMessage]) -> bool:
+        # Multi-part (e.g. tool call) contents are not cached; they cannot be rebuilt from plain text.
+        if not isinstance(content, str) or not content:
+            return False
+        # The key names the first candidate model; an answer served by a fallback must not be replayed as its answer.
+        if any(routed_model(message) not in (None, self.model_identifier) for message in messages):
+            return False
+        return self.accept is None or self.accept(content)
+
+
+def _joined_text(chunks: List[BaseMessage]) -> str:
+    return "".join(chunk.content for chunk in chunks if isinstance(chunk.content, str))
+
+
+def with_response_cache(llm: Runnable, task_name: str, model_identifier: str, llm_settings: dict,
+                        accept: Optional[Callable[[str], bool]] = None) -> Runnable:
+    """
+    Returns `llm` wrapped in a CachedChatModel when caching is enabled for the task and the call is
+    deterministic (temperature 0) or caching is forced; otherwise returns `llm` unchanged.
+    """
+    settings = get_section_settings("response_cache", task_name)
+    if not settings.get("enabled", False):
+        return llm
+    if llm_settings.get("temperature", None) != 0 and not settings.get("force", False):
+        return llm
+    return CachedChatModel(llm, get_response_cache(), task_name, model_identifier, llm_settings, accept=accept)
@@ -0,0 +1,70 @@
+# core/single_flight.py
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from core.metrics import METRICS
+
+SINGLE_FLIGHT_REQUESTS = METRICS.counter(
+    "ai_single_flight_requests_total",
+    "Requests that started an execution (leader) or joined an identical one already in flight (coalesced).",
+    ["task", "role"],
+)
+SINGLE_FLIGHT_ABANDONED = METRICS.counter(
+    "ai_single_flight_abandoned_total", "Shared executions cancelled because every request waiting on them went away.", ["task"]
+)
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Runs one execution per key at a time on the event loop: a call whose key is already in flight waits for
+    that execution instead of starting its own, and every waiter gets its result or its exception.
+    The execution runs in its own asyncio task, so cancelling a waiter does not cancel it while others
+    still wait; it is cancelled only when the last waiter goes away. Results are shared, not copied.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]], task_name: str) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(task=asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.executions += 1
+            SINGLE_FLIGHT_REQUESTS.inc(task=task_name, role="leader")
+        else:
+            self.coalesced += 1
+            SINGLE_FLIGHT_REQUESTS.inc(task=task_name, role="coalesced")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+                self.abandoned += 1
+                SINGLE_FLIGHT_ABANDONED.inc(task=task_name)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        # A finished or abandoned execution must not be joined; a newer one under the same key stays.
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "executions": self.executions, "coalesced": self.coalesced, "abandoned": self.abandoned}
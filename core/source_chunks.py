@@ -0,0 +1,129 @@
+# core/source_chunks.py
+import ast
+import io
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from core.tokens import count_tokens, split_text_by_tokens
+
+# Top-level lines that start a new definition, per language name (as in AnalysisService's LANGUAGE_MAP).
+# Other languages split at any unindented line that follows a blank line.
+_DEFINITION_PATTERNS = {
+    "Ruby": re.compile(r"^(def|class|module)\b"),
+    "JavaScript": re.compile(r"^(export\s+)?(default\s+)?(async\s+)?(function\*?|class|const|let|var)\b"),
+}
+_COMMENT_PATTERN = re.compile(r"^\s*(#|//|/\*|\*|@)")
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_$][\w$.]*")
+
+
+@dataclass
+class SourceChunk:
+    """A contiguous part of a source file. Lines are 1-based and inclusive."""
+
+    text: str
+    start_line: int
+    end_line: int
+    names: List[str] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        shown = self.names[:3] + ([f"{len(self.names) - 3} more"] if len(self.names) > 3 else [])
+        names = f" ({', '.join(shown)})" if shown else ""
+        return f"Lines {self.start_line}-{self.end_line}{names}"
+
+
+def _python_boundaries(source: str) -> Optional[List[Tuple[int, str]]]:
+    """(0-based start line, name) of each top-level function and class, or None if the source does not parse."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    boundaries = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            first_line = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            boundaries.append((first_line - 1, node.name))
+    return boundaries
+
+
+def _heuristic_boundaries(lines: List[str], language: str) -> List[Tuple[int, str]]:
+    pattern = _DEFINITION_PATTERNS.get(language)
+    boundaries = []
+    for index, line in enumerate(lines):
+        if not line.strip() or line[0].isspace():
+            continue
+        if pattern is not None:
+            match = pattern.match(line)
+            if match:
+                name = _IDENTIFIER_PATTERN.search(line, match.end())
+                boundaries.append((index, name.group(0) if name else ""))
+        elif index > 0 and not lines[index - 1].strip():
+            boundaries.append((index, ""))
+    return boundaries
+
+
+def _with_leading_comments(lines: List[str], start: int, floor: int) -> int:
+    """Moves a definition's start up over the comment lines directly above it."""
+    while start - 1 > floor and _COMMENT_PATTERN.match(lines[start - 1]):
+        start -= 1
+    return start
+
+
+def split_source(source: str, language: str, budget: int) -> List[SourceChunk]:
+    """
+    Splits a source file into chunks of at most ~`budget` tokens along top-level definitions: functions and
+    classes found with `ast` for Python, and line heuristics for other languages (or Python that does not parse).
+    Consecutive definitions are packed into one chunk while they fit; a definition larger than the budget
+    is cut at line boundaries. Code before the first definition (imports, constants) goes with the first chunk.
+    """
+    # Split only at \n, \r\n and \r, as `ast` does; str.splitlines also splits at form feeds and others.
+    lines = io.StringIO(source, newline="").readlines()
+    if not lines:
+        return [SourceChunk(text=source, start_line=1, end_line=1)]
+
+    boundaries = _python_boundaries(source) if language == "Python" else None
+    if boundaries is None:
+        boundaries = _heuristic_boundaries(lines, language)
+
+    # Segments: [start, end) line ranges, one per definition, the first one starting at the top of the file.
+    starts: List[Tuple[int, str]] = []
+    for start, name in boundaries:
+        start = _with_leading_comments(lines, start, floor=starts[-1][0] if starts else 0)
+        starts.append((start, name))
+    if not starts or starts[0][0] > 0:
+        starts.insert(0, (0, ""))
+    segments = [
+        (start, starts[index + 1][0] if index + 1 < len(starts) else len(lines), name)
+        for index, (start, name) in enumerate(starts)
+    ]
+
+    chunks: List[SourceChunk] = []
+    current: Optional[SourceChunk] = None
+    current_tokens = 0
+    for start, end, name in segments:
+        text = "".join(lines[start:end])
+        tokens = count_tokens(text)
+        if tokens > budget:
+            if current:
+                chunks.append(current)
+                current, current_tokens = None, 0
+            line = start + 1
+            for piece in split_text_by_tokens(text, budget):
+                piece_lines = max(piece.count("\n"), 1)
+                chunks.append(SourceChunk(text=piece, start_line=line, end_line=line + piece_lines - 1, names=[name] if name else []))
+                line += piece.count("\n")
+            continue
+        if current and current_tokens + tokens > budget:
+            chunks.append(current)
+            current, current_tokens = None, 0
+        if current is None:
+            current = SourceChunk(text="", start_line=start + 1, end_line=start + 1)
+        current.text += text
+        current.end_line = end
+        if name:
+            current.names.append(name)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
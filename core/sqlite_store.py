@@ -0,0 +1,59 @@
+# core/sqlite_store.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Generic, Iterable, Iterator, Optional, TypeVar
+
+
+class SQLiteStore:
+    """
+    One SQLite file shared by every thread of the process. The connection is opened on first use, so
+    importing the API does not touch the filesystem: the file's directory is created, the `schema`
+    statements are run, then `on_open(connection)`. Every use holds the store's lock.
+    """
+
+    def __init__(self, sqlite_path: str, schema: Iterable[str], on_open: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.sqlite_path = sqlite_path
+        self._schema = tuple(schema)
+        self._on_open = on_open
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """The connection, held under the store's lock for the duration of the block."""
+        with self._lock:
+            yield self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.sqlite_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+            for statement in self._schema:
+                connection.execute(statement)
+            if self._on_open is not None:
+                self._on_open(connection)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+
+StoreT = TypeVar("StoreT")
+
+
+class StoreRegistry(Generic[StoreT]):
+    """The process-wide store for each SQLite path, built by `factory(path)` on first use, so all requests share one connection."""
+
+    def __init__(self, factory: Callable[[str], StoreT]):
+        self._factory = factory
+        self._stores: Dict[str, StoreT] = {}
+        self._lock = threading.Lock()
+
+    def get(self, sqlite_path: str) -> StoreT:
+        with self._lock:
+            if sqlite_path not in self._stores:
+                self._stores[sqlite_path] = self._factory(sqlite_path)
+            return self._stores[sqlite_path]
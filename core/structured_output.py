@@ -0,0 +1,296 @@
+# core/structured_output.py
+import json
+import re
+import threading
+from typing import Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.utils.json import parse_json_markdown
+from pydantic import BaseModel, ValidationError
+
+from config.prompt_loader import get_prompt_template_for_task
+from config.settings import get_section_settings
+from core.metrics import METRICS
+
+# Template of the re-ask prompt; it gets the format instructions, the bad output and the parser error.
+REPAIR_PROMPT_NAME = "structured_output_repair"
+REPAIR_PROMPT_VARIABLES = {"format_instructions", "output", "error"}
+
+STRUCTURED_OUTPUTS = METRICS.counter(
+    "ai_structured_outputs_total",
+    "Structured task outputs by how they were obtained: parsed as is, repaired locally, after re-asks, or failed.",
+    ["task", "outcome"],
+)
+STRUCTURED_OUTPUT_REASKS = METRICS.counter(
+    "ai_structured_output_reasks_total", "LLM calls made to fix a structured output that did not parse.", ["task"]
+)
+
+OUTCOMES = ("parsed", "repaired", "reasked", "failed")
+
+_FENCED_BLOCK_PATTERN = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSING = {"{": "}", "[": "]"}
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def extract_json_block(text: str) -> str:
+    """
+    The part of a model answer that holds the JSON value: everything from the first `{` or `[` to its matching
+    bracket (or to the end, when the answer was cut off), looking inside the fenced block that opens before it.
+    """
+    start = _first_bracket(text)
+    fenced = _FENCED_BLOCK_PATTERN.search(text)
+    # A fence after the first bracket is part of a string value (e.g. Markdown with a code block), not a wrapper.
+    if fenced and fenced.start() < start and fenced.group(1).strip():
+        text = fenced.group(1)
+        start = _first_bracket(text)
+    if start < 0:
+        return text.strip()
+    depth, in_string, quote, escaped = 0, False, "", False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                in_string = False
+        elif char in "\"'":
+            in_string, quote = True, char
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return text[start:]
+
+
+def _first_bracket(text: str) -> int:
+    return min((index for index in (text.find("{"), text.find("[")) if index >= 0), default=-1)
+
+
+def repair_json(text: str) -> str:
+    """
+    Fixes the mistakes small models typically make in JSON: single-quoted strings, Python's True/False/None,
+    raw newlines inside strings, trailing commas, and strings or brackets left open by a truncated answer.
+    Anything else is left for the parser to report.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    index, length = 0, len(text)
+    while index < length:
+        char = text[index]
+        if char in "\"'":
+            index = _copy_string(text, index, out)
+            continue
+        if char in "{[":
+            stack.append(_CLOSING[char])
+        elif char in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+        elif char.isalpha():
+            end = index
+            while end < length and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[index:end]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            index = end
+            continue
+        out.append(char)
+        index += 1
+    # A truncated answer: drop a dangling separator, then close what is still open.
+    while out and (out[-1].isspace() or out[-1] in ",:"):
+        out.pop()
+    out.extend(reversed(stack))
+    return "".join(out)
+
+
+def _copy_string(text: str, start: int, out: List[str]) -> int:
+    """Appends the string literal starting at `start` as a valid JSON string; returns the index after it."""
+    quote = text[start]
+    parts = ['"']
+    index = start + 1
+    while index < len(text):
+        char = text[index]
+        if char == "\\" and index + 1 < len(text):
+            following = text[index + 1]
+            # `\'` is not a JSON escape; the quote needs none inside a double-quoted string.
+            parts.append("'" if following == "'" else char + following)
+            index += 2
+            continue
+        if char == quote:
+            parts.append('"')
+            out.append("".join(parts))
+            return index + 1
+        if char == '"':
+            parts.append('\\"')
+        elif char == "\n":
+            parts.append("\\n")
+        elif char == "\t":
+            parts.append("\\t")
+        else:
+            parts.append(char)
+        index += 1
+    parts.append('"')
+    out.append("".join(parts))
+    return index
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    position = len(out) - 1
+    while position >= 0 and out[position].isspace():
+        position -= 1
+    if position >= 0 and out[position] == ",":
+        del out[position]
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc']) or 'value'}: {item['msg']}" for item in error.errors())
+
+
+def _message_text(message: Any) -> str:
+    content = message.content if isinstance(message, BaseMessage) else message
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+    return str(content)
+
+
+class _StructuredOutputStats:
+    """Outcome and re-ask counts per task, for `/stats/structured-output`."""
+
+    def __init__(self):
+        self._tasks: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, task_name: str, outcome: str, reasks: int) -> None:
+        STRUCTURED_OUTPUTS.inc(task=task_name, outcome=outcome)
+        with self._lock:
+            counts = self._tasks.setdefault(task_name, {**{name: 0 for name in OUTCOMES}, "reasks": 0})
+            counts[outcome] += 1
+            counts["reasks"] += reasks
+
+    def stats(self) -> dict:
+        with self._lock:
+            tasks = {name: dict(counts) for name, counts in self._tasks.items()}
+        for counts in tasks.values():
+            outputs = sum(counts[name] for name in OUTCOMES)
+            counts["outputs"] = outputs
+            counts["repair_rate"] = round(counts["repaired"] / outputs, 4) if outputs else 0.0
+            counts["reask_rate"] = round(counts["reasked"] / outputs, 4) if outputs else 0.0
+        return tasks
+
+
+STRUCTURED_OUTPUT_STATS = _StructuredOutputStats()
+
+
+class StructuredOutputParser(Runnable[Any, ModelT], Generic[ModelT]):
+    """
+    Drop-in replacement for `PydanticOutputParser` at the end of a `prompt | llm | parser` chain, for answers
+    that are validated against a Pydantic model. It tries, in order and stopping at the first that validates:
+
+    - the tool call arguments of the message, when the provider answered in tool-calling mode;
+    - the answer as `PydanticOutputParser` would read it (plain JSON, or JSON in a Markdown fence);
+    - the JSON block cut out of the answer and repaired locally (`extract_json_block` + `repair_json`);
+    - up to `max_reasks` calls to `llm` that send the bad output and the parser error (not the original
+      prompt) and ask for the corrected JSON; each answer goes through the steps above again.
+
+    Raises OutputParserException when every step failed. Outcomes and re-asks are counted per task.
+    """
+
+    def __init__(self, pydantic_object: Type[ModelT], llm: Runnable, task_name: str, max_reasks: int = 2,
+                 local_repair: bool = True, reask_max_output_chars: int = 8000):
+        self.pydantic_object = pydantic_object
+        self.llm = llm
+        self.task_name = task_name
+        self.max_reasks = max(int(max_reasks), 0)
+        self.local_repair = local_repair
+        self.reask_max_output_chars = int(reask_max_output_chars)
+        self._format_parser = PydanticOutputParser(pydantic_object=pydantic_object)
+
+    def get_format_instructions(self) -> str:
+        return self._format_parser.get_format_instructions()
+
+    def parse(self, message: Any) -> Tuple[Optional[ModelT], bool, str]:
+        """Returns (result, repaired, error) for one answer, without calling the LLM: the result is None on failure."""
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            try:
+                return self.pydantic_object.model_validate(tool_call["args"]), False, ""
+            except ValidationError as e:
+                return None, False, _format_validation_error(e)
+        text = _message_text(message)
+        try:
+            return self.pydantic_object.model_validate(parse_json_markdown(text)), False, ""
+        except ValidationError as e:
+            # Also what a lenient parse of badly broken JSON looks like (e.g. `{}`), so repair is still worth a try.
+            error = _format_validation_error(e)
+        except ValueError as e:
+            error = f"Invalid JSON: {e}"
+        if not self.local_repair:
+            return None, False, error
+        try:
+            return self.pydantic_object.model_validate(json.loads(repair_json(extract_json_block(text)))), True, ""
+        except ValidationError as e:
+            return None, False, _format_validation_error(e)
+        except ValueError:
+            return None, False, error
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> ModelT:
+        result, repaired, error = self.parse(input)
+        reasks = 0
+        while result is None and reasks < self.max_reasks:
+            reasks += 1
+            STRUCTURED_OUTPUT_REASKS.inc(task=self.task_name)
+            input = self.llm.invoke(self._reask_prompt(input, error), config)
+            result, _, error = self.parse(input)
+        return self._finish(result, repaired, reasks, error, input)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> ModelT:
+        result, repaired, error = self.parse(input)
+        reasks = 0
+        while result is None and reasks < self.max_reasks:
+            reasks += 1
+            STRUCTURED_OUTPUT_REASKS.inc(task=self.task_name)
+            input = await self.llm.ainvoke(self._reask_prompt(input, error), config)
+            result, _, error = self.parse(input)
+        return self._finish(result, repaired, reasks, error, input)
+
+    def _reask_prompt(self, message: Any, error: str) -> Any:
+        output = _message_text(message)
+        if not output and getattr(message, "tool_calls", None):
+            output = json.dumps(message.tool_calls[0]["args"], default=str)
+        if len(output) > self.reask_max_output_chars:
+            output = output[:self.reask_max_output_chars] + "\n[... output cut ...]"
+        return get_prompt_template_for_task(REPAIR_PROMPT_NAME).invoke(
+            {"format_instructions": self.get_format_instructions(), "output": output, "error": error}
+        )
+
+    def _finish(self, result: Optional[ModelT], repaired: bool, reasks: int, error: str, message: Any) -> ModelT:
+        if result is None:
+            STRUCTURED_OUTPUT_STATS.record(self.task_name, "failed", reasks)
+            raise OutputParserException(
+                f"Failed to parse {self.pydantic_object.__name__} after {reasks} re-ask(s): {error}",
+                llm_output=_message_text(message),
+            )
+        outcome = "reasked" if reasks else "repaired" if repaired else "parsed"
+        STRUCTURED_OUTPUT_STATS.record(self.task_name, outcome, reasks)
+        return result
+
+
+def structured_output_parser(pydantic_object: Type[ModelT], llm: Runnable, task_name: str) -> StructuredOutputParser[ModelT]:
+    """A StructuredOutputParser configured from the task's `structured_output` settings; `llm` is used for re-asks."""
+    settings = get_section_settings("structured_output", task_name)
+    return StructuredOutputParser(
+        pydantic_object,
+        llm,
+        task_name,
+        max_reasks=settings.get("max_reasks", 2),
+        local_repair=settings.get("local_repair", True),
+        reask_max_output_chars=settings.get("reask_max_output_chars", 8000),
+    )
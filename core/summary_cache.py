@@ -0,0 +1,44 @@
+# core/summary_cache.py
+import time
+from typing import Dict, Iterable
+
+from core.sqlite_store import SQLiteStore, StoreRegistry
+
+
+class SummaryCache:
+    """
+    Persistent map from a content-addressed key to a summary text, stored in SQLite.
+    Keys are derived from the content being summarised, so entries never go stale and need no TTL.
+    """
+
+    def __init__(self, sqlite_path: str):
+        self.sqlite_path = sqlite_path
+        self._store = SQLiteStore(
+            sqlite_path, ["CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at REAL NOT NULL)"]
+        )
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(set(keys))
+        found: Dict[str, str] = {}
+        with self._store.connection() as connection:
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = connection.execute(f"SELECT key, summary FROM summaries WHERE key IN ({placeholders})", chunk)
+                found.update(rows.fetchall())
+        return found
+
+    def put(self, key: str, summary: str) -> None:
+        with self._store.connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created_at) VALUES (?, ?, ?)", (key, summary, time.time())
+            )
+            connection.commit()
+
+
+_summary_caches = StoreRegistry(SummaryCache)
+
+def get_summary_cache(sqlite_path: str) -> SummaryCache:
+    """Returns the process-wide SummaryCache for `sqlite_path`, so all requests share one connection."""
+    return _summary_caches.get(sqlite_path)
@@ -0,0 +1,82 @@
+# core/task_registry.py
+import importlib
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from config.settings import get_section_settings, getenv
+from core.concurrency import run_in_worker_thread
+
+# A task's service: (module, service class, request model class), e.g. ("services.docs_service", "DocsService", "DocsRequest").
+TaskSpec = Tuple[str, str, str]
+
+
+def enabled_task_names(available: Iterable[str]) -> list:
+    """
+    The tasks this deployment serves: the comma-separated ENABLED_TASKS environment variable, else
+    `server.enabled_tasks` from llm_settings.yaml, else every available task. Unknown names raise ValueError.
+    """
+    available = list(available)
+    configured = getenv("ENABLED_TASKS")
+    names = [name.strip() for name in configured.split(",") if name.strip()] if configured else get_section_settings("server").get("enabled_tasks") or []
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        raise ValueError(f"Unknown task(s) in the enabled task list: {unknown}. Available: {available}")
+    return [name for name in available if name in names] if names else available
+
+
+class TaskRegistry(Mapping):
+    """
+    Maps each enabled task to (service instance, request model), importing the service module and creating
+    the service's single instance on first use, so a deployment only pays for the tasks it actually serves.
+    `on_load` is called with every service instance as it is created. Membership checks never import anything.
+    On the event loop, use `aget`: it imports a service that is not loaded yet in a worker thread.
+    """
+
+    def __init__(self, specs: Dict[str, TaskSpec], enabled: Optional[Iterable[str]] = None, on_load: Optional[Callable[[Any], None]] = None):
+        self._specs = {name: specs[name] for name in (enabled if enabled is not None else specs)}
+        self._on_load = on_load
+        self._entries: Dict[str, Tuple[Any, type]] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, task_name: str) -> Tuple[Any, type]:
+        entry = self._entries.get(task_name)
+        if entry is not None:
+            return entry
+        if task_name not in self._specs:
+            raise KeyError(task_name)
+        with self._lock:
+            if task_name not in self._entries:
+                module_name, service_class_name, request_model_name = self._specs[task_name]
+                module = importlib.import_module(module_name)
+                service_instance = getattr(module, service_class_name)(task_name)
+                if self._on_load is not None:
+                    self._on_load(service_instance)
+                self._entries[task_name] = (service_instance, getattr(module, request_model_name))
+                print(f"INFO: Loaded service for task '{task_name}'.")
+            return self._entries[task_name]
+
+    async def aget(self, task_name: str) -> Tuple[Any, type]:
+        entry = self._entries.get(task_name)
+        if entry is not None:
+            return entry
+        if task_name not in self._specs:
+            raise KeyError(task_name)
+        return await run_in_worker_thread(self.__getitem__, task_name)
+
+    def __contains__(self, task_name: object) -> bool:
+        return task_name in self._specs
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._specs)
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def load_all(self) -> None:
+        """Imports and creates every enabled service now instead of on first use."""
+        for task_name in self._specs:
+            self[task_name]
+
+    def loaded_tasks(self) -> list:
+        return [task_name for task_name in self._specs if task_name in self._entries]
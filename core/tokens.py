@@ -0,0 +1,67 @@
+# core/tokens.py
+import math
+import re
+from typing import List
+
+# Words, numbers and single punctuation marks. Long words are charged one token per ~4 characters,
+# which tracks BPE tokenizers closely enough for budgeting, without loading a tokenizer or touching the network.
+_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+_CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text: str) -> int:
+    """Estimates the number of tokens in `text` with a local heuristic."""
+    return sum(math.ceil(len(piece) / _CHARS_PER_TOKEN) for piece in _PIECE_PATTERN.findall(text))
+
+
+def group_by_token_budget(texts: List[str], budget: int, separator: str = "") -> List[List[str]]:
+    """
+    Packs consecutive texts into groups whose joined size stays within `budget` tokens.
+    A text that is larger than the budget on its own gets a group of its own.
+    """
+    separator_tokens = count_tokens(separator)
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        extra = tokens + (separator_tokens if current else 0)
+        if current and current_tokens + extra > budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+            extra = tokens
+        current.append(text)
+        current_tokens += extra
+    if current:
+        groups.append(current)
+    return groups
+
+
+def split_text_by_tokens(text: str, budget: int) -> List[str]:
+    """
+    Splits `text` into pieces of at most ~`budget` tokens, cutting at line boundaries.
+    A single line that is larger than the budget is cut by characters.
+    """
+    if count_tokens(text) <= budget:
+        return [text]
+
+    pieces: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = count_tokens(line)
+        if line_tokens > budget:
+            if current:
+                pieces.append("".join(current))
+                current, current_tokens = [], 0
+            step = budget * _CHARS_PER_TOKEN
+            pieces.extend(line[start:start + step] for start in range(0, len(line), step))
+            continue
+        if current and current_tokens + line_tokens > budget:
+            pieces.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        pieces.append("".join(current))
+    return pieces
@@ -0,0 +1,755 @@
+# core/workspace_index.py
+import codecs
+import ctypes
+import ctypes.util
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from config.settings import get_section_settings
+from core import file_discovery
+from core.file_discovery import (
+    BINARY_SNIFF_BYTES,
+    DEFAULT_EXCLUDED_DIRS,
+    DEFAULT_MAX_FILE_BYTES,
+    DEFAULT_SOURCE_EXTENSIONS,
+    is_ignored,
+    load_gitignore,
+)
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": "Python", ".rb": "Ruby", ".js": "JavaScript", ".jsx": "JavaScript", ".mjs": "JavaScript",
+    ".ts": "TypeScript", ".tsx": "TypeScript", ".go": "Go", ".java": "Java", ".kt": "Kotlin", ".rs": "Rust",
+    ".c": "C", ".h": "C", ".cc": "C++", ".cpp": "C++", ".hpp": "C++", ".cs": "C#", ".php": "PHP",
+    ".swift": "Swift", ".scala": "Scala", ".sh": "Shell", ".sql": "SQL", ".html": "HTML", ".css": "CSS",
+    ".md": "Markdown", ".rst": "reStructuredText", ".json": "JSON", ".yaml": "YAML", ".yml": "YAML", ".toml": "TOML",
+}
+
+
+def detect_language(path: str) -> Optional[str]:
+    """The language of a file from its extension, or None when it is not one we know."""
+    return LANGUAGE_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+
+
+def _is_within(path: str, root: str) -> bool:
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def _join(relative_dir: str, name: str) -> str:
+    return f"{relative_dir}/{name}" if relative_dir else name
+
+
+# --- File contents ---
+def _read_bytes_as_text(path: str, mmap_min_bytes: int) -> Tuple[str, bool]:
+    """Decodes the file as UTF-8 (raises UnicodeDecodeError otherwise); large files are decoded straight from an mmap."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= mmap_min_bytes and size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return codecs.utf_8_decode(mapped, "strict", True)[0], True
+        return f.read().decode("utf-8"), False
+
+
+def _hash_file(path: str, mmap_min_bytes: int) -> Tuple[str, bool]:
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= mmap_min_bytes and size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return hashlib.sha256(mapped).hexdigest(), True
+        return hashlib.sha256(f.read()).hexdigest(), False
+
+
+class _TextCache:
+    """Decoded file contents, least recently used first out, bounded by their total size in characters."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], str]]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, version: Tuple[int, int]) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, path: str, version: Tuple[int, int], text: str) -> None:
+        # A file that would take over most of the cache is not worth keeping.
+        if len(text) > self.max_chars // 4:
+            return
+        with self._lock:
+            self._discard_locked(path)
+            self._entries[path] = (version, text)
+            self._chars += len(text)
+            while self._chars > self.max_chars:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def discard(self, path: str) -> None:
+        with self._lock:
+            self._discard_locked(path)
+
+    def _discard_locked(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._chars -= len(entry[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "chars": self._chars, "hits": self.hits, "misses": self.misses}
+
+
+# --- inotify ---
+_IN_MODIFY, _IN_ATTRIB, _IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+_IN_MOVED_FROM, _IN_MOVED_TO, _IN_CREATE, _IN_DELETE = 0x40, 0x80, 0x100, 0x200
+_IN_Q_OVERFLOW, _IN_IGNORED = 0x4000, 0x8000
+_IN_ONLYDIR, _IN_DONT_FOLLOW = 0x01000000, 0x02000000
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+    | _IN_ONLYDIR | _IN_DONT_FOLLOW
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _InotifyWatcher:
+    """
+    Linux inotify through ctypes (no extra dependency): one watch per indexed directory, read without
+    blocking whenever the index is queried. Raises OSError (or AttributeError off Linux) when unavailable.
+    """
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        descriptor = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1 failed: {os.strerror(error)}")
+        self._descriptor = descriptor
+        self._directories: Dict[int, str] = {}
+
+    def add(self, path: str, relative_dir: str) -> None:
+        # Watching the same directory again returns its existing descriptor; a moved directory gets its new path.
+        watch = self._libc.inotify_add_watch(self._descriptor, os.fsencode(path), _WATCH_MASK)
+        if watch < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_add_watch failed for '{path}': {os.strerror(error)}")
+        self._directories[watch] = relative_dir
+
+    def drain(self) -> Optional[Tuple[Set[str], Set[str]]]:
+        """
+        (directories whose entries or files changed, directories whose .gitignore changed) since the last call,
+        or None when the kernel dropped events and the whole tree must be scanned again.
+        """
+        changed: Set[str] = set()
+        ignore_changed: Set[str] = set()
+        lost = False
+        while True:
+            try:
+                data = os.read(self._descriptor, 65536)
+            except BlockingIOError:
+                return None if lost else (changed, ignore_changed)
+            offset = 0
+            while offset < len(data):
+                watch, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += _EVENT_HEADER.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    lost = True
+                    continue
+                if mask & _IN_IGNORED:
+                    self._directories.pop(watch, None)
+                    continue
+                directory = self._directories.get(watch)
+                if directory is None:
+                    continue
+                changed.add(directory)
+                if name == b".gitignore":
+                    ignore_changed.add(directory)
+
+    def close(self) -> None:
+        os.close(self._descriptor)
+
+
+# --- Index ---
+@dataclass
+class IndexedFile:
+    """A file of the index. `content_hash` is computed on first use and dropped when the size or mtime change."""
+
+    path: str
+    relative_path: str
+    size: int
+    mtime_ns: int
+    language: Optional[str]
+    content_hash: Optional[str] = None
+
+
+@dataclass
+class _IndexedDirectory:
+    # -1 until the directory has been listed.
+    mtime_ns: int
+    # The .gitignore scopes that apply to its entries (see `file_discovery.is_ignored`).
+    scopes: list
+    files: List[str] = field(default_factory=list)
+    subdirectories: List[str] = field(default_factory=list)
+
+
+class WorkspaceIndex:
+    """
+    The files under one directory, pruned like `file_discovery.iter_source_files` (excluded directories and
+    .gitignore rules, any extension, any size), with their size, mtime, language and content hash. Queries
+    for a subdirectory also honour the .gitignore files above it, up to the index root, as git does.
+
+    The tree is walked once, on first use. Afterwards inotify reports which directories changed, so a query
+    only re-lists those; without inotify (not Linux, a network mount, the watch limit reached) an mtime scan
+    at most every `rescan_interval_seconds` re-stats the files and re-lists the directories whose mtime
+    changed. Writes made by this process can be reported with `mark_changed` so they show up at once.
+    Reads are validated against the file's size and mtime, served from a bounded cache of decoded contents,
+    and large files are decoded and hashed through mmap.
+    """
+
+    def __init__(self, root: str, watch: bool = True, rescan_interval_seconds: float = 1.0,
+                 mmap_min_bytes: int = 256 * 1024, text_cache_max_chars: int = 64 * 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.rescan_interval_seconds = rescan_interval_seconds
+        self.mmap_min_bytes = mmap_min_bytes
+        self._files: Dict[str, IndexedFile] = {}
+        self._directories: Dict[str, _IndexedDirectory] = {}
+        self._pending: Set[str] = set()
+        # Bumped whenever a file is added, changed or dropped; directory fingerprints are cached per generation.
+        self._generation = 0
+        self._fingerprints: Dict[str, str] = {}
+        self._fingerprints_generation = -1
+        self._lock = threading.RLock()
+        self._text_cache = _TextCache(text_cache_max_chars)
+        self._built = False
+        self._scanned_at = 0.0
+        self._watcher: Optional[_InotifyWatcher] = None
+        if watch:
+            try:
+                self._watcher = _InotifyWatcher()
+            except (OSError, AttributeError) as e:
+                print(f"INFO: inotify is not available for '{self.root}' ({e}); the workspace index falls back to mtime scans.")
+        self.full_scans = 0
+        self.mtime_scans = 0
+        self.directories_listed = 0
+        self.reads = 0
+        self.mmap_reads = 0
+        self.hashes_computed = 0
+        self.hash_hits = 0
+        self.fingerprint_hits = 0
+
+    # --- Paths ---
+    def __contains__(self, path: str) -> bool:
+        return _is_within(os.path.abspath(path), self.root)
+
+    def _relative(self, path: str) -> str:
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        return "" if relative == "." else relative.replace(os.sep, "/")
+
+    def _absolute(self, relative_path: str) -> str:
+        return os.path.join(self.root, relative_path) if relative_path else self.root
+
+    # --- Scanning ---
+    def refresh(self, force: bool = False) -> None:
+        """
+        Brings the index up to date: applies inotify events, or runs an mtime scan when the last one is older
+        than `rescan_interval_seconds` (always with `force`). Paths from `mark_changed` are applied either way.
+        """
+        with self._lock:
+            if not self._built:
+                self._full_scan()
+                return
+            pending, self._pending = self._pending, set()
+            if self._watcher is not None:
+                try:
+                    drained = self._watcher.drain()
+                except OSError as e:
+                    print(f"WARNING: Lost the inotify watches of '{self.root}' ({e}); falling back to mtime scans.")
+                    self._watcher = None
+                    drained = None
+                if drained is None:
+                    self._full_scan()
+                    return
+                changed, ignore_changed = drained
+                for relative_dir in sorted(ignore_changed):
+                    self._rescan_tree(relative_dir)
+                for relative_dir in sorted(changed | {self._nearest_directory(path) for path in pending}):
+                    self._relist(relative_dir)
+                return
+            if force or time.monotonic() - self._scanned_at >= self.rescan_interval_seconds:
+                self._mtime_scan()
+            else:
+                for relative_dir in sorted({self._nearest_directory(path) for path in pending}):
+                    self._relist(relative_dir)
+
+    def mark_changed(self, path: str) -> None:
+        """Reports a write, creation or deletion at `path` (inside the index), so the next query sees it."""
+        absolute = os.path.abspath(path)
+        self._text_cache.discard(absolute)
+        with self._lock:
+            self._pending.add(self._relative(os.path.dirname(absolute)))
+            entry = self._files.get(self._relative(absolute))
+            if entry is not None:
+                entry.content_hash = None
+
+    def _nearest_directory(self, relative_dir: str) -> str:
+        """`relative_dir`, or its closest ancestor in the index (a write may have created directories)."""
+        while relative_dir and relative_dir not in self._directories:
+            relative_dir = relative_dir.rpartition("/")[0]
+        return relative_dir
+
+    def _full_scan(self) -> None:
+        self._generation += 1
+        self._files.clear()
+        self._directories.clear()
+        self._scan_tree("", [])
+        self._built = True
+        self._scanned_at = time.monotonic()
+        self.full_scans += 1
+
+    def _mtime_scan(self) -> None:
+        for relative_dir in list(self._directories):
+            directory = self._directories.get(relative_dir)
+            if directory is None:
+                continue  # Dropped by the re-listing of its parent earlier in this scan.
+            try:
+                mtime_ns = os.stat(self._absolute(relative_dir), follow_symlinks=False).st_mtime_ns
+            except OSError:
+                self._forget_tree(relative_dir)
+                continue
+            if mtime_ns != directory.mtime_ns:
+                self._relist(relative_dir)
+                continue
+            # Changing a file's content leaves its directory's mtime alone.
+            for name in directory.files:
+                relative_path = _join(relative_dir, name)
+                try:
+                    stat = os.stat(self._absolute(relative_path), follow_symlinks=False)
+                except OSError:
+                    self._relist(relative_dir)
+                    break
+                if self._update_file(relative_path, stat) and name == ".gitignore":
+                    self._rescan_tree(relative_dir)
+                    break
+        self._scanned_at = time.monotonic()
+        self.mtime_scans += 1
+
+    def _scan_tree(self, relative_dir: str, parent_scopes: list) -> None:
+        """Indexes `relative_dir` and everything below it."""
+        stack = [(relative_dir, parent_scopes)]
+        while stack:
+            current, scopes = stack.pop()
+            rules = load_gitignore(self._absolute(current))
+            self._directories[current] = _IndexedDirectory(mtime_ns=-1, scopes=scopes + [(current, rules)] if rules else scopes)
+            for subdirectory in reversed(self._list_directory(current) or []):
+                stack.append((subdirectory, self._directories[current].scopes))
+
+    def _rescan_tree(self, relative_dir: str) -> None:
+        """Indexes a directory again from scratch, e.g. after its .gitignore changed."""
+        if relative_dir not in self._directories:
+            return
+        parent = self._directories.get(relative_dir.rpartition("/")[0]) if relative_dir else None
+        self._forget_tree(relative_dir)
+        self._scan_tree(relative_dir, parent.scopes if parent is not None else [])
+
+    def _relist(self, relative_dir: str) -> None:
+        """Lists a known directory again; new subdirectories are indexed in full."""
+        directory = self._directories.get(relative_dir)
+        if directory is None:
+            return
+        new_subdirectories = self._list_directory(relative_dir)
+        if new_subdirectories is None:
+            self._rescan_tree(relative_dir)
+            return
+        for subdirectory in new_subdirectories:
+            self._scan_tree(subdirectory, directory.scopes)
+
+    def _list_directory(self, relative_dir: str) -> Optional[List[str]]:
+        """
+        Reads one directory's entries into the index and drops the ones that are gone. Returns the subdirectories
+        that are new to the index, or None when its .gitignore changed and the whole tree below needs rescanning.
+        """
+        directory = self._directories[relative_dir]
+        absolute = self._absolute(relative_dir)
+        try:
+            if self._watcher is not None:
+                self._watch(absolute, relative_dir)
+            mtime_ns = os.stat(absolute, follow_symlinks=False).st_mtime_ns
+            with os.scandir(absolute) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            self._forget_tree(relative_dir)
+            return []
+
+        files, subdirectories, ignore_changed = [], [], False
+        for entry in entries:
+            relative_path = _join(relative_dir, entry.name)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file(follow_symlinks=False):
+                    continue
+                if is_dir and entry.name in DEFAULT_EXCLUDED_DIRS:
+                    continue
+                if directory.scopes and is_ignored(directory.scopes, relative_path, is_dir):
+                    continue
+                if is_dir:
+                    subdirectories.append(entry.name)
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            files.append(entry.name)
+            if self._update_file(relative_path, stat) and entry.name == ".gitignore":
+                ignore_changed = True
+
+        listed_before = directory.mtime_ns != -1
+        if listed_before and (ignore_changed or (".gitignore" in files) != (".gitignore" in directory.files)):
+            return None
+        for name in set(directory.files).difference(files):
+            self._generation += 1
+            self._files.pop(_join(relative_dir, name), None)
+            self._text_cache.discard(os.path.join(absolute, name))
+        for name in set(directory.subdirectories).difference(subdirectories):
+            self._forget_tree(_join(relative_dir, name))
+        new_subdirectories = [_join(relative_dir, name) for name in subdirectories if _join(relative_dir, name) not in self._directories]
+        directory.mtime_ns, directory.files, directory.subdirectories = mtime_ns, files, subdirectories
+        self.directories_listed += 1
+        return new_subdirectories
+
+    def _watch(self, absolute: str, relative_dir: str) -> None:
+        try:
+            self._watcher.add(absolute, relative_dir)
+        except OSError as e:
+            # Typically ENOSPC: fs.inotify.max_user_watches is exhausted.
+            print(f"WARNING: Cannot watch '{absolute}' ({e}); the workspace index of '{self.root}' falls back to mtime scans.")
+            self._watcher.close()
+            self._watcher = None
+
+    def _update_file(self, relative_path: str, stat: os.stat_result) -> bool:
+        """Records a file's stat; returns True when a file already in the index changed."""
+        existing = self._files.get(relative_path)
+        if existing is not None and existing.size == stat.st_size and existing.mtime_ns == stat.st_mtime_ns:
+            return False
+        self._generation += 1
+        self._files[relative_path] = IndexedFile(
+            path=self._absolute(relative_path),
+            relative_path=relative_path,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            language=detect_language(relative_path),
+        )
+        return existing is not None
+
+    def _forget_tree(self, relative_dir: str) -> None:
+        stack = [relative_dir]
+        while stack:
+            current = stack.pop()
+            directory = self._directories.pop(current, None)
+            if directory is None:
+                continue
+            for name in directory.files:
+                entry = self._files.pop(_join(current, name), None)
+                if entry is not None:
+                    self._generation += 1
+                    self._text_cache.discard(entry.path)
+            stack.extend(_join(current, name) for name in directory.subdirectories)
+
+    # --- Queries ---
+    def source_files(self, directory: str, extensions: Optional[Iterable[str]] = None,
+                     max_file_bytes: Optional[int] = None) -> Optional[List[IndexedFile]]:
+        """
+        The files under `directory` in the order `iter_source_files` yields them, filtered by extension and size,
+        or None when the directory is not in the index (missing, excluded or git-ignored).
+        """
+        extensions = frozenset(extensions) if extensions is not None else None
+        self.refresh()
+        with self._lock:
+            start = self._relative(directory)
+            if start not in self._directories:
+                return None
+            files = []
+            stack = [start]
+            while stack:
+                current = stack.pop()
+                entry = self._directories[current]
+                for name in entry.files:
+                    indexed = self._files[_join(current, name)]
+                    if extensions is not None and os.path.splitext(name)[1] not in extensions:
+                        continue
+                    if max_file_bytes is not None and indexed.size > max_file_bytes:
+                        continue
+                    files.append(indexed)
+                stack.extend(_join(current, name) for name in reversed(entry.subdirectories))
+            return files
+
+    def tree(self, directory: str, max_depth: int) -> Optional[List[Tuple[str, bool, int]]]:
+        """What `file_discovery.iter_tree` yields for `directory`, or None when it is not in the index."""
+        self.refresh()
+        with self._lock:
+            start = self._relative(directory)
+            if start not in self._directories:
+                return None
+            entries = []
+            stack = [(start, 0)]
+            while stack:
+                current, depth = stack.pop()
+                if depth:
+                    entries.append((current[len(start) + 1:] if start else current, current in self._directories, depth))
+                node = self._directories.get(current)
+                if node is None or depth >= max_depth:
+                    continue
+                children = sorted([(name, False) for name in node.files] + [(name, True) for name in node.subdirectories])
+                stack.extend((_join(current, name), depth + 1) for name, _ in reversed(children))
+            return entries
+
+    def fingerprint(self, path: str) -> str:
+        """
+        `file_discovery.path_fingerprint`, from the index: cached content hashes and the recorded sizes and mtimes.
+        A directory's fingerprint is computed once until a file under the index changes. Without inotify, it
+        misses changes made by other processes in the last `rescan_interval_seconds`.
+        """
+        if os.path.isfile(path):
+            return self.content_hash(path)
+        self.refresh()
+        with self._lock:
+            relative = self._relative(path)
+            if self._fingerprints_generation != self._generation:
+                self._fingerprints, self._fingerprints_generation = {}, self._generation
+            elif relative in self._fingerprints:
+                self.fingerprint_hits += 1
+                return self._fingerprints[relative]
+            files = self.source_files(path)
+            if files is None:
+                return file_discovery.path_fingerprint(path)
+            digest = hashlib.sha256()
+            for indexed in files:
+                digest.update(f"{indexed.path}\0{indexed.size}\0{indexed.mtime_ns}\n".encode("utf-8", "surrogateescape"))
+            # `source_files` may have applied newer changes; cache only what matches the current generation.
+            if self._fingerprints_generation == self._generation:
+                self._fingerprints[relative] = digest.hexdigest()
+            return digest.hexdigest()
+
+    def content_hash(self, path: str) -> str:
+        """The SHA-256 of the file's bytes, computed once per size and mtime; '' when it cannot be read."""
+        absolute = os.path.abspath(path)
+        try:
+            stat = os.stat(absolute)
+        except OSError:
+            return ""
+        relative_path = self._relative(absolute)
+        with self._lock:
+            indexed = self._files.get(relative_path)
+            if indexed is not None and indexed.content_hash and (indexed.size, indexed.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                self.hash_hits += 1
+                return indexed.content_hash
+        try:
+            content_hash, mapped = _hash_file(absolute, self.mmap_min_bytes)
+        except OSError:
+            return ""
+        with self._lock:
+            self.hashes_computed += 1
+            self.mmap_reads += mapped
+            indexed = self._files.get(relative_path)
+            if indexed is not None and (indexed.size, indexed.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                indexed.content_hash = content_hash
+        return content_hash
+
+    def read_text(self, path: str) -> str:
+        """
+        The file's content decoded as UTF-8 (raises OSError or UnicodeDecodeError like `open` would), served from
+        the cache while its size and mtime are unchanged.
+        """
+        absolute = os.path.abspath(path)
+        stat = os.stat(absolute)
+        version = (stat.st_size, stat.st_mtime_ns)
+        text, mapped = self._text_cache.get(absolute, version), False
+        if text is None:
+            text, mapped = _read_bytes_as_text(absolute, self.mmap_min_bytes)
+            self._text_cache.put(absolute, version, text)
+        with self._lock:
+            self.reads += 1
+            self.mmap_reads += mapped
+        return text
+
+    def close(self) -> None:
+        with self._lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            languages: Dict[str, int] = {}
+            for indexed in self._files.values():
+                if indexed.language:
+                    languages[indexed.language] = languages.get(indexed.language, 0) + 1
+            return {
+                "watch": "inotify" if self._watcher is not None else "mtime",
+                "files": len(self._files),
+                "directories": len(self._directories),
+                "bytes": sum(indexed.size for indexed in self._files.values()),
+                "languages": dict(sorted(languages.items(), key=lambda item: -item[1])),
+                "full_scans": self.full_scans,
+                "mtime_scans": self.mtime_scans,
+                "directories_listed": self.directories_listed,
+                "reads": self.reads,
+                "mmap_reads": self.mmap_reads,
+                "hashes_computed": self.hashes_computed,
+                "hash_hits": self.hash_hits,
+                "fingerprint_hits": self.fingerprint_hits,
+                "text_cache": self._text_cache.stats(),
+            }
+
+
+# --- Process-wide indexes ---
+# Directories under which indexes may be built when the `roots` setting is not given.
+DEFAULT_INDEX_ROOTS = ("/workspace",)
+_WORKSPACE_INDEXES: "OrderedDict[str, WorkspaceIndex]" = OrderedDict()
+_WORKSPACE_INDEXES_LOCK = threading.Lock()
+
+
+def _may_index(absolute: str, settings: dict) -> bool:
+    """Whether an index may be built for `absolute`: only inside the configured `roots`, as request paths come from clients."""
+    return any(_is_within(absolute, os.path.abspath(root)) for root in settings.get("roots") or DEFAULT_INDEX_ROOTS)
+
+
+def get_workspace_index(path: str, create: bool = True) -> Optional[WorkspaceIndex]:
+    """
+    The index that covers `path`. Without one, a new index rooted at `path` is made when `create` is set and
+    `path` is a directory inside one of the `roots` setting (it replaces the indexes of directories below it).
+    None when indexing is disabled, or when no index covers `path` and none may be made.
+    """
+    settings = get_section_settings("workspace_index")
+    if not settings.get("enabled", True):
+        return None
+    absolute = os.path.abspath(path)
+    with _WORKSPACE_INDEXES_LOCK:
+        for root, index in _WORKSPACE_INDEXES.items():
+            if absolute in index:
+                _WORKSPACE_INDEXES.move_to_end(root)
+                return index
+        if not create or not os.path.isdir(absolute) or not _may_index(absolute, settings):
+            return None
+        for root in [root for root in _WORKSPACE_INDEXES if _is_within(root, absolute)]:
+            _WORKSPACE_INDEXES.pop(root).close()
+        index = WorkspaceIndex(
+            absolute,
+            watch=settings.get("watch", "auto") != "off",
+            rescan_interval_seconds=float(settings.get("rescan_interval_seconds", 1.0)),
+            mmap_min_bytes=int(settings.get("mmap_min_bytes", 256 * 1024)),
+            text_cache_max_chars=int(settings.get("text_cache_max_chars", 64 * 1024 * 1024)),
+        )
+        _WORKSPACE_INDEXES[absolute] = index
+        while len(_WORKSPACE_INDEXES) > int(settings.get("max_roots", 8)):
+            _, evicted = _WORKSPACE_INDEXES.popitem(last=False)
+            evicted.close()
+        return index
+
+
+def workspace_index_stats() -> dict:
+    with _WORKSPACE_INDEXES_LOCK:
+        indexes = dict(_WORKSPACE_INDEXES)
+    return {root: index.stats() for root, index in indexes.items()}
+
+
+def mark_changed(paths: Iterable[str]) -> None:
+    """Reports files this process wrote or deleted to the indexes that cover them."""
+    for path in paths:
+        index = get_workspace_index(path, create=False)
+        if index is not None:
+            index.mark_changed(path)
+
+
+# --- Index-backed counterparts of the `file_discovery` helpers ---
+def iter_source_files(
+    root: str,
+    extensions: Optional[Iterable[str]] = DEFAULT_SOURCE_EXTENSIONS,
+    excluded_dirs: Iterable[str] = DEFAULT_EXCLUDED_DIRS,
+    max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+    respect_gitignore: bool = True,
+    index_root: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    `file_discovery.iter_source_files`, served from the workspace index of `index_root` (default: `root`).
+    Walks the directory instead when indexing is disabled or the options differ from what the index records.
+    """
+    files = None
+    if respect_gitignore and frozenset(excluded_dirs) == DEFAULT_EXCLUDED_DIRS:
+        index = get_workspace_index(index_root or root)
+        if index is not None and root in index:
+            files = index.source_files(root, extensions, max_file_bytes)
+    if files is None:
+        yield from file_discovery.iter_source_files(root, extensions, excluded_dirs, max_file_bytes, respect_gitignore)
+        return
+    for indexed in files:
+        yield indexed.path
+
+
+def iter_tree(root: str, max_depth: int = 3, index_root: Optional[str] = None) -> Iterator[Tuple[str, bool, int]]:
+    """`file_discovery.iter_tree`, served from the workspace index of `index_root` (default: `root`)."""
+    index = get_workspace_index(index_root or root)
+    entries = index.tree(root, max_depth) if index is not None and root in index else None
+    if entries is None:
+        yield from file_discovery.iter_tree(root, max_depth=max_depth)
+        return
+    yield from entries
+
+
+def _index_for_read(path: str, index_root: Optional[str]) -> Optional[WorkspaceIndex]:
+    index = get_workspace_index(index_root) if index_root else get_workspace_index(path, create=False)
+    return index if index is not None and path in index else None
+
+
+def read_text_file(path: str, index_root: Optional[str] = None) -> Optional[str]:
+    """`file_discovery.read_text_file`, through the cache of the index of `index_root` or that covers `path`, if any."""
+    index = _index_for_read(path, index_root)
+    if index is None:
+        return file_discovery.read_text_file(path)
+    try:
+        text = index.read_text(path)
+    except (OSError, UnicodeDecodeError):
+        return None
+    return None if "\0" in text[:BINARY_SNIFF_BYTES] else text
+
+
+def read_source_text(path: str, index_root: Optional[str] = None) -> str:
+    """
+    The file's text as `open(path, encoding="utf-8").read()` returns it (universal newlines), raising the same
+    errors, through the cache of the index of `index_root` or that covers `path`, if any.
+    """
+    index = _index_for_read(path, index_root)
+    if index is None:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    text = index.read_text(path)
+    return text.replace("\r\n", "\n").replace("\r", "\n") if "\r" in text else text
+
+
+def iter_source_documents(root: str, **walk_options) -> Iterator[Document]:
+    """`file_discovery.iter_source_documents`, listing and reading through the workspace index."""
+    for path in iter_source_files(root, **walk_options):
+        text = read_text_file(path)
+        if text is not None:
+            yield Document(page_content=text, metadata={"source": path})
+
+
+def path_fingerprint(path: str) -> str:
+    """`file_discovery.path_fingerprint`; directories get an index of their own, files use one that covers them."""
+    index = get_workspace_index(path, create=os.path.isdir(path))
+    if index is None:
+        return file_discovery.path_fingerprint(path)
+    return index.fingerprint(path)
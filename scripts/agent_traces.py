@@ -0,0 +1,106 @@
+# scripts/agent_traces.py
+"""
+Reports on and replays the agent run traces written under `agent_traces` in config/llm_settings.yaml.
+
+  report  Compares the recorded runs by group (default: live or replay, and prompt version): iterations,
+          tool calls, parsing errors, tokens, simulated and wall seconds, with the change against the first group.
+  replay  Replays recorded live runs offline (recorded LLM outputs and tool observations) through the agent with
+          the current `editing_agent` prompt, or another prompt file, then reports originals against replays.
+
+Examples:
+  python -m scripts.agent_traces report --by model,prompt_version
+  python -m scripts.agent_traces replay --last 20 --prompt /tmp/editing_agent_v2.md --output .data/replays.jsonl
+"""
+import argparse
+import os
+import sys
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from config.settings import get_section_settings
+from core.agent_traces import compare_traces, format_report, get_agent_trace_store
+from services.editing_service import EditingService
+
+
+def _group_by(value: str) -> list:
+    return [field.strip() for field in value.split(",") if field.strip()]
+
+
+def _load_prompt(path: str) -> ChatPromptTemplate:
+    with open(path, "r", encoding="utf-8") as f:
+        prompt = ChatPromptTemplate.from_template(f.read())
+    expected = EditingService.PROMPT_VARIABLES["editing_agent"]
+    if set(prompt.input_variables) != expected:
+        raise ValueError(f"Prompt '{path}' uses variables {sorted(prompt.input_variables)}, but the agent provides {sorted(expected)}.")
+    return prompt
+
+
+def report(args: argparse.Namespace) -> None:
+    records = list(get_agent_trace_store(args.path).read(args.task))
+    group_by = _group_by(args.by)
+    print(format_report(compare_traces(records, group_by), group_by))
+
+
+def replay(args: argparse.Namespace) -> None:
+    records = [record for record in get_agent_trace_store(args.path).read(args.task) if record.get("mode") == "live"]
+    if args.run_id:
+        records = [record for record in records if record["run_id"] in set(args.run_id)]
+    if args.last:
+        records = records[-args.last:]
+    if not records:
+        print("No recorded live runs to replay.", file=sys.stderr)
+        sys.exit(1)
+    prompt = _load_prompt(args.prompt) if args.prompt else None
+    prefill = args.prefill_tokens_per_second
+    if prefill is None:
+        prefill = float(get_section_settings("agent_traces").get("replay_prefill_tokens_per_second", 0))
+
+    service = EditingService(args.task)
+    real_stdout = sys.stdout
+    replays = []
+    # Keep whatever the replays print (with --verbose, the agent's steps) out of the report.
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = sys.stderr if args.verbose else devnull
+        try:
+            for record in records:
+                replays.append(service.replay(record, prompt=prompt, prefill_tokens_per_second=prefill, verbose=args.verbose))
+        finally:
+            sys.stdout = real_stdout
+    if args.output:
+        store = get_agent_trace_store(args.output)
+        for record in replays:
+            store.append(record)
+    for record in replays:
+        if record["status"] != "ok":
+            print(f"Run {record['replay_of']}: replay {record['status']}: {record['error'] or 'tool calls differ from the recording'}")
+        elif record["truncated_tool_outputs"]:
+            print(f"Run {record['replay_of']}: {record['truncated_tool_outputs']} tool output(s) were cut in the trace; its prompt tokens are understated.")
+    group_by = ["mode", "prompt_version"]
+    print(format_report(compare_traces(records + replays, group_by), group_by))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", help="Trace file (default: agent_traces.path).")
+    parser.add_argument("--task", default="editing", help="Only runs of this task.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report_parser = commands.add_parser("report", help="Compare recorded runs by group.")
+    report_parser.add_argument("--by", default="mode,prompt_version", help="Comma-separated record fields to group by, e.g. model,prompt_version.")
+    report_parser.set_defaults(handler=report)
+
+    replay_parser = commands.add_parser("replay", help="Replay recorded runs offline and compare them with the originals.")
+    replay_parser.add_argument("--run-id", action="append", help="Replay this run (repeatable; default: every live run).")
+    replay_parser.add_argument("--last", type=int, help="Replay only the last N selected runs.")
+    replay_parser.add_argument("--prompt", help="Prompt file to replay with instead of prompts/editing_agent.md.")
+    replay_parser.add_argument("--prefill-tokens-per-second", type=float, help="Charge extra prompt tokens at this rate (default: agent_traces.replay_prefill_tokens_per_second).")
+    replay_parser.add_argument("--output", help="Append the replay records to this trace file.")
+    replay_parser.add_argument("--verbose", action="store_true", help="Show the agent's steps (on stderr).")
+    replay_parser.set_defaults(handler=replay)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
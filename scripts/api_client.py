@@ -3,6 +3,7 @@ import argparse
 import requests
 import json
 import sys
+import time
 
 # Defines the base URL for our API server
 API_BASE_URL = "http://localhost:8000"
@@ -28,6 +29,97 @@ def execute_task_request(task_name: str, data: dict, model: str | None):
         print(f"Error connecting to API: {e}", file=sys.stderr)
         sys.exit(1)
 
+def execute_batch_request(task_name: str, jsonl_path: str, model: str | None, max_concurrency: int | None):
+    """Sends every line of a JSONL file (one task data object per line) to /tasks/{task_name}/batch."""
+    try:
+        with open(jsonl_path, 'r', encoding='utf-8') as f:
+            items = [json.loads(line) for line in f if line.strip()]
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error: Could not read batch file '{jsonl_path}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+    payload = {"data": items}
+    if model:
+        payload["model"] = model
+    if max_concurrency:
+        payload["max_concurrency"] = max_concurrency
+
+    try:
+        response = requests.post(f"{API_BASE_URL}/tasks/{task_name}/batch", json=payload, timeout=600)
+        response.raise_for_status()
+        print(json.dumps(response.json(), indent=2, ensure_ascii=False))
+        if response.json()["failed"]:
+            sys.exit(1)
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error connecting to API: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def stream_task_request(task_name: str, data: dict, model: str | None):
+    """Calls /tasks/{task_name}/stream and prints tokens as they arrive, then the timings on stderr."""
+    url = f"{API_BASE_URL}/tasks/{task_name}/stream"
+    payload = {"data": data}
+    if model:
+        payload["model"] = model
+
+    try:
+        with requests.post(url, json=payload, stream=True, timeout=600) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["event"] == "token":
+                    print(event["data"], end="", flush=True)
+                elif event["event"] == "end":
+                    print()
+                    print(json.dumps({"model_used": event["model_used"], "timings": event["timings"]}), file=sys.stderr)
+                elif event["event"] == "error":
+                    print()
+                    print(f"Error from API: {event['detail']}", file=sys.stderr)
+                    sys.exit(1)
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error connecting to API: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def submit_and_poll_job(task_name: str, data: dict, model: str | None, poll_interval: float):
+    """Submits the task to /jobs/{task_name}, then polls /jobs/{id} until it finishes. Ctrl+C cancels the job."""
+    payload = {"data": data}
+    if model:
+        payload["model"] = model
+
+    try:
+        response = requests.post(f"{API_BASE_URL}/jobs/{task_name}", json=payload, timeout=30)
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        print(f"Submitted job {job_id}. Polling every {poll_interval}s (Ctrl+C cancels the job)...", file=sys.stderr)
+
+        last_status = None
+        try:
+            while True:
+                response = requests.get(f"{API_BASE_URL}/jobs/{job_id}", timeout=30)
+                response.raise_for_status()
+                job = response.json()
+                if job["status"] != last_status:
+                    print(f"Job {job_id}: {job['status']}", file=sys.stderr)
+                    last_status = job["status"]
+                if job["status"] in ("succeeded", "failed", "cancelled"):
+                    break
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            requests.delete(f"{API_BASE_URL}/jobs/{job_id}", timeout=30)
+            print(f"Cancelled job {job_id}.", file=sys.stderr)
+            sys.exit(130)
+
+        print(json.dumps(job, indent=2, ensure_ascii=False))
+        if job["status"] != "succeeded":
+            sys.exit(1)
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error connecting to API: {e}", file=sys.stderr)
+        sys.exit(1)
+
 def main():
     """Main entry point for the command-line client."""
     parser = argparse.ArgumentParser(
@@ -36,11 +128,22 @@ def main():
     
     # This client is designed to be simple, taking the task name and a JSON string of data
     parser.add_argument("task_name", help="Name of the task to run (e.g., planning, docs).")
-    parser.add_argument("json_data", help="JSON string with the data for the task (e.g., '{\"description\": \"...\"}').")
+    parser.add_argument("json_data", nargs="?", help="JSON string with the data for the task (e.g., '{\"description\": \"...\"}'). Not used with --batch.")
     parser.add_argument("--model", help="(Optional) Override the default model. Ex: OPENAI:gpt-4o")
+    parser.add_argument("--batch", metavar="FILE.jsonl", help="Run the task for every JSON object (one per line) in the file.")
+    parser.add_argument("--max-concurrency", type=int, help="(With --batch) How many items the server runs at once.")
+    parser.add_argument("--stream", action="store_true", help="Print tokens as they are generated (optimizer, planning).")
+    parser.add_argument("--submit", action="store_true", help="Run the task as a background job and poll until it finishes.")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between job status checks (with --submit).")
     
     args = parser.parse_args()
-    
+
+    if args.batch:
+        execute_batch_request(args.task_name, args.batch, args.model, args.max_concurrency)
+        return
+    if args.json_data is None:
+        parser.error("json_data is required unless --batch is given.")
+
     try:
         # Validate that the data string is valid JSON
         data_dict = json.loads(args.json_data)
@@ -48,7 +151,12 @@ def main():
         print(f"Error: Invalid JSON data provided.", file=sys.stderr)
         sys.exit(1)
         
-    execute_task_request(args.task_name, data_dict, args.model)
+    if args.stream:
+        stream_task_request(args.task_name, data_dict, args.model)
+    elif args.submit:
+        submit_and_poll_job(args.task_name, data_dict, args.model, args.poll_interval)
+    else:
+        execute_task_request(args.task_name, data_dict, args.model)
 
 if __name__ == "__main__":
     main()
@@ -1,54 +1,367 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Any, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import hashlib
+import json
 import os
-from langchain_core.output_parsers import PydanticOutputParser
+import threading
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import Runnable
 
 from .base_service import AbstractTaskService
 from core.exceptions import ServiceExecutionError
 from config.prompt_loader import get_prompt_template_for_task
-from config.llm_providers import get_llm_instance
-from config.settings import (
-    resolve_model_for_task,
-    get_llm_settings_for_task,
-)
+from config.llm_providers import get_task_llm
+from config.settings import get_llm_settings_for_task, get_section_settings
+from core.analysis_manifest import AnalysisManifest, get_analysis_manifest
+from core.file_discovery import DEFAULT_MAX_FILE_BYTES
+from core.progress import report_progress
+from core.source_chunks import SourceChunk, split_source
+from core.structured_output import REPAIR_PROMPT_NAME, REPAIR_PROMPT_VARIABLES, structured_output_parser
+from core.tokens import count_tokens
+from core.workspace_index import iter_source_files, path_fingerprint, read_source_text, read_text_file
+
+LANGUAGE_MAP = {".py": "Python", ".rb": "Ruby", ".js": "JavaScript"}
 
 # --- Pydantic Models ---
 class AnalyzeRequest(BaseModel):
-    file_path: str
+    file_path: Optional[str] = None
+    directory_path: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _one_target(self) -> "AnalyzeRequest":
+        if (self.file_path is None) == (self.directory_path is None):
+            raise ValueError("Give exactly one of 'file_path' or 'directory_path'.")
+        return self
 
 class AnalysisResult(BaseModel):
     analysis_markdown: str = Field(description="A summary of the code analysis, formatted in Markdown.")
     passed: bool = Field(description="Whether the code passed the quality check.")
 
+def merge_analysis_results(chunks: List[SourceChunk], results: List[AnalysisResult]) -> AnalysisResult:
+    """One result for a file analysed in chunks: it passes only if every chunk passed, with a section per chunk."""
+    if len(results) == 1:
+        return results[0]
+    sections = [f"### {chunk.label}\n\n{result.analysis_markdown.strip()}" for chunk, result in zip(chunks, results)]
+    return AnalysisResult(analysis_markdown="\n\n".join(sections), passed=all(result.passed for result in results))
+
+# (path relative to the directory, content key, chain inputs, chunks) of a file that needs analysing.
+_PendingFile = Tuple[str, str, List[dict], List[SourceChunk]]
+
+class _DirectoryRun:
+    """Tracks the analysis of one directory: files reused from the manifest, new results and progress."""
+
+    def __init__(self, root: str, manifest: Optional[AnalysisManifest], fingerprint: str, max_concurrency: int):
+        self.root = root
+        self.manifest = manifest
+        self.fingerprint = fingerprint
+        self.max_concurrency = max_concurrency
+        self.previous = manifest.load(root) if manifest is not None else {}
+        self.files: Dict[str, dict] = {}
+        self.total = 0
+        self.reused = 0
+        self.analysed = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def content_key(self, text: str) -> str:
+        # A result is reusable only for the same content, model, settings, prompt and chunking.
+        return hashlib.sha256(f"{self.fingerprint}\n{text}".encode("utf-8")).hexdigest()
+
+    def reuse(self, path: str, key: str) -> bool:
+        """Takes the file's previous result if its content key is unchanged since it was recorded."""
+        self.total += 1
+        previous = self.previous.get(path)
+        if previous is None or previous[0] != key:
+            return False
+        self.files[path] = {"file_path": path, **json.loads(previous[1]), "reused": True}
+        self.reused += 1
+        return True
+
+    def complete(self, path: str, key: str, result: AnalysisResult, chunks: int) -> None:
+        """Records a new result, persisting it right away so an interrupted run keeps its progress."""
+        self._persist(path, key, result)
+        self._record(path, result, chunks)
+
+    async def acomplete(self, path: str, key: str, result: AnalysisResult, chunks: int) -> None:
+        """`complete` for the event loop: the SQLite write runs in a worker thread."""
+        await asyncio.to_thread(self._persist, path, key, result)
+        self._record(path, result, chunks)
+
+    def _persist(self, path: str, key: str, result: AnalysisResult) -> None:
+        if self.manifest is not None:
+            self.manifest.put(self.root, path, key, json.dumps(result.model_dump()))
+
+    def _record(self, path: str, result: AnalysisResult, chunks: int) -> None:
+        with self._lock:
+            self.files[path] = {"file_path": path, **result.model_dump(), "chunks": chunks, "reused": False}
+            self.analysed += 1
+        self.report()
+
+    def fail(self, path: str, error: Exception) -> None:
+        with self._lock:
+            self.files[path] = {"file_path": path, "passed": False, "error": str(error), "reused": False}
+            self.errors += 1
+        self.report()
+
+    def report(self) -> None:
+        report_progress(
+            stage="analysis", total=self.total, reused=self.reused, analysed=self.analysed, errors=self.errors,
+            done=self.reused + self.analysed + self.errors,
+        )
+
+    def prune(self) -> None:
+        """Drops the files that disappeared since the last run from the manifest."""
+        if self.manifest is not None:
+            self.manifest.prune(self.root, set(self.previous) - set(self.files))
+
+    def result(self) -> dict:
+        """The aggregated report."""
+        files = [self.files[path] for path in sorted(self.files)]
+        print(f"INFO: {self.total} files found, {self.reused} unchanged results reused, {self.analysed} analysed.")
+        return {
+            "directory": self.root,
+            "passed": all(entry["passed"] for entry in files),
+            "summary": {
+                "total": self.total,
+                "reused": self.reused,
+                "analysed": self.analysed,
+                "failed": sum(1 for entry in files if not entry["passed"]),
+                "errors": self.errors,
+            },
+            "files": files,
+        }
+
 # --- Service Implementation ---
 class AnalysisService(AbstractTaskService):
+    PROMPT_VARIABLES = {"analysis": {"language", "code", "format_instructions"}, REPAIR_PROMPT_NAME: REPAIR_PROMPT_VARIABLES}
+
     def __init__(self, task_name: str = "analysis"):
         self.task_name = task_name
 
-    def execute(self, file_path: str, model_override: Optional[str] = None) -> dict:
+    def single_flight_fingerprint(self, file_path: Optional[str] = None, directory_path: Optional[str] = None, **kwargs) -> str:
+        return path_fingerprint(file_path or directory_path or "")
+
+    def execute(self, file_path: Optional[str] = None, directory_path: Optional[str] = None, model_override: Optional[str] = None) -> dict:
+        if directory_path is not None:
+            return self._execute_directory(directory_path, model_override)
         try:
-            language_map = {".py": "Python", ".rb": "Ruby", ".js": "JavaScript"}
-            file_extension = os.path.splitext(file_path)[1]
-            language = language_map.get(file_extension, "unknown")
-
-            with open(file_path, 'r', encoding='utf-8') as f:
-                source_code = f.read()
-
-            provider, model_name = resolve_model_for_task(self.task_name, model_override)
-            llm_settings = get_llm_settings_for_task(self.task_name)
-            llm = get_llm_instance(provider, model_name, llm_settings)
-            
-            parser = PydanticOutputParser(pydantic_object=AnalysisResult)
-            prompt = get_prompt_template_for_task(self.task_name)
-            
-            # The prompt now needs to be told how to determine the 'passed' boolean.
-            # We'll add this instruction to the chain's input.
-            chain = prompt.partial(format_instructions=parser.get_format_instructions()) | llm | parser
-
-            analysis_result_object = chain.invoke({"language": language, "code": source_code})
-
-            return {"analysis": analysis_result_object.dict(), "model_used": f"{provider}:{model_name}"}
+            chain_inputs, chunks = self._read_chain_inputs(file_path)
+            chain, model_used = self._build_chain(model_override)
+
+            if len(chain_inputs) == 1:
+                results = [chain.invoke(chain_inputs[0])]
+            else:
+                results = chain.batch(chain_inputs, config={"max_concurrency": self._max_concurrency()})
+            analysis_result_object = merge_analysis_results(chunks, results)
+
+            return {"analysis": analysis_result_object.model_dump(), "model_used": model_used, "chunks": len(chunks)}
         except FileNotFoundError:
              raise ServiceExecutionError(message=f"File not found at path: {file_path}")
         except Exception as e:
             raise ServiceExecutionError(message=f"Error in AnalysisService: {e}", original_exception=e)
+
+    async def aexecute(self, file_path: Optional[str] = None, directory_path: Optional[str] = None, model_override: Optional[str] = None) -> dict:
+        if directory_path is not None:
+            return await self._aexecute_directory(directory_path, model_override)
+        try:
+            chain_inputs, chunks = await asyncio.to_thread(self._read_chain_inputs, file_path)
+            chain, model_used = self._build_chain(model_override)
+
+            if len(chain_inputs) == 1:
+                results = [await chain.ainvoke(chain_inputs[0])]
+            else:
+                results = await chain.abatch(chain_inputs, config={"max_concurrency": self._max_concurrency()})
+            analysis_result_object = merge_analysis_results(chunks, results)
+
+            return {"analysis": analysis_result_object.model_dump(), "model_used": model_used, "chunks": len(chunks)}
+        except FileNotFoundError:
+             raise ServiceExecutionError(message=f"File not found at path: {file_path}")
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error in AnalysisService: {e}", original_exception=e)
+
+    async def abatch_execute(self, items: List[Dict[str, Any]], model_override: Optional[str] = None, max_concurrency: int = 4) -> List[Any]:
+        if any(item.get("directory_path") for item in items):
+            # Directories run their own concurrent pipeline; the shared-abatch path below is for single files.
+            return await super().abatch_execute(items, model_override, max_concurrency)
+        try:
+            chain, model_used = self._build_chain(model_override)
+        except Exception as e:
+            return [ServiceExecutionError(message=f"Error in AnalysisService: {e}", original_exception=e)] * len(items)
+
+        # A missing file fails only its own item.
+        read_results = await asyncio.gather(
+            *(asyncio.to_thread(self._read_chain_inputs, item["file_path"]) for item in items), return_exceptions=True
+        )
+        readable = [index for index, read_result in enumerate(read_results) if not isinstance(read_result, Exception)]
+        # The chunks of every file go through one abatch call, so large and small files share the concurrency limit.
+        outputs = await chain.abatch(
+            [chain_input for index in readable for chain_input in read_results[index][0]],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+
+        results: List[Any] = []
+        for item, read_result in zip(items, read_results):
+            if isinstance(read_result, FileNotFoundError):
+                results.append(ServiceExecutionError(message=f"File not found at path: {item['file_path']}"))
+            elif isinstance(read_result, Exception):
+                results.append(ServiceExecutionError(message=f"Error in AnalysisService: {read_result}", original_exception=read_result))
+            else:
+                results.append(None)
+        position = 0
+        for index in readable:
+            chunks = read_results[index][1]
+            chunk_outputs = outputs[position:position + len(chunks)]
+            position += len(chunks)
+            error = next((output for output in chunk_outputs if isinstance(output, Exception)), None)
+            if error is not None:
+                results[index] = ServiceExecutionError(message=f"Error in AnalysisService: {error}", original_exception=error)
+            else:
+                merged = merge_analysis_results(chunks, chunk_outputs)
+                results[index] = {"analysis": merged.model_dump(), "model_used": model_used, "chunks": len(chunks)}
+        return results
+
+    # --- Directory mode ---
+    def _execute_directory(self, directory_path: str, model_override: Optional[str]) -> dict:
+        try:
+            chain, model_used, prompt = self._build_chain_and_prompt(model_override)
+            run = self._start_directory_run(directory_path, prompt, model_used)
+            pending = self._plan_directory(directory_path, run)
+
+            def analyse(path: str, key: str, chain_inputs: List[dict], chunks: List[SourceChunk]) -> None:
+                try:
+                    # Files run in parallel; the chunks of one file run one after another in its thread.
+                    results = [chain.invoke(chain_input) for chain_input in chain_inputs]
+                    run.complete(path, key, merge_analysis_results(chunks, results), len(chunks))
+                except Exception as e:
+                    run.fail(path, e)
+
+            with ThreadPoolExecutor(max_workers=run.max_concurrency, thread_name_prefix="analysis-dir") as executor:
+                # Each call gets its own copy of the context so progress and metrics reach the thread.
+                futures = [executor.submit(contextvars.copy_context().run, analyse, *item) for item in pending]
+                for future in futures:
+                    future.result()
+            run.prune()
+            return {"analysis": run.result(), "model_used": model_used}
+        except FileNotFoundError:
+            raise ServiceExecutionError(message=f"Directory not found at path: {directory_path}")
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error in AnalysisService: {e}", original_exception=e)
+
+    async def _aexecute_directory(self, directory_path: str, model_override: Optional[str]) -> dict:
+        try:
+            chain, model_used, prompt = self._build_chain_and_prompt(model_override)
+            # Loading the manifest, walking the tree and reading files is blocking work.
+            run = await asyncio.to_thread(self._start_directory_run, directory_path, prompt, model_used)
+            pending = await asyncio.to_thread(self._plan_directory, directory_path, run)
+            # The limit applies to chunks, so one large file cannot take every slot.
+            semaphore = asyncio.Semaphore(run.max_concurrency)
+
+            async def analyse_chunk(chain_input: dict) -> AnalysisResult:
+                async with semaphore:
+                    return await chain.ainvoke(chain_input)
+
+            async def analyse(path: str, key: str, chain_inputs: List[dict], chunks: List[SourceChunk]) -> None:
+                try:
+                    results = await asyncio.gather(*(analyse_chunk(chain_input) for chain_input in chain_inputs))
+                    await run.acomplete(path, key, merge_analysis_results(chunks, list(results)), len(chunks))
+                except Exception as e:
+                    run.fail(path, e)
+
+            await asyncio.gather(*(analyse(*item) for item in pending))
+            await asyncio.to_thread(run.prune)
+            return {"analysis": run.result(), "model_used": model_used}
+        except FileNotFoundError:
+            raise ServiceExecutionError(message=f"Directory not found at path: {directory_path}")
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error in AnalysisService: {e}", original_exception=e)
+
+    def _start_directory_run(self, directory_path: str, prompt: BasePromptTemplate, model_used: str) -> _DirectoryRun:
+        pipeline_settings = get_section_settings("analysis_pipeline", self.task_name)
+        manifest_path = pipeline_settings.get("manifest_path")
+        fingerprint = json.dumps(
+            [
+                model_used,
+                get_llm_settings_for_task(self.task_name),
+                prompt.pretty_repr(),
+                pipeline_settings.get("chunk_threshold_tokens"),
+                pipeline_settings.get("chunk_token_budget"),
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return _DirectoryRun(
+            root=os.path.realpath(directory_path),
+            manifest=get_analysis_manifest(manifest_path) if manifest_path else None,
+            fingerprint=fingerprint,
+            max_concurrency=self._max_concurrency(),
+        )
+
+    def _plan_directory(self, directory_path: str, run: _DirectoryRun) -> List[_PendingFile]:
+        """Walks the directory and returns the files whose content key changed since the manifest recorded them."""
+        if not os.path.isdir(directory_path):
+            raise FileNotFoundError(f"Directory not found: '{directory_path}'")
+
+        pipeline_settings = get_section_settings("analysis_pipeline", self.task_name)
+        print(f"INFO: Scanning '{directory_path}' for source files...")
+        pending: List[_PendingFile] = []
+        for path in iter_source_files(
+            directory_path,
+            extensions=pipeline_settings.get("extensions") or LANGUAGE_MAP.keys(),
+            max_file_bytes=pipeline_settings.get("max_file_bytes", DEFAULT_MAX_FILE_BYTES),
+            respect_gitignore=pipeline_settings.get("respect_gitignore", True),
+        ):
+            source_code = read_text_file(path)
+            if source_code is None:
+                continue
+            relative_path = os.path.relpath(path, directory_path)
+            key = run.content_key(source_code)
+            if not run.reuse(relative_path, key):
+                pending.append((relative_path, key, *self._chain_inputs(source_code, path)))
+        run.report()
+        return pending
+
+    # --- Chain inputs ---
+    def _read_chain_inputs(self, file_path: str) -> Tuple[List[dict], List[SourceChunk]]:
+        return self._chain_inputs(read_source_text(file_path), file_path)
+
+    def _chain_inputs(self, source_code: str, file_path: str) -> Tuple[List[dict], List[SourceChunk]]:
+        """
+        The chain input for the file, or one per chunk when the file is larger than
+        `analysis_pipeline.chunk_threshold_tokens`, together with the chunks they were made from.
+        """
+        file_extension = os.path.splitext(file_path)[1]
+        language = LANGUAGE_MAP.get(file_extension, "unknown")
+
+        pipeline_settings = get_section_settings("analysis_pipeline", self.task_name)
+        threshold = int(pipeline_settings.get("chunk_threshold_tokens") or 0)
+        if threshold and count_tokens(source_code) > threshold:
+            chunks = split_source(source_code, language, int(pipeline_settings.get("chunk_token_budget") or threshold // 2))
+        else:
+            chunks = [SourceChunk(text=source_code, start_line=1, end_line=source_code.count("\n") + 1)]
+        return [{"language": language, "code": chunk.text} for chunk in chunks], chunks
+
+    def _max_concurrency(self) -> int:
+        return int(get_section_settings("analysis_pipeline", self.task_name).get("max_concurrency", 4))
+
+    def _build_chain(self, model_override: Optional[str]) -> tuple[Runnable, str]:
+        chain, model_used, _ = self._build_chain_and_prompt(model_override)
+        return chain, model_used
+
+    def _build_chain_and_prompt(self, model_override: Optional[str]) -> tuple[Runnable, str, BasePromptTemplate]:
+        """The chain, its model and the prompt it was built from, built once per model and settings."""
+        return self._cached_chain("analysis", model_override, lambda: self._compose_chain(model_override))
+
+    def _compose_chain(self, model_override: Optional[str]) -> tuple[Runnable, str, BasePromptTemplate]:
+        llm, model_used = get_task_llm(self.task_name, model_override, output_schema=AnalysisResult)
+
+        parser = structured_output_parser(AnalysisResult, llm, self.task_name)
+        prompt = get_prompt_template_for_task(self.task_name)
+
+        # The prompt now needs to be told how to determine the 'passed' boolean.
+        # We'll add this instruction to the chain's input.
+        prompt = prompt.partial(format_instructions=parser.get_format_instructions())
+        return self._instrument(prompt | llm | parser, model_used), model_used, prompt
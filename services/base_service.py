@@ -1,10 +1,73 @@
 # services/base_service.py
+import asyncio
 from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+from langchain_core.runnables import Runnable
+
+from core.chain_factory import CHAIN_FACTORY
+from core.concurrency import run_in_worker_thread
+from core.instrumentation import instrument
 
 class AbstractTaskService(ABC):
     """Abstract Base Class for all task services to ensure a consistent interface."""
 
+    # Services that produce free text set this and implement `astream`.
+    supports_streaming: bool = False
+
+    # Input variables the service fills in, per prompt template it uses. Checked by the PromptRegistry at startup.
+    PROMPT_VARIABLES: Dict[str, Set[str]] = {}
+
     @abstractmethod
     def execute(self, *args, **kwargs) -> any:
         """The main execution method for the service."""
         pass
+
+    async def aexecute(self, *args, **kwargs) -> any:
+        """
+        Async counterpart of `execute`, awaited by the API.
+        Services should override it with a native implementation (`ainvoke`/`abatch`); the default
+        runs the synchronous `execute` in the bounded worker thread pool so the event loop never blocks.
+        """
+        return await run_in_worker_thread(self.execute, *args, **kwargs)
+
+    async def abatch_execute(self, items: List[Dict[str, Any]], model_override: Optional[str] = None, max_concurrency: int = 4) -> List[Any]:
+        """
+        Runs the task once per item, at most `max_concurrency` at a time.
+        Returns results in input order, with the exception in place of any item that failed.
+        Services with a single chain override this to build it once and use `abatch`.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_item(item: Dict[str, Any]) -> Any:
+            async with semaphore:
+                return await self.aexecute(model_override=model_override, **item)
+
+        return await asyncio.gather(*(run_item(item) for item in items), return_exceptions=True)
+
+    def single_flight_fingerprint(self, **kwargs) -> str:
+        """
+        Identifies the inputs of a request that live outside its data (e.g. files on disk), so identical
+        concurrent requests share one execution only while those inputs are unchanged. It is computed for every
+        request, so it should come from a cache (e.g. the workspace index's fingerprints). Empty by default.
+        """
+        return ""
+
+    async def astream(self, *args, **kwargs) -> AsyncIterator[dict]:
+        """
+        Streams the task output as events: `{"event": "token", "data": <text>}` for each chunk,
+        then a single `{"event": "end", "model_used": <provider:model>}`.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming.")
+        yield  # pragma: no cover - makes this an async generator
+
+    def _cached_chain(self, chain_name: str, model_override: Optional[str], build: Callable[[], Any], settings_sections: Iterable[str] = ()) -> Any:
+        """
+        Returns what `build()` returns (typically `(chain, model_used)`), built once per model and settings and
+        then reused across requests. `settings_sections` names the llm_settings.yaml sections `build` reads.
+        """
+        return CHAIN_FACTORY.get(self.task_name, chain_name, model_override, build, settings_sections)
+
+    def _instrument(self, chain: Runnable, model_used: str) -> Runnable:
+        """Attaches the metrics callback handler, labelled with this task and model, to every run of `chain`."""
+        return instrument(chain, self.task_name, model_used)
@@ -1,16 +1,31 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import NamedTuple, Optional, List, Iterator, Tuple, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import contextvars
+import hashlib
+import itertools
+import json
+import os
+import threading
 from langchain_core.documents import Document
-from langchain_core.output_parsers import StrOutputParser, PydanticOutputParser
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import Runnable
 from .base_service import AbstractTaskService
 from core.exceptions import ServiceExecutionError
 from config.prompt_loader import get_prompt_template_for_task
-from config.llm_providers import get_llm_instance
+from config.llm_providers import get_task_llm
+from core.progress import report_progress
+from core.structured_output import REPAIR_PROMPT_NAME, REPAIR_PROMPT_VARIABLES, structured_output_parser
+from core.summary_cache import SummaryCache, get_summary_cache
+from core.file_discovery import DEFAULT_MAX_FILE_BYTES, DEFAULT_SOURCE_EXTENSIONS
+from core.tokens import count_tokens, group_by_token_budget, split_text_by_tokens
+from core.workspace_index import iter_source_documents, path_fingerprint
 from config.settings import (
-    resolve_model_for_task,
     get_llm_settings_for_task,
+    get_section_settings,
 )
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
 
 # --- Pydantic Models ---
 class DocsRequest(BaseModel):
@@ -19,56 +34,284 @@ class DocsRequest(BaseModel):
 class DocsResult(BaseModel):
     documentation_markdown: str = Field(description="The full README.md content as a Markdown string.")
 
+_SUMMARY_SEPARATOR = "\n\n---\n\n"
+# Upper bound on collapse rounds, in case a model keeps producing summaries that do not shrink.
+_MAX_COLLAPSE_LEVELS = 10
+
+# Documents are pulled from the scanner in windows of this size, so the map step starts before the scan ends.
+_SCAN_WINDOW = 64
+
+class _DocsChains(NamedTuple):
+    """The map, collapse and reduce chains of one model, with the prompts they were built from."""
+    map_chain: Runnable
+    collapse_chain: Runnable
+    reduce_chain: Runnable
+    model_used: str
+    map_prompt: BasePromptTemplate
+    collapse_prompt: BasePromptTemplate
+    reduce_prompt: BasePromptTemplate
+
+class _MapRun:
+    """Tracks the map step of one run while documents stream in: cache lookups, new summaries and progress."""
+
+    def __init__(self, cache: Optional[SummaryCache], fingerprint: str, max_concurrency: int):
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.max_concurrency = max_concurrency
+        self.total = 0
+        self.cached = 0
+        self.summarized = 0
+        self._lock = threading.Lock()
+
+    def next_window(self, docs: Iterator[Document]) -> List[Tuple[Document, str, Optional[str]]]:
+        """Reads the next window of documents and pairs each with its key and cached summary (if any)."""
+        window = list(itertools.islice(docs, _SCAN_WINDOW))
+        # A summary is reusable only for the same file (or part), content, model, settings and map prompt.
+        keys = [
+            hashlib.sha256(f"{self.fingerprint}\n{doc.metadata['label']}\n{doc.page_content}".encode("utf-8")).hexdigest()
+            for doc in window
+        ]
+        cached = self.cache.get_many(keys) if self.cache is not None and keys else {}
+        with self._lock:
+            self.total += len(window)
+            self.cached += len(cached)
+        if window:
+            self.report()
+        return [(doc, key, cached.get(key)) for doc, key in zip(window, keys)]
+
+    def complete(self, key: str, summary: str) -> None:
+        """Persists a new summary as soon as it is known, so an interrupted run keeps its progress."""
+        if self.cache is not None:
+            self.cache.put(key, summary)
+        self._count_summarized()
+
+    async def acomplete(self, key: str, summary: str) -> None:
+        """`complete` for the event loop: the SQLite write runs in a worker thread."""
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, key, summary)
+        self._count_summarized()
+
+    def _count_summarized(self) -> None:
+        with self._lock:
+            self.summarized += 1
+        self.report()
+
+    def report(self) -> None:
+        report_progress(stage="map", total=self.total, cached=self.cached, summarized=self.summarized, done=self.cached + self.summarized)
+
+def _map_input(doc: Document) -> dict:
+    return {"source": doc.metadata["label"], "page_content": doc.page_content}
+
 # --- Service Implementation ---
 class DocsService(AbstractTaskService):
+    PROMPT_VARIABLES = {
+        "documentation_map": {"source", "page_content"},
+        "documentation_collapse": {"doc_summaries"},
+        "documentation_reduce": {"doc_summaries", "format_instructions"},
+        REPAIR_PROMPT_NAME: REPAIR_PROMPT_VARIABLES,
+    }
+
     def __init__(self, task_name: str = "documentation"):
         self.task_name = task_name
 
+    def single_flight_fingerprint(self, project_path: str = "", **kwargs) -> str:
+        return path_fingerprint(project_path)
+
     def execute(self, project_path: str, model_override: Optional[str] = None) -> dict:
         try:
-            provider, model_name = resolve_model_for_task(self.task_name, model_override)
-            llm_settings = get_llm_settings_for_task(self.task_name)
-            llm = get_llm_instance(provider, model_name, llm_settings)
+            chains = self._build_chains(model_override)
+            model_used = chains.model_used
             
-            # 2. Load documents with the intelligent loader 
-            docs = self._load_documents(project_path)
-            if not docs:
-                return {"documentation": {"documentation_markdown": "No relevant source code files found."}, "model_used": f"{provider}:{model_name}"}
-
-            # Map step remains a simple string output
-            map_prompt = get_prompt_template_for_task("documentation_map")
-            map_chain = map_prompt | llm | StrOutputParser()
-            summaries = map_chain.batch([{"page_content": doc.page_content} for doc in docs])
-            combined_summaries = "\n\n---\n\n".join(summaries)
-
-            # Reduce step now uses the Pydantic parser
-            parser = PydanticOutputParser(pydantic_object=DocsResult)
-            reduce_prompt = get_prompt_template_for_task("documentation_reduce")
-            reduce_chain = reduce_prompt.partial(format_instructions=parser.get_format_instructions()) | llm | parser
-
-            final_result_object = reduce_chain.invoke({"doc_summaries": combined_summaries})
+            # Documents are streamed from a single-pass scan into the map step.
+            docs = self._iter_documents(project_path)
+            summaries = self._summarize_documents(docs, chains)
+            if not summaries:
+                return {"documentation": {"documentation_markdown": "No relevant source code files found."}, "model_used": model_used}
+            summaries = self._collapse_summaries(summaries, chains)
+
+            report_progress(stage="reduce")
+            final_result_object = chains.reduce_chain.invoke({"doc_summaries": _SUMMARY_SEPARATOR.join(summaries)})
             
-            return {"documentation": final_result_object.dict(), "model_used": f"{provider}:{model_name}"}
+            return {"documentation": final_result_object.model_dump(), "model_used": model_used}
         except Exception as e:
             raise ServiceExecutionError(message=f"Error in DocsService: {e}", original_exception=e)
 
-    def _load_documents(self, project_path: str) -> List[Document]:
-        glob_patterns = ["**/*.py", "**/*.js", "**/*.ts", "**/*.rb", "**/*.go", "**/*.md"]
-        exclude_patterns = ["**/__pycache__/**", "**/.git/**", "**/venv/**"]
-        
+    async def aexecute(self, project_path: str, model_override: Optional[str] = None) -> dict:
+        try:
+            chains = self._build_chains(model_override)
+            model_used = chains.model_used
+
+            docs = self._iter_documents(project_path)
+            summaries = await self._asummarize_documents(docs, chains)
+            if not summaries:
+                return {"documentation": {"documentation_markdown": "No relevant source code files found."}, "model_used": model_used}
+            summaries = await self._acollapse_summaries(summaries, chains)
+
+            report_progress(stage="reduce")
+            final_result_object = await chains.reduce_chain.ainvoke({"doc_summaries": _SUMMARY_SEPARATOR.join(summaries)})
+
+            return {"documentation": final_result_object.model_dump(), "model_used": model_used}
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error in DocsService: {e}", original_exception=e)
+
+    def _build_chains(self, model_override: Optional[str]) -> _DocsChains:
+        """The map, collapse and reduce chains, built once per model and settings."""
+        return self._cached_chain("map_reduce", model_override, lambda: self._compose_chains(model_override))
+
+    def _compose_chains(self, model_override: Optional[str]) -> _DocsChains:
+        llm, model_used = get_task_llm(self.task_name, model_override)
+        # Only the reduce step answers in JSON; it may use the provider's native JSON mode.
+        reduce_llm, _ = get_task_llm(self.task_name, model_override, output_schema=DocsResult)
+        # Reduce step parses the README into DocsResult, repairing or re-asking for malformed JSON
+        parser = structured_output_parser(DocsResult, reduce_llm, self.task_name)
+        map_prompt = get_prompt_template_for_task("documentation_map")
+        collapse_prompt = get_prompt_template_for_task("documentation_collapse")
+        reduce_prompt = get_prompt_template_for_task("documentation_reduce").partial(format_instructions=parser.get_format_instructions())
+        return _DocsChains(
+            # Map and collapse (intermediate reduce rounds) steps answer in plain text.
+            map_chain=self._instrument(map_prompt | llm | StrOutputParser(), model_used),
+            collapse_chain=self._instrument(collapse_prompt | llm | StrOutputParser(), model_used),
+            reduce_chain=self._instrument(reduce_prompt | reduce_llm | parser, model_used),
+            model_used=model_used,
+            map_prompt=map_prompt,
+            collapse_prompt=collapse_prompt,
+            reduce_prompt=reduce_prompt,
+        )
+
+    def _start_map_run(self, chains: _DocsChains) -> _MapRun:
+        pipeline_settings = get_section_settings("documentation_pipeline")
+        cache_path = pipeline_settings.get("summary_cache_path")
+        fingerprint = json.dumps(
+            [chains.model_used, get_llm_settings_for_task(self.task_name), chains.map_prompt.pretty_repr()], sort_keys=True, default=str
+        )
+        return _MapRun(
+            cache=get_summary_cache(cache_path) if cache_path else None,
+            fingerprint=fingerprint,
+            max_concurrency=int(pipeline_settings.get("map_max_concurrency", 4)),
+        )
+
+    def _summarize_documents(self, docs: Iterator[Document], chains: _DocsChains) -> List[str]:
+        run = self._start_map_run(chains)
+        map_chain = chains.map_chain
+
+        def summarize(doc: Document, key: str) -> str:
+            summary = map_chain.invoke(_map_input(doc))
+            run.complete(key, summary)
+            return summary
+
+        results: List[Union[str, Future]] = []
+        with ThreadPoolExecutor(max_workers=run.max_concurrency, thread_name_prefix="docs-map") as executor:
+            while window := run.next_window(docs):
+                for doc, key, cached_summary in window:
+                    if cached_summary is not None:
+                        results.append(cached_summary)
+                    else:
+                        # Each call gets its own copy of the context so progress and cache tracking reach the thread.
+                        results.append(executor.submit(contextvars.copy_context().run, summarize, doc, key))
+            summaries = [result.result() if isinstance(result, Future) else result for result in results]
+        print(f"INFO: {run.total} files found, {run.cached} unchanged summaries reused.")
+        return summaries
+
+    async def _asummarize_documents(self, docs: Iterator[Document], chains: _DocsChains) -> List[str]:
+        run = self._start_map_run(chains)
+        map_chain = chains.map_chain
+        semaphore = asyncio.Semaphore(run.max_concurrency)
+
+        async def summarize(doc: Document, key: str) -> str:
+            async with semaphore:
+                summary = await map_chain.ainvoke(_map_input(doc))
+            await run.acomplete(key, summary)
+            return summary
+
+        results: List[Union[str, asyncio.Task]] = []
+        try:
+            # Scanning and reading files is blocking work, so each window is read in a worker thread.
+            while window := await asyncio.to_thread(run.next_window, docs):
+                for doc, key, cached_summary in window:
+                    if cached_summary is not None:
+                        results.append(cached_summary)
+                    else:
+                        results.append(asyncio.create_task(summarize(doc, key)))
+            summaries = [await result if isinstance(result, asyncio.Task) else result for result in results]
+        finally:
+            for result in results:
+                if isinstance(result, asyncio.Task) and not result.done():
+                    result.cancel()
+        print(f"INFO: {run.total} files found, {run.cached} unchanged summaries reused.")
+        return summaries
+
+    def _reduce_budget(self, chains: _DocsChains) -> int:
+        """Tokens available for summaries in one reduce prompt: the model's budget minus the prompt's own text."""
+        pipeline_settings = get_section_settings("documentation_pipeline")
+        model_budgets = pipeline_settings.get("reduce_token_budgets") or {}
+        budget = int(model_budgets.get(chains.model_used, pipeline_settings.get("reduce_token_budget", 6000)))
+        prompt_overhead = max(
+            count_tokens(chains.reduce_prompt.format(doc_summaries="")),
+            count_tokens(chains.collapse_prompt.format(doc_summaries="")),
+        )
+        return max(budget - prompt_overhead, 1)
+
+    def _plan_collapse(self, summaries: List[str], budget: int, level: int) -> Optional[List[List[str]]]:
+        """Returns the groups to collapse in the next round, or None when the summaries already fit the budget."""
+        if len(summaries) <= 1 or count_tokens(_SUMMARY_SEPARATOR.join(summaries)) <= budget:
+            return None
+        if level >= _MAX_COLLAPSE_LEVELS:
+            print(f"WARNING: Summaries still exceed the reduce budget after {level} collapse rounds; reducing anyway.")
+            return None
+        groups = group_by_token_budget(summaries, budget, _SUMMARY_SEPARATOR)
+        if len(groups) == len(summaries):
+            # Every summary fills the budget on its own; merge pairs anyway so each round halves the count.
+            groups = [summaries[index:index + 2] for index in range(0, len(summaries), 2)]
+        print(f"INFO: Collapsing {len(summaries)} summaries into {len(groups)} groups (round {level + 1}).")
+        report_progress(stage="collapse", level=level + 1, groups=len(groups))
+        return groups
+
+    def _collapse_summaries(self, summaries: List[str], chains: _DocsChains) -> List[str]:
+        """Tree-reduces the summaries, in parallel per round, until they fit in one reduce prompt."""
+        budget = self._reduce_budget(chains)
+        max_concurrency = int(get_section_settings("documentation_pipeline").get("map_max_concurrency", 4))
+        level = 0
+        while (groups := self._plan_collapse(summaries, budget, level)) is not None:
+            inputs = [{"doc_summaries": _SUMMARY_SEPARATOR.join(group)} for group in groups]
+            summaries = chains.collapse_chain.batch(inputs, config={"max_concurrency": max_concurrency})
+            level += 1
+        return summaries
+
+    async def _acollapse_summaries(self, summaries: List[str], chains: _DocsChains) -> List[str]:
+        budget = self._reduce_budget(chains)
+        max_concurrency = int(get_section_settings("documentation_pipeline").get("map_max_concurrency", 4))
+        level = 0
+        while (groups := self._plan_collapse(summaries, budget, level)) is not None:
+            inputs = [{"doc_summaries": _SUMMARY_SEPARATOR.join(group)} for group in groups]
+            summaries = await chains.collapse_chain.abatch(inputs, config={"max_concurrency": max_concurrency})
+            level += 1
+        return summaries
+
+    def _iter_documents(self, project_path: str) -> Iterator[Document]:
+        if not os.path.isdir(project_path):
+            raise FileNotFoundError(f"Directory not found: '{project_path}'")
+
+        pipeline_settings = get_section_settings("documentation_pipeline")
         print(f"INFO: Scanning '{project_path}' for source files...")
-        docs: List[Document] = []
-        for pattern in glob_patterns:
-            loader = DirectoryLoader(
-                project_path,
-                glob=pattern,
-                exclude=exclude_patterns,
-                loader_cls=TextLoader,
-                recursive=True,
-                show_progress=False,
-                use_multithreading=True,
-                silent_errors=True
-            )
-            docs.extend(loader.load())
-        
-        return docs
+        docs = iter_source_documents(
+            project_path,
+            extensions=pipeline_settings.get("extensions") or DEFAULT_SOURCE_EXTENSIONS,
+            max_file_bytes=pipeline_settings.get("max_file_bytes", DEFAULT_MAX_FILE_BYTES),
+            respect_gitignore=pipeline_settings.get("respect_gitignore", True),
+        )
+        return self._split_large_documents(docs, int(pipeline_settings.get("map_chunk_token_budget", 3000)), project_path)
+
+    @staticmethod
+    def _split_large_documents(docs: Iterator[Document], budget: int, project_path: str) -> Iterator[Document]:
+        """
+        Splits source files that would not fit in one map prompt into line-aligned parts, summarised separately.
+        Each document is labelled for the map prompt with its path in the project, plus "(part i/n)" for a part.
+        """
+        for doc in docs:
+            label = os.path.relpath(doc.metadata["source"], project_path)
+            parts = split_text_by_tokens(doc.page_content, budget)
+            if len(parts) == 1:
+                yield Document(page_content=doc.page_content, metadata={**doc.metadata, "label": label})
+                continue
+            for index, part in enumerate(parts):
+                yield Document(page_content=part, metadata={**doc.metadata, "label": f"{label} (part {index + 1}/{len(parts)})"})
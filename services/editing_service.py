@@ -1,18 +1,21 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-from langchain import hub
+from typing import Optional, Dict, Any, List, Tuple
 from langchain.agents import AgentExecutor, create_react_agent
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
 
 from .base_service import AbstractTaskService
+from core.agent_traces import (
+    AgentTraceRecorder, RecordedToolOutputs, ReplayChatModel, TraceReplayError, agent_trace_recorder, prompt_version,
+    write_agent_trace,
+)
 from core.exceptions import ServiceExecutionError
 from config.prompt_loader import get_prompt_template_for_task
-from config.llm_providers import get_llm_instance
-from config.settings import (
-    resolve_model_for_task,
-    get_llm_settings_for_task,
-)
-# Import the tools the agent can use from our tools module
-from tools.filesystem_tools import list_files, read_file, write_file
+from config.llm_providers import get_task_llm
+from config.settings import get_section_settings
+# The agent's filesystem tools, memoised per run
+from tools.tool_session import ToolSession, session_tools
 
 
 class EditRequest(BaseModel):
@@ -23,6 +26,9 @@ class EditingService(AbstractTaskService):
     """
     Service that uses an autonomous agent with filesystem tools to perform code edits.
     """
+    # Filled in by create_react_agent and the AgentExecutor.
+    PROMPT_VARIABLES = {"editing_agent": {"tools", "tool_names", "agent_scratchpad", "input"}}
+
     def __init__(self, task_name: str = "editing"):
         self.task_name = task_name
 
@@ -35,42 +41,149 @@ class EditingService(AbstractTaskService):
             model_override: Optional model identifier to override the default.
 
         Returns:
-            A dictionary containing the agent's full output.
+            A dictionary containing the agent's full output, the files it changed and the run's tool usage counters.
         """
         try:
-            # 1. Resolve the model and its settings using our config system
-            provider, model_name = resolve_model_for_task(self.task_name, model_override)
-            llm_settings = get_llm_settings_for_task(self.task_name)
-            llm = get_llm_instance(provider, model_name, llm_settings)
-            
-            # 2. Define the list of tools available to the agent
-            tools = [list_files, read_file, write_file]
-            
-            # 3. Get the agent's core prompt from our local prompt file
-            prompt = get_prompt_template_for_task("editing_agent")
-
-            # 4. Create the ReAct (Reasoning and Acting) agent
-            # This binds the LLM, tools, and prompt together
-            agent = create_react_agent(llm, tools, prompt)
-
-            # 5. Create the Agent Executor, which runs the agent's reasoning loop
-            agent_executor = AgentExecutor(
-                agent=agent,
-                tools=tools,
-                verbose=True,  # Set to True to see the agent's thoughts in the server logs
-                handle_parsing_errors=True,
-                max_iterations=15 # Add a safety limit to prevent infinite loops
-            )
+            tool_session = self._new_tool_session()
+            agent_executor, model_used = self._build_agent_executor(model_override)
+            recorder = agent_trace_recorder(self.task_name, model_used, instruction, get_prompt_template_for_task("editing_agent"))
             
-            # 6. Invoke the agent with the user's instruction
-            # NOTE: This is a potentially long-running, synchronous task. In a real production system,
-            # this would ideally be handled by a background worker (e.g., Celery).
+            # Invoke the agent with the user's instruction
+            # NOTE: This is a potentially long-running, synchronous task. Clients that should not hold
+            # a connection open for the whole run can submit it as a background job (POST /jobs/editing).
             print(f"INFO: Starting agent execution for instruction: '{instruction}'")
-            result = agent_executor.invoke({"input": instruction})
+            try:
+                with tool_session.activate():
+                    result = agent_executor.invoke({"input": instruction}, config=self._run_config(recorder))
+            except BaseException as e:
+                tool_session.discard()
+                self._write_trace(recorder, "error", error=f"{type(e).__name__}: {e}")
+                raise
             print("INFO: Agent execution finished.")
             
-            return {"agent_output": result, "model_used": f"{provider}:{model_name}"}
+            return self._finish_run(result, model_used, tool_session, recorder)
             
         except Exception as e:
             # Wrap any potential error in our custom exception for clean API responses
             raise ServiceExecutionError(message=f"Error during agent execution in EditingService: {e}", original_exception=e)
+
+    async def aexecute(self, instruction: str, model_override: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async variant of `execute`. The agent's LLM calls are awaited; the synchronous filesystem
+        tools are run by LangChain in its executor, so the event loop stays free during the run.
+        """
+        try:
+            tool_session = self._new_tool_session()
+            agent_executor, model_used = self._build_agent_executor(model_override)
+            recorder = agent_trace_recorder(self.task_name, model_used, instruction, get_prompt_template_for_task("editing_agent"))
+
+            print(f"INFO: Starting agent execution for instruction: '{instruction}'")
+            try:
+                with tool_session.activate():
+                    result = await agent_executor.ainvoke({"input": instruction}, config=self._run_config(recorder))
+            except BaseException as e:
+                tool_session.discard()
+                self._write_trace(recorder, "error", error=f"{type(e).__name__}: {e}")
+                raise
+            print("INFO: Agent execution finished.")
+
+            return self._finish_run(result, model_used, tool_session, recorder)
+
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error during agent execution in EditingService: {e}", original_exception=e)
+
+    def _new_tool_session(self) -> ToolSession:
+        tool_settings = get_section_settings("editing_tools", self.task_name)
+        return ToolSession(
+            root=tool_settings.get("workspace_root"),
+            memoize=tool_settings.get("memoize", True),
+            stage_writes=tool_settings.get("staged_writes", True),
+        )
+
+    def _finish_run(self, result: Dict[str, Any], model_used: str, tool_session: ToolSession,
+                    recorder: Optional[AgentTraceRecorder] = None) -> Dict[str, Any]:
+        """Commits the run's staged file changes in one transaction, records the run and builds the service result."""
+        try:
+            files_written = tool_session.commit()
+        except Exception as e:
+            self._write_trace(recorder, "error", output=result.get("output"), error=f"{type(e).__name__}: {e}")
+            raise
+        if files_written:
+            print(f"INFO: Committed changes to {len(files_written)} file(s): {', '.join(files_written)}")
+        self._write_trace(recorder, "ok", output=result.get("output"), files_written=files_written, tool_stats=tool_session.stats())
+        return {"agent_output": result, "model_used": model_used, "files_written": files_written, "tool_stats": tool_session.stats()}
+
+    # --- Run traces ---
+    @staticmethod
+    def _run_config(recorder: Optional[AgentTraceRecorder]) -> Optional[Dict[str, Any]]:
+        return {"callbacks": [recorder]} if recorder is not None else None
+
+    @staticmethod
+    def _write_trace(recorder: Optional[AgentTraceRecorder], status: str, **fields: Any) -> None:
+        if recorder is not None:
+            write_agent_trace(recorder.finish(status, **fields))
+
+    def replay(self, trace: Dict[str, Any], prompt: Optional[ChatPromptTemplate] = None,
+               prefill_tokens_per_second: float = 0.0, verbose: bool = False) -> Dict[str, Any]:
+        """
+        Runs the agent again on a recorded run, offline: the LLM answers with the recorded outputs and the tools
+        with the recorded observations, while the prompt (the current `editing_agent` template, or `prompt`)
+        and the agent's parsing are today's. Returns the replay's trace record (mode 'replay'), with the
+        recorded step latencies; it is not written to the trace file.
+
+        Status 'diverged' means the replayed agent wanted more LLM calls or other tools than the recording has.
+        With `verbose`, the agent's steps are printed to stdout.
+        """
+        prompt = prompt or get_prompt_template_for_task("editing_agent")
+        recorded_tools = RecordedToolOutputs(trace)
+        agent_executor = self._new_agent_executor(ReplayChatModel.from_trace(trace), recorded_tools.tools(session_tools()), prompt, verbose)
+        recorder = AgentTraceRecorder(self.task_name, trace.get("model", ""), trace.get("instruction", ""), prompt_version(prompt), mode="replay")
+        status, output, error = "ok", None, None
+        try:
+            output = agent_executor.invoke({"input": trace.get("instruction", "")}, config=self._run_config(recorder)).get("output")
+        except TraceReplayError as e:
+            status, error = "diverged", str(e)
+        except Exception as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+        if status == "ok" and recorded_tools.divergences:
+            status = "diverged"
+        recorder.use_recorded_latencies(trace, prefill_tokens_per_second)
+        return recorder.finish(
+            status, output=output, error=error, replay_of=trace.get("run_id"),
+            tool_divergences=recorded_tools.divergences, truncated_tool_outputs=recorded_tools.truncated,
+        )
+
+    def _build_agent_executor(self, model_override: Optional[str]) -> Tuple[Runnable, str]:
+        # The executor's verbosity comes from editing_tools, so it is cached per editing_tools settings.
+        return self._cached_chain(
+            "agent_executor", model_override, lambda: self._compose_agent_executor(model_override), settings_sections=("editing_tools",)
+        )
+
+    def _compose_agent_executor(self, model_override: Optional[str]) -> Tuple[Runnable, str]:
+        # 1. Resolve the model (and its fallbacks) and its settings using our config system
+        llm, model_used = get_task_llm(self.task_name, model_override)
+        
+        # 2. Define the list of tools available to the agent; they act on the ToolSession activated for each run
+        tools = session_tools()
+        
+        # 3. Get the agent's core prompt from our local prompt file
+        prompt = get_prompt_template_for_task("editing_agent")
+
+        # 4. Bind the LLM, tools and prompt into the agent's reasoning loop
+        verbose = bool(get_section_settings("editing_tools", self.task_name).get("agent_verbose", False))
+        agent_executor = self._new_agent_executor(llm, tools, prompt, verbose)
+        return self._instrument(agent_executor, model_used), model_used
+
+    @staticmethod
+    def _new_agent_executor(llm: Runnable, tools: List[BaseTool], prompt: ChatPromptTemplate, verbose: bool = False) -> AgentExecutor:
+        # Create the ReAct (Reasoning and Acting) agent
+        agent = create_react_agent(llm, tools, prompt)
+
+        # Create the Agent Executor, which runs the agent's reasoning loop
+        return AgentExecutor(
+            agent=agent,
+            tools=tools,
+            verbose=verbose,  # Prints the agent's thoughts to the server logs
+            handle_parsing_errors=True,
+            max_iterations=15 # Add a safety limit to prevent infinite loops
+        )
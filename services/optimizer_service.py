@@ -1,37 +1,78 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, AsyncIterator, Any, Dict, List
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
 
 from .base_service import AbstractTaskService
 from core.exceptions import ServiceExecutionError
 from config.prompt_loader import get_prompt_template_for_task
-from config.llm_providers import get_llm_instance
-from config.settings import (
-    resolve_model_for_task,
-    get_llm_settings_for_task,
-)
+from config.llm_providers import get_task_llm
 
 class OptimizerRequest(BaseModel):
     raw_prompt: str
 
 class OptimizerService(AbstractTaskService):
     """Service to refine and improve a user's raw prompt."""
+    supports_streaming = True
+    PROMPT_VARIABLES = {"optimizer": {"raw_prompt"}}
+
     def __init__(self, task_name: str = "optimizer"):
         self.task_name = task_name
 
     def execute(self, raw_prompt: str, model_override: Optional[str] = None) -> dict:
         try:
-            provider, model_name = resolve_model_for_task(self.task_name, model_override)
-            llm_settings = get_llm_settings_for_task(self.task_name)
-            llm = get_llm_instance(provider, model_name, llm_settings)
-            
-            prompt = get_prompt_template_for_task(self.task_name)
-            
-            # This is a straightforward text-generation task, so a simple chain is perfect.
-            chain = prompt | llm | StrOutputParser()
-            
+            chain, model_used = self._build_chain(model_override)
             optimized_prompt = chain.invoke({"raw_prompt": raw_prompt})
 
-            return {"optimized_prompt": optimized_prompt, "model_used": f"{provider}:{model_name}"}
+            return {"optimized_prompt": optimized_prompt, "model_used": model_used}
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error in OptimizerService: {e}", original_exception=e)
+
+    async def aexecute(self, raw_prompt: str, model_override: Optional[str] = None) -> dict:
+        try:
+            chain, model_used = self._build_chain(model_override)
+            optimized_prompt = await chain.ainvoke({"raw_prompt": raw_prompt})
+
+            return {"optimized_prompt": optimized_prompt, "model_used": model_used}
         except Exception as e:
             raise ServiceExecutionError(message=f"Error in OptimizerService: {e}", original_exception=e)
+
+    async def abatch_execute(self, items: List[Dict[str, Any]], model_override: Optional[str] = None, max_concurrency: int = 4) -> List[Any]:
+        try:
+            chain, model_used = self._build_chain(model_override)
+        except Exception as e:
+            return [ServiceExecutionError(message=f"Error in OptimizerService: {e}", original_exception=e)] * len(items)
+
+        outputs = await chain.abatch(
+            [{"raw_prompt": item["raw_prompt"]} for item in items],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        return [
+            ServiceExecutionError(message=f"Error in OptimizerService: {output}", original_exception=output)
+            if isinstance(output, Exception)
+            else {"optimized_prompt": output, "model_used": model_used}
+            for output in outputs
+        ]
+
+    async def astream(self, raw_prompt: str, model_override: Optional[str] = None) -> AsyncIterator[dict]:
+        try:
+            chain, model_used = self._build_chain(model_override)
+            async for chunk in chain.astream({"raw_prompt": raw_prompt}):
+                yield {"event": "token", "data": chunk}
+
+            yield {"event": "end", "model_used": model_used}
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error in OptimizerService: {e}", original_exception=e)
+
+    def _build_chain(self, model_override: Optional[str]) -> tuple[Runnable, str]:
+        return self._cached_chain("optimizer", model_override, lambda: self._compose_chain(model_override))
+
+    def _compose_chain(self, model_override: Optional[str]) -> tuple[Runnable, str]:
+        llm, model_used = get_task_llm(self.task_name, model_override)
+
+        prompt = get_prompt_template_for_task(self.task_name)
+
+        # This is a straightforward text-generation task, so a simple chain is perfect.
+        chain = prompt | llm | StrOutputParser()
+        return self._instrument(chain, model_used), model_used
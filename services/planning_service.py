@@ -1,74 +1,290 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, AsyncIterator, Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import re
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnablePassthrough
+from langchain_core.runnables import Runnable, RunnableBranch, RunnableLambda, RunnablePassthrough
 
 from .base_service import AbstractTaskService
 from core.exceptions import ServiceExecutionError
 from config.prompt_loader import get_prompt_template_for_task
-from config.llm_providers import get_llm_instance
-from config.settings import (
-    resolve_model_for_task,
-    get_llm_settings_for_task,
-)
+from config.llm_providers import get_task_llm
+from config.settings import get_section_settings
+
+# How a description is routed to the backend or frontend planner (`planning_pipeline.routing_mode`):
+#   classifier  - ask the LLM first, then run the chosen planner (two sequential calls).
+#   keywords    - classify locally by keyword counts (one call).
+#   speculative - start the backend planner alongside the classifier; drop it if the route is frontend.
+ROUTING_MODES = ("classifier", "keywords", "speculative")
+
+_FRONTEND_KEYWORDS = {
+    "ui", "ux", "frontend", "front-end", "page", "screen", "button", "form", "modal", "layout", "css", "style",
+    "theme", "component", "react", "vue", "angular", "svelte", "html", "responsive", "mobile", "animation",
+    "dark mode", "navbar", "sidebar", "dropdown", "tooltip", "accessibility", "click", "display", "render",
+}
+_BACKEND_KEYWORDS = {
+    "api", "endpoint", "backend", "back-end", "server", "database", "db", "sql", "schema", "migration", "queue",
+    "worker", "cron", "cache", "auth", "authentication", "token", "webhook", "service", "microservice", "rest",
+    "graphql", "storage", "index", "job", "batch", "export", "import", "rate limit", "logging", "payment",
+}
+_END = object()
 
 class PlanRequest(BaseModel):
     description: str
 
+def classify_by_keywords(description: str, frontend_keywords=_FRONTEND_KEYWORDS, backend_keywords=_BACKEND_KEYWORDS) -> str:
+    """
+    Classifies a feature description as 'backend', 'frontend' or 'fullstack' by counting keyword hits,
+    without calling a model. Ties (including no hits at all) are 'fullstack'.
+    """
+    text = " ".join(re.findall(r"[a-z0-9-]+", description.lower()))
+    words = set(text.split())
+
+    def hits(keywords) -> int:
+        return sum(1 for keyword in keywords if (f" {keyword} " in f" {text} " if " " in keyword else keyword in words))
+
+    frontend_hits, backend_hits = hits(frontend_keywords), hits(backend_keywords)
+    if frontend_hits > backend_hits:
+        return "frontend"
+    if backend_hits > frontend_hits:
+        return "backend"
+    return "fullstack"
+
 class PlanningService(AbstractTaskService):
     """
-    An advanced service that uses RunnableBranch to provide context-aware feature plans.
+    An advanced service that routes each feature to a backend or frontend planner to provide context-aware plans.
     """
+    supports_streaming = True
+    PROMPT_VARIABLES = {
+        "planning_classifier": {"feature"},
+        "planning_backend": {"feature"},
+        "planning_frontend": {"feature"},
+    }
+
     def __init__(self, task_name: str = "planning"):
         self.task_name = task_name
 
     def execute(self, description: str, model_override: Optional[str] = None) -> dict:
         try:
-            provider, model_name = resolve_model_for_task(self.task_name, model_override)
-            llm_settings = get_llm_settings_for_task(self.task_name)
-            llm = get_llm_instance(provider, model_name, llm_settings)
-            
-            classifier_chain = (
-                get_prompt_template_for_task("planning_classifier")
-                | llm
-                | StrOutputParser()
-            )
-            
-            backend_chain = (
-                get_prompt_template_for_task("planning_backend")
-                | llm
-                | StrOutputParser()
-            )
+            full_chain, model_used = self._build_chain(model_override)
+
+            print(f"INFO: Running smart planner for feature: '{description}'")
+            plan = full_chain.invoke({"feature": description})
             
-            frontend_chain = (
-                get_prompt_template_for_task("planning_frontend")
-                | llm
-                | StrOutputParser()
-            )
+            return {"plan": {"plan_markdown": plan}, "model_used": model_used}
+
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error in PlanningService: {e}", original_exception=e)
+
+    async def aexecute(self, description: str, model_override: Optional[str] = None) -> dict:
+        try:
+            full_chain, model_used = self._build_chain(model_override)
+
+            print(f"INFO: Running smart planner for feature: '{description}'")
+            plan = await full_chain.ainvoke({"feature": description})
+
+            return {"plan": {"plan_markdown": plan}, "model_used": model_used}
 
-            def route(input_data):
-                classification = input_data["classification"]
-                if "backend" in classification.lower():
-                    print("INFO: Routing to BACKEND planner.")
-                    return backend_chain
-                elif "frontend" in classification.lower():
-                    print("INFO: Routing to FRONTEND planner.")
-                    return frontend_chain
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error in PlanningService: {e}", original_exception=e)
+
+    async def abatch_execute(self, items: List[Dict[str, Any]], model_override: Optional[str] = None, max_concurrency: int = 4) -> List[Any]:
+        try:
+            full_chain, model_used = self._build_chain(model_override)
+        except Exception as e:
+            return [ServiceExecutionError(message=f"Error in PlanningService: {e}", original_exception=e)] * len(items)
+
+        plans = await full_chain.abatch(
+            [{"feature": item["description"]} for item in items],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        return [
+            ServiceExecutionError(message=f"Error in PlanningService: {plan}", original_exception=plan)
+            if isinstance(plan, Exception)
+            else {"plan": {"plan_markdown": plan}, "model_used": model_used}
+            for plan in plans
+        ]
+
+    async def astream(self, description: str, model_override: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Streams the plan. In classifier mode only the routed chain streams, after the classifier answers;
+        in speculative mode backend chunks are held back until the classifier confirms the route.
+        """
+        try:
+            classifier_chain, backend_chain, frontend_chain, model_used = self._build_chains(model_override)
+            routing_mode = self._routing_mode()
+            inputs = {"feature": description}
+
+            print(f"INFO: Streaming smart planner for feature: '{description}' (routing: {routing_mode})")
+            if routing_mode == "speculative":
+                chunks = self._astream_speculative(inputs, classifier_chain, backend_chain, frontend_chain)
+            else:
+                if routing_mode == "keywords":
+                    classification = self._classify_locally(description)
                 else:
-                    print("INFO: Routing to default (BACKEND) planner.")
-                    return backend_chain # Fallback
+                    classification = await classifier_chain.ainvoke(inputs)
+                chunks = self._route(classification, backend_chain, frontend_chain).astream(inputs)
+            async for chunk in chunks:
+                yield {"event": "token", "data": chunk}
+
+            yield {"event": "end", "model_used": model_used}
+
+        except Exception as e:
+            raise ServiceExecutionError(message=f"Error in PlanningService: {e}", original_exception=e)
+
+    def _build_chain(self, model_override: Optional[str]) -> tuple[Runnable, str]:
+        # The composed chain depends on the routing mode, so it is cached per planning_pipeline settings.
+        return self._cached_chain(
+            "planner", model_override, lambda: self._compose_chain(model_override), settings_sections=("planning_pipeline",)
+        )
 
+    def _compose_chain(self, model_override: Optional[str]) -> tuple[Runnable, str]:
+        classifier_chain, backend_chain, frontend_chain, model_used = self._build_chains(model_override)
+        routing_mode = self._routing_mode()
+
+        if routing_mode == "keywords":
+            full_chain = RunnableLambda(
+                lambda input_data: self._route(self._classify_locally(input_data["feature"]), backend_chain, frontend_chain)
+            )
+        elif routing_mode == "speculative":
+            full_chain = RunnableLambda(
+                lambda input_data: self._invoke_speculative(input_data, classifier_chain, backend_chain, frontend_chain),
+                afunc=lambda input_data: self._ainvoke_speculative(input_data, classifier_chain, backend_chain, frontend_chain),
+            )
+        else:
+            # RunnableLambda invokes the chain returned by `route`, using `ainvoke` when the whole chain is awaited.
             full_chain = (
                 RunnablePassthrough.assign(
                     classification=({"feature": lambda x: x["feature"]} | classifier_chain)
                 )
-                | RunnableLambda(route)
+                | RunnableLambda(lambda input_data: self._route(input_data["classification"], backend_chain, frontend_chain))
             )
+        return self._instrument(full_chain, model_used), model_used
 
-            print(f"INFO: Running smart planner for feature: '{description}'")
-            plan = full_chain.invoke({"feature": description})
-            
-            return {"plan": {"plan_markdown": plan}, "model_used": f"{provider}:{model_name}"}
+    def _build_chains(self, model_override: Optional[str]) -> tuple[Runnable, Runnable, Runnable, str]:
+        return self._cached_chain("sub_chains", model_override, lambda: self._compose_chains(model_override))
 
-        except Exception as e:
-            raise ServiceExecutionError(message=f"Error in PlanningService: {e}", original_exception=e)
+    def _compose_chains(self, model_override: Optional[str]) -> tuple[Runnable, Runnable, Runnable, str]:
+        llm, model_used = get_task_llm(self.task_name, model_override)
+        
+        classifier_chain = (
+            get_prompt_template_for_task("planning_classifier")
+            | llm
+            | StrOutputParser()
+        )
+        
+        backend_chain = (
+            get_prompt_template_for_task("planning_backend")
+            | llm
+            | StrOutputParser()
+        )
+        
+        frontend_chain = (
+            get_prompt_template_for_task("planning_frontend")
+            | llm
+            | StrOutputParser()
+        )
+        # Each sub-chain is instrumented too, since `astream` runs them on their own.
+        return (
+            self._instrument(classifier_chain, model_used),
+            self._instrument(backend_chain, model_used),
+            self._instrument(frontend_chain, model_used),
+            model_used,
+        )
+
+    def _routing_mode(self) -> str:
+        routing_mode = get_section_settings("planning_pipeline", self.task_name).get("routing_mode", "classifier")
+        if routing_mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown planning routing_mode '{routing_mode}'. Supported: {list(ROUTING_MODES)}")
+        return routing_mode
+
+    def _classify_locally(self, description: str) -> str:
+        pipeline_settings = get_section_settings("planning_pipeline", self.task_name)
+        classification = classify_by_keywords(
+            description,
+            frontend_keywords=set(pipeline_settings.get("frontend_keywords") or _FRONTEND_KEYWORDS),
+            backend_keywords=set(pipeline_settings.get("backend_keywords") or _BACKEND_KEYWORDS),
+        )
+        print(f"INFO: Keyword classifier chose '{classification}'.")
+        return classification
+
+    def _invoke_speculative(self, input_data: dict, classifier_chain: Runnable, backend_chain: Runnable, frontend_chain: Runnable) -> str:
+        # A running backend call cannot be interrupted from here; on a frontend route its result is discarded.
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planning-speculative")
+        try:
+            backend_future = executor.submit(contextvars.copy_context().run, backend_chain.invoke, input_data)
+            planner_chain = self._route(classifier_chain.invoke(input_data), backend_chain, frontend_chain)
+            if planner_chain is backend_chain:
+                return backend_future.result()
+            return frontend_chain.invoke(input_data)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _ainvoke_speculative(self, input_data: dict, classifier_chain: Runnable, backend_chain: Runnable, frontend_chain: Runnable) -> str:
+        backend_task = asyncio.ensure_future(backend_chain.ainvoke(input_data))
+        try:
+            planner_chain = self._route(await classifier_chain.ainvoke(input_data), backend_chain, frontend_chain)
+            if planner_chain is backend_chain:
+                return await backend_task
+        finally:
+            if not backend_task.done():
+                backend_task.cancel()
+        return await frontend_chain.ainvoke(input_data)
+
+    async def _astream_speculative(self, input_data: dict, classifier_chain: Runnable, backend_chain: Runnable, frontend_chain: Runnable) -> AsyncIterator[str]:
+        """Streams the backend planner while the classifier runs, holding its chunks back until the route is known."""
+        classification_task = asyncio.ensure_future(classifier_chain.ainvoke(input_data))
+        backend_chunks = backend_chain.astream(input_data)
+        buffered: List[str] = []
+        pending_chunk: Optional[asyncio.Future] = None
+        backend_done = False
+        try:
+            while not classification_task.done() and not backend_done:
+                pending_chunk = pending_chunk or asyncio.ensure_future(anext(backend_chunks, _END))
+                await asyncio.wait({classification_task, pending_chunk}, return_when=asyncio.FIRST_COMPLETED)
+                if pending_chunk.done():
+                    chunk, pending_chunk = pending_chunk.result(), None
+                    if chunk is _END:
+                        backend_done = True
+                    else:
+                        buffered.append(chunk)
+
+            planner_chain = self._route(await classification_task, backend_chain, frontend_chain)
+            if planner_chain is frontend_chain:
+                async for chunk in frontend_chain.astream(input_data):
+                    yield chunk
+                return
+
+            for chunk in buffered:
+                yield chunk
+            if pending_chunk is not None:
+                chunk, pending_chunk = await pending_chunk, None
+                backend_done = chunk is _END
+                if not backend_done:
+                    yield chunk
+            if not backend_done:
+                async for chunk in backend_chunks:
+                    yield chunk
+        finally:
+            if not classification_task.done():
+                classification_task.cancel()
+            if pending_chunk is not None:
+                # The backend stream cannot be closed while a pending read is still running it.
+                pending_chunk.cancel()
+                await asyncio.gather(pending_chunk, return_exceptions=True)
+            await backend_chunks.aclose()
+
+    @staticmethod
+    def _route(classification: str, backend_chain: Runnable, frontend_chain: Runnable) -> Runnable:
+        if "backend" in classification.lower():
+            print("INFO: Routing to BACKEND planner.")
+            return backend_chain
+        elif "frontend" in classification.lower():
+            print("INFO: Routing to FRONTEND planner.")
+            return frontend_chain
+        else:
+            print("INFO: Routing to default (BACKEND) planner.")
+            return backend_chain # Fallback
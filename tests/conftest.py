@@ -0,0 +1,49 @@
+# tests/conftest.py
+import asyncio
+import copy
+
+import httpx
+import pytest
+
+from config.settings import load_settings
+
+
+@pytest.fixture
+def llm_settings():
+    """The settings of `load_settings()`, restored after the test; tests change them in place as the benchmarks do."""
+    settings = load_settings()
+    saved = copy.deepcopy(settings)
+    yield settings
+    settings.clear()
+    settings.update(saved)
+
+
+@pytest.fixture
+def fake_api(llm_settings, tmp_path):
+    """
+    Settings for driving the API offline: the FAKE provider with a `test_slow` profile (0.3s per call), no
+    response cache, client warm-up, summary cache, analysis manifest or agent traces, and `tmp_path` as the
+    editing workspace. Returns `run(scenario)`, which awaits `scenario(client)` with an httpx client for the
+    app and returns its result.
+    """
+    llm_settings.setdefault("response_cache", {})["tasks"] = {}
+    llm_settings.setdefault("llm_client_cache", {})["warm_up"] = False
+    llm_settings.setdefault("documentation_pipeline", {})["summary_cache_path"] = ""
+    llm_settings.setdefault("analysis_pipeline", {})["manifest_path"] = ""
+    llm_settings.setdefault("editing_tools", {})["workspace_root"] = str(tmp_path)
+    llm_settings["agent_traces"] = {"enabled": False}
+    llm_settings.setdefault("fake_provider", {}).setdefault("profiles", {})["test_slow"] = {
+        "time_to_first_token_seconds": 0.3, "tokens_per_second": 0,
+    }
+
+    from api_main import app
+
+    def run(scenario):
+        async def main():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+                return await scenario(client)
+
+        return asyncio.run(main())
+
+    return run
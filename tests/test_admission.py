@@ -0,0 +1,116 @@
+# tests/test_admission.py
+import asyncio
+import time
+
+import pytest
+
+from core import admission
+from core.admission import TaskAdmission
+from core.exceptions import AdmissionRejectedError
+from core.llm_router import TokenBucket
+
+MODEL = "FAKE:test_slow"
+
+
+@pytest.fixture
+def admission_settings(fake_api, llm_settings, monkeypatch):
+    """Admission limits built afresh from the test's settings; single-flight off so identical requests queue."""
+    monkeypatch.setattr(admission, "_TASK_ADMISSIONS", {})
+    llm_settings["single_flight"] = {"enabled": False}
+    llm_settings["admission"] = {"enabled": True, "max_concurrency": 8, "max_queue": 32, "tasks": {}}
+    return llm_settings["admission"]["tasks"]
+
+
+def test_full_queue_rejects_at_once_with_retry_after():
+    gate = TaskAdmission("documentation", max_concurrency=1, max_queue=1)
+
+    async def scenario():
+        await gate.acquire()
+        queued = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await gate.acquire()
+        gate.release(held_seconds=3.0)
+        assert await queued >= 0
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+
+    assert rejected.status_code == 429
+    assert rejected.retry_after_seconds >= 1
+    assert gate.stats()["rejected"] == 1
+
+
+def test_queue_timeout_rejects_with_503():
+    gate = TaskAdmission("planning", max_concurrency=1, max_queue=4, max_queue_wait_seconds=0.05)
+
+    async def scenario():
+        await gate.acquire()
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await gate.acquire()
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+
+    assert rejected.status_code == 503
+    assert gate.stats()["queued"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    gate = TaskAdmission("editing", max_concurrency=1, max_queue=4)
+
+    async def scenario():
+        await gate.acquire()
+        waiter = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        gate.release()
+
+    asyncio.run(scenario())
+
+    assert gate.stats()["running"] == 0 and gate.stats()["queued"] == 0
+
+
+def test_token_bucket_paces_calls_after_the_burst():
+    bucket = TokenBucket(rate_per_second=20, burst=2)
+
+    started = time.perf_counter()
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert time.perf_counter() - started >= 0.09
+    assert bucket.stats()["waits"] == 2
+
+
+def test_api_rejects_beyond_the_queue_with_429(fake_api, admission_settings, tmp_path):
+    admission_settings["documentation"] = {"max_concurrency": 1, "max_queue": 1}
+    (tmp_path / "module.py").write_text("def handler(value):\n    return value\n", encoding="utf-8")
+
+    async def scenario(client):
+        data = {"model": MODEL, "data": {"project_path": str(tmp_path)}}
+        return await asyncio.gather(*(client.post("/tasks/documentation", json=data) for _ in range(4)))
+
+    responses = fake_api(scenario)
+
+    assert sorted(response.status_code for response in responses) == [200, 200, 429, 429]
+    for response in responses:
+        if response.status_code == 429:
+            assert int(response.headers["Retry-After"]) >= 1
+            assert response.json()["retry_after_seconds"] == int(response.headers["Retry-After"])
+    queue_waits = sorted(float(response.headers["X-Queue-Wait-Ms"]) for response in responses if response.status_code == 200)
+    assert queue_waits[0] == 0 and queue_waits[1] > 100
+
+
+def test_api_rejects_a_request_queued_too_long_with_503(fake_api, admission_settings):
+    admission_settings["optimizer"] = {"max_concurrency": 1, "max_queue": 4, "max_queue_wait_seconds": 0.1}
+
+    async def scenario(client):
+        data = {"model": MODEL, "data": {"raw_prompt": "write a poem about the sea"}}
+        return await asyncio.gather(*(client.post("/tasks/optimizer", json=data) for _ in range(2)))
+
+    responses = fake_api(scenario)
+
+    assert sorted(response.status_code for response in responses) == [200, 503]
+    rejected = next(response for response in responses if response.status_code == 503)
+    assert int(rejected.headers["Retry-After"]) >= 1
@@ -0,0 +1,27 @@
+# tests/test_async_load.py
+import asyncio
+import time
+
+MODEL = "FAKE:test_slow"
+REQUESTS = 10
+
+
+def test_concurrent_requests_take_about_as_long_as_one(fake_api):
+    async def post(client, index: int) -> None:
+        response = await client.post("/tasks/optimizer", json={"model": MODEL, "data": {"raw_prompt": f"write poem #{index}"}})
+        assert response.status_code == 200, response.text
+
+    async def scenario(client):
+        # Loads the service and its clients; not part of what is measured.
+        await post(client, -1)
+        started = time.perf_counter()
+        await post(client, 0)
+        single = time.perf_counter() - started
+        started = time.perf_counter()
+        await asyncio.gather(*(post(client, index) for index in range(1, REQUESTS + 1)))
+        return single, time.perf_counter() - started
+
+    single, concurrent = fake_api(scenario)
+
+    # A path that blocks the event loop takes about REQUESTS * single.
+    assert concurrent < 3 * single, f"{REQUESTS} concurrent requests took {concurrent:.2f}s, one took {single:.2f}s"
@@ -0,0 +1,20 @@
+# tests/test_editing_service.py
+from config.prompt_loader import PROMPT_REGISTRY
+from services.editing_service import EditingService
+
+
+def test_changing_agent_verbose_rebuilds_the_agent_executor(llm_settings):
+    # Loaded up front as the API's startup does, so the first build is not keyed on an unloaded registry.
+    PROMPT_REGISTRY.load_all()
+    editing_tools = llm_settings.setdefault("editing_tools", {})
+    service = EditingService()
+
+    editing_tools["agent_verbose"] = False
+    quiet, _ = service._build_agent_executor("FAKE:default")
+    assert service._build_agent_executor("FAKE:default")[0] is quiet
+
+    editing_tools["agent_verbose"] = True
+    verbose, _ = service._build_agent_executor("FAKE:default")
+
+    assert verbose is not quiet
+    assert verbose.bound.verbose and not quiet.bound.verbose
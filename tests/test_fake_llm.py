@@ -0,0 +1,95 @@
+# tests/test_fake_llm.py
+import asyncio
+import time
+
+import pytest
+from langchain_core.output_parsers import PydanticOutputParser
+from pydantic import BaseModel
+
+from config.llm_providers import LLM_PROVIDERS
+from core.fake_llm import FakeChatModel
+
+TASK_DATA = {
+    "planning": {"description": "Add a REST API endpoint that lists orders"},
+    "analysis": {"file_path": "{workspace}/app/handlers.py"},
+    "documentation": {"project_path": "{workspace}"},
+    "editing": {"instruction": "Explain what handler does without changing any file."},
+    "optimizer": {"raw_prompt": "write a poem about the sea"},
+}
+
+
+class _Finding(BaseModel):
+    title: str
+    severity: int
+    tags: list[str]
+
+
+def test_answers_depend_only_on_the_prompt():
+    model = FakeChatModel(output_words=12)
+
+    first, second = model.invoke("Describe the sea."), model.invoke("Describe the sea.")
+
+    assert first.content == second.content
+    assert len(first.content.split()) == 12
+    assert first.usage_metadata["output_tokens"] > 0 and first.usage_metadata["input_tokens"] > 0
+
+
+def test_scripted_response_wins():
+    model = FakeChatModel(responses=[{"contains": "backend or frontend", "response": "fullstack"}])
+
+    assert model.invoke("Is it backend or frontend?").content == "fullstack"
+
+
+def test_answers_format_instructions_with_valid_json():
+    parser = PydanticOutputParser(pydantic_object=_Finding)
+    answer = FakeChatModel().invoke(f"Review this code.\n{parser.get_format_instructions()}")
+
+    finding = parser.parse(answer.content)
+
+    assert isinstance(finding, _Finding)
+
+
+def test_json_mode_always_answers_json():
+    assert FakeChatModel().invoke("Say anything.", format="json").content == "{}"
+
+
+def test_streams_in_chunks_of_words_with_usage_on_the_last_chunk():
+    model = FakeChatModel(output_words=10, chunk_tokens=4)
+
+    chunks = list(model.stream("Describe the sea."))
+
+    assert len(chunks) == 3
+    assert "".join(chunk.content for chunk in chunks) == model.invoke("Describe the sea.").content
+    assert chunks[-1].usage_metadata is not None and chunks[0].usage_metadata is None
+
+
+def test_latency_follows_the_profile():
+    model = FakeChatModel(time_to_first_token_seconds=0.1, tokens_per_second=0)
+
+    started = time.perf_counter()
+    asyncio.run(model.ainvoke("Describe the sea."))
+
+    assert 0.1 <= time.perf_counter() - started < 0.5
+
+
+def test_provider_resolves_profiles(llm_settings):
+    provider = LLM_PROVIDERS["FAKE"]
+
+    assert provider.create_llm("instant", {}).time_to_first_token_seconds == 0
+    with pytest.raises(ValueError, match="Unknown FAKE profile"):
+        provider.create_llm("no_such_profile", {})
+
+
+@pytest.mark.parametrize("task_name", sorted(TASK_DATA))
+def test_every_task_runs_offline(fake_api, tmp_path, task_name):
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "handlers.py").write_text("def handler(value):\n    return value * 2\n", encoding="utf-8")
+    data = {key: value.format(workspace=tmp_path) for key, value in TASK_DATA[task_name].items()}
+
+    async def scenario(client):
+        return await client.post(f"/tasks/{task_name}", json={"model": "FAKE:instant", "data": data})
+
+    response = fake_api(scenario)
+
+    assert response.status_code == 200, response.text
+    assert response.json()
@@ -0,0 +1,125 @@
+# tests/test_jobs.py
+import asyncio
+import contextvars
+import threading
+import time
+
+from core.jobs import InMemoryJobStore, Job, JobManager, JobStatus, SQLiteJobStore
+from core.progress import report_progress
+
+
+class _RecordingStore(InMemoryJobStore):
+    """Remembers the threads that saved jobs and the progress of every save."""
+
+    def __init__(self):
+        super().__init__()
+        self.saving_threads = set()
+        self.saved_progress = []
+
+    def save(self, job: Job) -> None:
+        self.saving_threads.add(threading.get_ident())
+        self.saved_progress.append(dict(job.progress))
+        super().save(job)
+
+
+def _run_job(runner, progress_save_interval_seconds: float = 0.5) -> tuple[Job, _RecordingStore, int]:
+    store = _RecordingStore()
+
+    async def scenario():
+        manager = JobManager(store, concurrency_for=lambda task_name: 1, progress_save_interval_seconds=progress_save_interval_seconds)
+        job = manager.submit("documentation", {}, None, runner)
+        while not manager.get(job.id).status.is_terminal:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        return manager.get(job.id), threading.get_ident()
+
+    job, loop_thread = asyncio.run(scenario())
+    return job, store, loop_thread
+
+
+def test_progress_from_worker_threads_is_saved_on_the_event_loop():
+    def summarize() -> str:
+        for done in range(1, 201):
+            report_progress(stage="map", done=done, total=200)
+        return "summary"
+
+    async def runner():
+        return await asyncio.gather(*(asyncio.to_thread(summarize) for _ in range(4)))
+
+    job, store, loop_thread = _run_job(runner)
+
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.progress == {"stage": "map", "done": 200, "total": 200}
+    assert store.saving_threads == {loop_thread}
+
+
+def test_progress_after_the_job_finished_is_dropped():
+    worker_may_report = threading.Event()
+
+    def report_late() -> None:
+        worker_may_report.wait(timeout=5)
+        report_progress(stage="late")
+
+    async def runner():
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, contextvars.copy_context().run, report_late)
+        loop.call_later(0.02, worker_may_report.set)
+        return "done"
+
+    job, _, _ = _run_job(runner)
+
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.progress == {}
+
+
+def test_sqlite_store_fails_jobs_interrupted_by_a_restart(tmp_path):
+    db_path = str(tmp_path / "jobs" / "jobs.sqlite3")
+    finished = Job(task_name="optimizer", status=JobStatus.SUCCEEDED, result={"answer": 42})
+    running = Job(task_name="documentation", status=JobStatus.RUNNING)
+    store = SQLiteJobStore(db_path)
+    store.save(finished)
+    store.save(running)
+
+    restarted = SQLiteJobStore(db_path)
+
+    assert restarted.get(finished.id).result == {"answer": 42}
+    assert restarted.get(running.id).status == JobStatus.FAILED
+    assert restarted.get("unknown") is None
+
+
+def test_progress_saves_are_throttled():
+    async def runner():
+        for done in range(1, 101):
+            report_progress(stage="map", done=done)
+            await asyncio.sleep(0.003)
+        return "summary"
+
+    job, store, _ = _run_job(runner, progress_save_interval_seconds=0.1)
+
+    progress_saves = [progress for progress in store.saved_progress if progress]
+    # Roughly one save per 0.1s over a run of at least 0.3s, plus the final one.
+    assert 3 <= len(progress_saves) <= 10
+    assert progress_saves[-1] == job.progress == {"stage": "map", "done": 100}
+
+
+def test_memory_store_forgets_the_oldest_finished_jobs():
+    store = InMemoryJobStore(max_finished=2, finished_ttl_seconds=0)
+    running = Job(task_name="documentation", status=JobStatus.RUNNING)
+    store.save(running)
+    finished = [Job(task_name="optimizer", status=JobStatus.SUCCEEDED, finished_at=time.time()) for _ in range(3)]
+    for job in finished:
+        store.save(job)
+
+    assert store.get(finished[0].id) is None
+    assert store.get(finished[1].id) is not None and store.get(finished[2].id) is not None
+    assert store.get(running.id) is not None
+
+
+def test_memory_store_forgets_finished_jobs_after_their_ttl():
+    store = InMemoryJobStore(max_finished=0, finished_ttl_seconds=60)
+    old = Job(task_name="optimizer", status=JobStatus.FAILED, finished_at=time.time() - 120)
+    store.save(old)
+    recent = Job(task_name="optimizer", status=JobStatus.SUCCEEDED, finished_at=time.time())
+    store.save(recent)
+
+    assert store.get(old.id) is None and store.get(recent.id) is not None
@@ -0,0 +1,137 @@
+# tests/test_llm_router.py
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from core import llm_router
+from core.exceptions import ProviderUnavailableError
+from core.fake_llm import ScriptedFakeChatModel
+from core.llm_router import CircuitBreaker, ProviderGate, ProviderRouter, ProviderSlots, RouteCandidate
+
+
+def _candidate(model_id: str, steps: List[dict], failure_threshold: int = 5, reset_seconds: float = 60) -> RouteCandidate:
+    gate = ProviderGate(
+        name=model_id.split(":", 1)[0],
+        slots=ProviderSlots(4),
+        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_seconds=reset_seconds),
+    )
+    return RouteCandidate(model_id, ScriptedFakeChatModel(steps=steps), gate)
+
+
+def _half_open_candidate(model_id: str, llm) -> RouteCandidate:
+    """A candidate whose circuit has just reopened for a trial: the next `allow()` reserves the single trial call."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    return RouteCandidate(model_id, llm, ProviderGate(name=model_id.split(":", 1)[0], slots=ProviderSlots(4), breaker=breaker))
+
+
+def test_fails_over_and_opens_the_circuit():
+    primary = _candidate("PRIMARY:model", [{"error": "connection refused"}], failure_threshold=3)
+    fallback = _candidate("FALLBACK:model", [{"response": "ok"}])
+    router = ProviderRouter([primary, fallback])
+
+    answers = [router.invoke(f"prompt #{index}").content for index in range(6)]
+
+    assert answers == ["ok"] * 6
+    assert primary.llm.calls == 3
+    assert primary.gate.breaker.state == CircuitBreaker.OPEN
+
+
+def test_async_fails_over_on_timeout():
+    primary = _candidate("PRIMARY:model", [{"delay": 5, "response": "late"}])
+    fallback = _candidate("FALLBACK:model", [{"response": "ok"}])
+    router = ProviderRouter([primary, fallback], timeout_seconds=0.1)
+
+    started = time.perf_counter()
+    answer = asyncio.run(router.ainvoke("prompt"))
+
+    assert answer.content == "ok"
+    assert time.perf_counter() - started < 1
+    assert primary.gate.breaker.consecutive_failures == 1
+
+
+def test_raises_when_every_candidate_fails():
+    router = ProviderRouter([_candidate("A:model", [{"error": "down"}]), _candidate("B:model", [{"error": "down"}])])
+
+    with pytest.raises(ProviderUnavailableError) as error:
+        router.invoke("prompt")
+    assert "A:model" in str(error.value) and "B:model" in str(error.value)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_hedged_call_answers_from_the_faster_candidate(use_async):
+    primary = _candidate("PRIMARY:model", [{"delay": 2, "response": "slow"}])
+    fallback = _candidate("FALLBACK:model", [{"delay": 0.01, "response": "hedged"}])
+    router = ProviderRouter([primary, fallback], hedge_after_seconds=0.05)
+
+    started = time.perf_counter()
+    answer = asyncio.run(router.ainvoke("prompt")) if use_async else router.invoke("prompt")
+
+    assert answer.content == "hedged"
+    assert time.perf_counter() - started < 1
+    # The losing call was abandoned, which says nothing about the primary's health.
+    assert primary.gate.breaker.consecutive_failures == 0
+
+
+def test_half_open_trial_closes_the_circuit_on_success():
+    candidate = _half_open_candidate("PRIMARY:model", ScriptedFakeChatModel(steps=[{"response": "ok"}]))
+    router = ProviderRouter([candidate])
+
+    assert router.invoke("prompt").content == "ok"
+    assert candidate.gate.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stream_closed_early_releases_the_half_open_trial():
+    candidate = _half_open_candidate("PRIMARY:model", FakeListChatModel(responses=["hello world"]))
+    stream = ProviderRouter([candidate]).stream("prompt")
+
+    next(stream)
+    stream.close()
+
+    assert candidate.gate.breaker.allow()
+    assert candidate.gate.slots.stats()["in_use"] == 0
+
+
+def test_async_stream_closed_early_releases_the_half_open_trial():
+    candidate = _half_open_candidate("PRIMARY:model", FakeListChatModel(responses=["hello world"]))
+
+    async def read_one_chunk() -> None:
+        stream = ProviderRouter([candidate]).astream("prompt")
+        await anext(stream)
+        await stream.aclose()
+
+    asyncio.run(read_one_chunk())
+
+    assert candidate.gate.breaker.allow()
+    assert candidate.gate.slots.stats()["in_use"] == 0
+
+
+class _SaturatedExecutor:
+    """Runs the first call it is given and leaves later ones queued, as a pool with no free thread would."""
+
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.queued: List[Future] = []
+
+    def submit(self, fn, *args) -> Future:
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            return pool.submit(fn, *args)
+        self.queued.append(Future())
+        return self.queued[-1]
+
+
+def test_queued_hedge_cancelled_before_it_starts_releases_the_half_open_trial(monkeypatch):
+    executor = _SaturatedExecutor()
+    monkeypatch.setattr(llm_router, "_SYNC_ATTEMPT_EXECUTOR", executor)
+    primary = _candidate("PRIMARY:model", [{"delay": 0.2, "response": "ok"}])
+    hedge = _half_open_candidate("FALLBACK:model", ScriptedFakeChatModel(steps=[{"response": "hedged"}]))
+    router = ProviderRouter([primary, hedge], hedge_after_seconds=0.05)
+
+    assert router.invoke("prompt").content == "ok"
+    assert [future.cancelled() for future in executor.queued] == [True]
+    assert hedge.gate.breaker.allow()
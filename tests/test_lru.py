@@ -0,0 +1,90 @@
+# tests/test_lru.py
+import threading
+import time
+
+import pytest
+
+from core.lru import LRUCache
+
+
+class _FlakyFactory:
+    """Fails on its first call; every call takes `delay` seconds. Tracks how many calls overlap."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.delay)
+            if call == 1:
+                raise ConnectionError("provider down")
+            return "client"
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def test_evicts_the_least_recently_used_entry():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_factory_runs_once_for_concurrent_callers():
+    cache, calls = LRUCache(max_size=4), []
+
+    def factory() -> str:
+        calls.append(1)
+        time.sleep(0.05)
+        return "client"
+
+    threads = [threading.Thread(target=cache.get_or_create, args=("key", factory)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1 and cache.get("key") == "client"
+
+
+def test_failed_factory_is_retried_by_one_caller_at_a_time():
+    cache, factory = LRUCache(max_size=4), _FlakyFactory(delay=0.1)
+    results = []
+
+    def call() -> None:
+        try:
+            results.append(cache.get_or_create("key", factory))
+        except ConnectionError as e:
+            results.append(e)
+
+    early = [threading.Thread(target=call) for _ in range(2)]
+    for thread in early:
+        thread.start()
+    # Arrives after the first call failed, while the waiting caller retries.
+    time.sleep(0.15)
+    late = threading.Thread(target=call)
+    late.start()
+    for thread in early + [late]:
+        thread.join()
+
+    assert factory.calls == 2 and factory.max_running == 1
+    assert sorted(map(str, results)) == ["client", "client", "provider down"]
+
+
+def test_rejects_a_size_below_one():
+    with pytest.raises(ValueError):
+        LRUCache(max_size=0)
@@ -0,0 +1,63 @@
+# tests/test_response_cache.py
+import asyncio
+import threading
+
+import pytest
+
+from core.fake_llm import ScriptedFakeChatModel
+from core.llm_router import CircuitBreaker, ProviderGate, ProviderRouter, ProviderSlots, RouteCandidate
+from core.response_cache import CachedChatModel, ResponseCache
+
+
+def _candidate(model_id: str, steps) -> RouteCandidate:
+    gate = ProviderGate(name=model_id.split(":", 1)[0], slots=ProviderSlots(4), breaker=CircuitBreaker())
+    return RouteCandidate(model_id, ScriptedFakeChatModel(steps=steps), gate)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_answers_served_after_a_failover_are_not_cached(use_async):
+    primary = _candidate("PRIMARY:model", [{"error": "connection refused"}])
+    fallback = _candidate("FALLBACK:model", [{"response": "fallback answer"}])
+    cached = CachedChatModel(ProviderRouter([primary, fallback]), ResponseCache(16, None, 60), "task", "PRIMARY:model", {})
+
+    for _ in range(2):
+        answer = asyncio.run(cached.ainvoke("prompt")) if use_async else cached.invoke("prompt")
+        assert answer.content == "fallback answer"
+
+    assert fallback.llm.calls == 2
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_answers_the_parser_rejects_are_not_cached(use_async):
+    llm = ScriptedFakeChatModel(steps=[{"response": "not json"}, {"response": "{}"}])
+    cached = CachedChatModel(llm, ResponseCache(16, None, 60), "task", "FAKE:model", {}, accept=lambda text: text.startswith("{"))
+
+    async def stream_text() -> str:
+        return "".join([chunk.content async for chunk in cached.astream("prompt")])
+
+    answers = [asyncio.run(stream_text()) if use_async else "".join(chunk.content for chunk in cached.stream("prompt")) for _ in range(3)]
+
+    assert answers == ["not json", "{}", "{}"]
+    assert llm.calls == 2
+
+
+def test_async_lookup_reads_the_disk_in_a_worker_thread(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    ResponseCache(16, path, 60).store("key", "text")
+    cache = ResponseCache(16, path, 60)
+    disk_threads = []
+    lookup_disk = cache._lookup_disk
+
+    def recording_lookup_disk(key):
+        disk_threads.append(threading.current_thread())
+        return lookup_disk(key)
+
+    cache._lookup_disk = recording_lookup_disk
+
+    async def lookup_twice():
+        return [await cache.alookup("key"), await cache.alookup("key")]
+
+    assert asyncio.run(lookup_twice()) == ["text", "text"]
+    # The second lookup is answered from memory without leaving the event loop.
+    assert len(disk_threads) == 1 and disk_threads[0] is not threading.main_thread()
+    assert cache.disk_hits == 1
@@ -0,0 +1,139 @@
+# tests/test_single_flight.py
+import asyncio
+
+from core.llm_router import ROUTE_ATTEMPTS
+from core.single_flight import SingleFlight
+
+MODEL = "FAKE:test_slow"
+
+
+def _llm_calls() -> int:
+    return int(ROUTE_ATTEMPTS.value(provider="FAKE", model=MODEL, outcome="ok"))
+
+
+class _SlowWork:
+    """An execution that takes `delay` seconds and counts how often it was started."""
+
+    def __init__(self, delay: float = 0.1, error: Exception | None = None):
+        self.delay = delay
+        self.error = error
+        self.started = 0
+        self.cancelled = False
+
+    async def __call__(self) -> dict:
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return {"answer": 42}
+
+
+def test_identical_calls_share_one_execution():
+    flights, work = SingleFlight(), _SlowWork()
+
+    async def scenario():
+        return await asyncio.gather(*(flights.run("key", work, "analysis") for _ in range(5)))
+
+    results = asyncio.run(scenario())
+
+    assert work.started == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4, "abandoned": 0}
+
+
+def test_error_reaches_every_waiter():
+    flights, work = SingleFlight(), _SlowWork(error=ValueError("model failed"))
+
+    async def scenario():
+        return await asyncio.gather(*(flights.run("key", work, "analysis") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert work.started == 1
+    assert [type(result) for result in results] == [ValueError] * 3
+
+
+def test_cancelling_one_waiter_keeps_the_shared_execution():
+    flights, work = SingleFlight(), _SlowWork()
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(flights.run("key", work, "analysis")) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        waiters[0].cancel()
+        return await asyncio.gather(*waiters[1:])
+
+    assert asyncio.run(scenario()) == [{"answer": 42}] * 2
+    assert not work.cancelled
+
+
+def test_execution_is_cancelled_when_every_waiter_is_gone():
+    flights, work = SingleFlight(), _SlowWork()
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(flights.run("key", work, "analysis")) for _ in range(2)]
+        await asyncio.sleep(0.02)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+
+    assert work.cancelled
+    assert flights.stats()["abandoned"] == 1 and flights.stats()["in_flight"] == 0
+
+
+def test_identical_requests_make_one_llm_call(fake_api, tmp_path):
+    source_file = tmp_path / "module.py"
+    source_file.write_text("def handler(value):\n    return value * 2\n", encoding="utf-8")
+
+    async def scenario(client):
+        data = {"model": MODEL, "data": {"file_path": str(source_file)}}
+        return await asyncio.gather(*(client.post("/tasks/analysis", json=data) for _ in range(4)))
+
+    calls_before = _llm_calls()
+    responses = fake_api(scenario)
+
+    assert _llm_calls() - calls_before == 1
+    assert [response.status_code for response in responses] == [200] * 4
+    assert sorted(response.headers["X-Single-Flight"] for response in responses) == ["leader"] + ["shared"] * 3
+    assert len({response.text for response in responses}) == 1
+
+
+def test_request_for_a_changed_file_does_not_join(fake_api, tmp_path):
+    source_file = tmp_path / "module.py"
+    source_file.write_text("def handler(value):\n    return value * 2\n", encoding="utf-8")
+    data = {"model": MODEL, "data": {"file_path": str(source_file)}}
+
+    async def scenario(client):
+        first = asyncio.ensure_future(client.post("/tasks/analysis", json=data))
+        await asyncio.sleep(0.1)
+        source_file.write_text("def handler(value):\n    return value * 3\n", encoding="utf-8")
+        second = await client.post("/tasks/analysis", json=data)
+        return await first, second
+
+    calls_before = _llm_calls()
+    first, second = fake_api(scenario)
+
+    assert _llm_calls() - calls_before == 2
+    assert (first.headers["X-Single-Flight"], second.headers["X-Single-Flight"]) == ("leader", "leader")
+
+
+def test_disabled_single_flight_runs_every_request(fake_api, llm_settings, tmp_path):
+    llm_settings["single_flight"] = {"enabled": False}
+    source_file = tmp_path / "module.py"
+    source_file.write_text("def handler(value):\n    return value\n", encoding="utf-8")
+
+    async def scenario(client):
+        data = {"model": MODEL, "data": {"file_path": str(source_file)}}
+        return await asyncio.gather(*(client.post("/tasks/analysis", json=data) for _ in range(3)))
+
+    calls_before = _llm_calls()
+    responses = fake_api(scenario)
+
+    assert _llm_calls() - calls_before == 3
+    assert {response.headers["X-Single-Flight"] for response in responses} == {"off"}
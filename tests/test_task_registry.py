@@ -0,0 +1,29 @@
+# tests/test_task_registry.py
+import asyncio
+import threading
+
+import pytest
+
+from core.task_registry import TaskRegistry
+
+SPECS = {"documentation": ("services.docs_service", "DocsService", "DocsRequest")}
+
+
+def test_async_lookup_loads_the_service_in_a_worker_thread():
+    loading_threads = []
+    registry = TaskRegistry(SPECS, on_load=lambda service: loading_threads.append(threading.current_thread()))
+
+    async def lookup_twice():
+        return [await registry.aget("documentation"), await registry.aget("documentation")]
+
+    first, second = asyncio.run(lookup_twice())
+
+    assert first is second and type(first[0]).__name__ == "DocsService"
+    assert len(loading_threads) == 1 and loading_threads[0] is not threading.main_thread()
+
+
+def test_async_lookup_of_a_disabled_task_raises_key_error():
+    registry = TaskRegistry(SPECS, enabled=[])
+
+    with pytest.raises(KeyError):
+        asyncio.run(registry.aget("documentation"))
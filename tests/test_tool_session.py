@@ -0,0 +1,45 @@
+# tests/test_tool_session.py
+import pytest
+
+from tools.tool_session import ToolSession
+
+
+@pytest.fixture
+def session(llm_settings, tmp_path):
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "handlers.py").write_text("def handler(value):\n    return value\n", encoding="utf-8")
+    (tmp_path / "app" / "legacy.py").write_text("def old_handler(value):\n    return value\n", encoding="utf-8")
+    return ToolSession(root=str(tmp_path), stage_writes=True)
+
+
+DELETE_LEGACY = "--- a/app/legacy.py\n+++ /dev/null\n@@ -1,2 +0,0 @@\n-def old_handler(value):\n-    return value\n"
+
+
+def test_listings_show_staged_writes_and_hide_staged_deletions(session, tmp_path):
+    session.write_file("app/routes/orders.py", "def list_orders():\n    return []\n")
+
+    assert session.list_files("app") == "handlers.py\nlegacy.py\nroutes"
+    assert session.list_files("app/routes") == "orders.py"
+    assert "legacy" in session.apply_patch(DELETE_LEGACY)
+    assert session.list_files("app") == "handlers.py\nroutes"
+    assert session.list_tree("app") == "handlers.py\nroutes/\n  orders.py"
+    assert not (tmp_path / "app" / "routes").exists()
+
+
+def test_grep_searches_staged_content(session):
+    session.write_file("app/handlers.py", "def handler(value):\n    return value * 2\n")
+    session.write_file("app/orders.py", "def order_handler():\n    return None\n")
+    session.write_file("app/legacy.py", "")
+
+    assert session.grep_files("handler | app") == "app/handlers.py:1: def handler(value):\napp/orders.py:1: def order_handler():"
+    assert session.grep_files("value \\* 2") == "app/handlers.py:2: return value * 2"
+
+
+def test_discard_restores_the_disk_listings(session):
+    session.write_file("app/orders.py", "def list_orders():\n    return []\n")
+    session.list_files("app")
+
+    session.discard()
+
+    assert session.list_files("app") == "handlers.py\nlegacy.py"
+    assert session.grep_files("list_orders") == "No matches for 'list_orders'."
@@ -1,23 +1,196 @@
 # tools/filesystem_tools.py
 import os
-from langchain.tools import tool
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from langchain_core.tools import tool
 
-def _resolve_path(file_path: str) -> str:
+from core.file_discovery import DEFAULT_MAX_FILE_BYTES
+from core.workspace_index import iter_source_files, iter_tree, mark_changed, read_source_text, read_text_file
+from config.settings import get_section_settings
+from tools.patching import apply_file_patch, commit_changes, parse_patch
+
+DEFAULT_WORKSPACE_ROOT = "/workspace"
+
+def _tool_settings() -> dict:
+    return get_section_settings("editing_tools")
+
+def _workspace_root() -> str:
+    return os.path.abspath(_tool_settings().get("workspace_root") or DEFAULT_WORKSPACE_ROOT)
+
+def _resolve_path(file_path: str, root: Optional[str] = None) -> str:
     """Helper function to safely resolve paths inside the workspace."""
+    root = os.path.abspath(root or _workspace_root())
     clean_path = file_path.strip()
-    secure_path = os.path.join("/workspace", clean_path.lstrip('/'))
-    if not os.path.abspath(secure_path).startswith('/workspace'):
-        raise PermissionError("Error: Directory traversal outside of /workspace is not allowed.")
+    secure_path = os.path.abspath(os.path.join(root, clean_path.lstrip('/')))
+    if os.path.commonpath([root, secure_path]) != root:
+        raise PermissionError(f"Error: Directory traversal outside of {root} is not allowed.")
     return secure_path
 
+def _split_tool_input(tool_input: str, count: int) -> List[str]:
+    """Splits a ReAct `Action Input` of the form 'a | b | c' into at most `count` stripped parts."""
+    parts = [part.strip() for part in tool_input.split("|", count - 1)]
+    return parts + [""] * (count - len(parts))
+
+def _staged_below(directory_path: str, staged: Optional[Dict[str, Optional[str]]]) -> Tuple[List[str], Set[str]]:
+    """
+    The staged changes (absolute path -> new content, or None for a deletion) under `directory_path`, as the
+    paths relative to it that are written and the ones that are deleted.
+    """
+    written, deleted = [], set()
+    for path, content in (staged or {}).items():
+        if os.path.commonpath([directory_path, path]) == directory_path and path != directory_path:
+            relative_path = os.path.relpath(path, directory_path)
+            if content is None:
+                deleted.add(relative_path)
+            else:
+                written.append(relative_path)
+    return written, deleted
+
+def _tree_order(relative_paths: Iterable[str]) -> List[str]:
+    """Depth-first in name order, as the tree and the walkers list paths."""
+    return sorted(relative_paths, key=lambda relative_path: relative_path.split(os.sep))
+
+# --- Plain helpers (shared by the tools below and the memoising ToolSession) ---
+# `staged` holds changes not yet written to disk (absolute path -> new content, or None for a deletion);
+# listings and searches show them as if they were.
+
+def list_directory(directory: str, root: Optional[str] = None, staged: Optional[Dict[str, Optional[str]]] = None) -> str:
+    directory_path = _resolve_path(directory, root)
+    written, deleted = _staged_below(directory_path, staged)
+    try:
+        names = set(os.listdir(directory_path))
+    except FileNotFoundError:
+        if not written:
+            raise
+        names = set()
+    names = (names - deleted) | {relative_path.split(os.sep, 1)[0] for relative_path in written}
+    return "\n".join(sorted(names))
+
+def read_workspace_file(file_path: str, root: Optional[str] = None) -> str:
+    return read_source_text(_resolve_path(file_path, root), index_root=root or _workspace_root())
+
+def write_workspace_file(file_path: str, content: str, root: Optional[str] = None) -> None:
+    resolved_path = _resolve_path(file_path, root)
+    os.makedirs(os.path.dirname(resolved_path), exist_ok=True)
+    with open(resolved_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    mark_changed([resolved_path])
+
+def _with_staged_entries(entries: Iterable[Tuple[str, bool, int]], written: List[str], deleted: Set[str], max_depth: int) -> List[Tuple[str, bool, int]]:
+    """Tree entries without the deleted files and with the written ones (and their new directories)."""
+    is_dir_by_path = {relative_path: is_dir for relative_path, is_dir, _ in entries if relative_path not in deleted}
+    for relative_path in written:
+        parts = relative_path.split(os.sep)
+        for depth in range(1, min(len(parts), max_depth) + 1):
+            is_dir_by_path.setdefault(os.sep.join(parts[:depth]), depth < len(parts))
+    return [(relative_path, is_dir_by_path[relative_path], relative_path.count(os.sep) + 1) for relative_path in _tree_order(is_dir_by_path)]
+
+def render_tree(directory: str, max_depth: int, root: Optional[str] = None, staged: Optional[Dict[str, Optional[str]]] = None) -> str:
+    """An indented listing of `directory` down to `max_depth` levels; excluded and git-ignored paths are skipped."""
+    max_entries = int(_tool_settings().get("tree_max_entries", 500))
+    directory_path = _resolve_path(directory, root)
+    entries = iter_tree(directory_path, max_depth=max_depth, index_root=root or _workspace_root())
+    written, deleted = _staged_below(directory_path, staged)
+    if written or deleted:
+        entries = _with_staged_entries(entries, written, deleted, max_depth)
+    lines = []
+    for relative_path, is_dir, depth in entries:
+        if len(lines) == max_entries:
+            lines.append(f"... (truncated at {max_entries} entries; list a subdirectory or lower the depth)")
+            break
+        name = os.path.basename(relative_path)
+        lines.append("  " * (depth - 1) + (f"{name}/" if is_dir else name))
+    return "\n".join(lines) or "(empty directory)"
+
+def format_line_range(content: str, start: int, end: Optional[int]) -> str:
+    """Lines `start`..`end` (1-based, inclusive) of `content`, prefixed with their line numbers."""
+    lines = content.splitlines()
+    start = max(start, 1)
+    end = len(lines) if end is None else min(end, len(lines))
+    if start > end:
+        return f"(no lines in range; the file has {len(lines)} lines)"
+    return "\n".join(f"{number}: {lines[number - 1]}" for number in range(start, end + 1))
+
+def grep_workspace(
+    pattern: str, directory: str, read: Callable[[str], Optional[str]], root: Optional[str] = None,
+    staged: Optional[Dict[str, Optional[str]]] = None,
+) -> str:
+    """
+    Searches the text files under `directory` for a regular expression (case-insensitive) and returns
+    'path:line: text' matches. `read` returns a file's text given its workspace-relative path.
+    """
+    regex = re.compile(pattern, re.IGNORECASE)
+    max_matches = int(_tool_settings().get("grep_max_matches", 200))
+    workspace = os.path.abspath(root or _workspace_root())
+    directory_path = _resolve_path(directory, root)
+    paths = iter_source_files(directory_path, extensions=None, max_file_bytes=DEFAULT_MAX_FILE_BYTES, index_root=workspace)
+    written, deleted = _staged_below(directory_path, staged)
+    if written or deleted:
+        relative_paths = {os.path.relpath(path, directory_path) for path in paths} - deleted | set(written)
+        paths = [os.path.join(directory_path, relative_path) for relative_path in _tree_order(relative_paths)]
+    matches = []
+    for path in paths:
+        relative_path = os.path.relpath(path, workspace)
+        text = read(relative_path)
+        if text is None:
+            continue
+        for number, line in enumerate(text.splitlines(), start=1):
+            if regex.search(line):
+                matches.append(f"{relative_path}:{number}: {line.strip()[:200]}")
+                if len(matches) == max_matches:
+                    return "\n".join(matches + [f"... (stopped at {max_matches} matches; narrow the pattern or directory)"])
+    return "\n".join(matches) or f"No matches for '{pattern}'."
+
+def read_existing_file(file_path: str, root: Optional[str] = None) -> Optional[str]:
+    """The file's content, or None when it does not exist."""
+    try:
+        return read_workspace_file(file_path, root)
+    except FileNotFoundError:
+        return None
+
+def prepare_patch(patch_text: str, read_current: Callable[[str], Optional[str]], root: Optional[str] = None) -> Tuple[dict, str]:
+    """
+    Parses a patch and applies it in memory to the current content of each file it touches.
+    Returns ({absolute path: new content, or None to delete}, a one-line summary per file).
+    Raises PatchError, touching nothing, if any hunk of any file does not apply.
+    """
+    changes, summary = {}, []
+    for patch in parse_patch(patch_text):
+        resolved_path = _resolve_path(patch.path, root)
+        new_content = apply_file_patch(read_current(patch.path), patch)
+        changes[resolved_path] = new_content
+        if new_content is None:
+            summary.append(f"{patch.path}: deleted")
+        else:
+            added = sum(len(hunk.new_lines) for hunk in patch.hunks)
+            removed = sum(len(hunk.old_lines) for hunk in patch.hunks)
+            summary.append(f"{patch.path}: {len(patch.hunks)} hunk(s) applied ({added} lines in, {removed} lines out)")
+    return changes, "\n".join(summary)
+
+def parse_read_files_input(tool_input: str) -> List[str]:
+    return [path.strip() for path in re.split(r"[,\n]", tool_input) if path.strip()]
+
+def parse_range_input(tool_input: str) -> Tuple[str, int, Optional[int]]:
+    file_path, start, end = _split_tool_input(tool_input, 3)
+    return file_path, int(start or 1), int(end) if end else None
+
+def parse_tree_input(tool_input: str) -> Tuple[str, int]:
+    directory, depth = _split_tool_input(tool_input, 2)
+    return directory or ".", int(depth) if depth else int(_tool_settings().get("tree_max_depth", 3))
+
+def parse_grep_input(tool_input: str) -> Tuple[str, str]:
+    pattern, directory = _split_tool_input(tool_input, 2)
+    return pattern, directory or "."
+
+# --- Tools ---
+
 @tool
 def list_files(directory: str = '.') -> str:
     """
     Lists all files and directories in a given directory path relative to the workspace.
     """
     try:
-        resolved_dir = _resolve_path(directory)
-        return "\n".join(os.listdir(resolved_dir))
+        return list_directory(directory)
     except Exception as e:
         return f"Error listing files in '{directory}': {e}"
 
@@ -28,9 +201,7 @@ def read_file(file_path: str) -> str:
     The `file_path` argument must be a valid path to a file.
     """
     try:
-        resolved_path = _resolve_path(file_path)
-        with open(resolved_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return read_workspace_file(file_path)
     except Exception as e:
         return f"Error reading file '{file_path}': {e}"
 
@@ -43,10 +214,79 @@ def write_file(file_path: str, content: str) -> str:
     2. content (string): The new content you want to write into the file.
     """
     try:
-        resolved_path = _resolve_path(file_path)
-        os.makedirs(os.path.dirname(resolved_path), exist_ok=True)
-        with open(resolved_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_workspace_file(file_path, content)
         return f"File '{file_path}' saved successfully."
     except Exception as e:
         return f"Error writing to file '{file_path}': {e}"
+
+@tool
+def apply_patch(patch: str) -> str:
+    """
+    Edits files by applying a patch instead of rewriting whole files. Use it for every change to an existing file.
+    The input is either a unified diff ('--- a/path', '+++ b/path', '@@ -l,n +l,n @@' hunks with context lines),
+    or one or more search/replace blocks, each preceded by the file path on its own line:
+    path/to/file.py
+    <<<<<<< SEARCH
+    exact existing lines
+    =======
+    replacement lines
+    >>>>>>> REPLACE
+    The SEARCH lines must match the file exactly once. An empty SEARCH section creates a new file.
+    If any part of the patch does not apply, nothing is changed.
+    """
+    try:
+        changes, summary = prepare_patch(patch, read_existing_file)
+        commit_changes(changes)
+        return summary
+    except Exception as e:
+        return f"Error applying patch: {e}"
+
+@tool
+def list_tree(tool_input: str = '.') -> str:
+    """
+    Lists a directory recursively as an indented tree, skipping VCS, dependency, build and git-ignored paths.
+    Input: 'directory' or 'directory | max_depth' (default depth 3), e.g. 'src | 2'.
+    """
+    try:
+        directory, max_depth = parse_tree_input(tool_input)
+        return render_tree(directory, max_depth)
+    except Exception as e:
+        return f"Error listing tree for '{tool_input}': {e}"
+
+@tool
+def read_files(tool_input: str) -> str:
+    """
+    Reads several files in one step. Input: file paths relative to the workspace, separated by commas,
+    e.g. 'app.py, services/base.py'. Each file is returned under a '=== path ===' header.
+    """
+    sections = []
+    for file_path in parse_read_files_input(tool_input):
+        try:
+            sections.append(f"=== {file_path} ===\n{read_workspace_file(file_path)}")
+        except Exception as e:
+            sections.append(f"=== {file_path} ===\nError reading file: {e}")
+    return "\n\n".join(sections) or "No file paths given."
+
+@tool
+def read_file_range(tool_input: str) -> str:
+    """
+    Reads only some lines of a file, with line numbers. Input: 'file_path | start_line | end_line'
+    (1-based, inclusive; omit end_line to read to the end), e.g. 'app.py | 40 | 80'.
+    """
+    try:
+        file_path, start, end = parse_range_input(tool_input)
+        return format_line_range(read_workspace_file(file_path), start, end)
+    except Exception as e:
+        return f"Error reading lines from '{tool_input}': {e}"
+
+@tool
+def grep_files(tool_input: str) -> str:
+    """
+    Searches the text files of the workspace for a regular expression (case-insensitive).
+    Input: 'pattern' or 'pattern | directory', e.g. 'def execute | services'. Returns 'path:line: text' matches.
+    """
+    try:
+        pattern, directory = parse_grep_input(tool_input)
+        return grep_workspace(pattern, directory, lambda path: read_text_file(_resolve_path(path), index_root=_workspace_root()))
+    except Exception as e:
+        return f"Error searching for '{tool_input}': {e}"
@@ -0,0 +1,264 @@
+# tools/patching.py
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from core.workspace_index import mark_changed
+
+
+class PatchError(ValueError):
+    """Raised when a patch cannot be parsed or does not apply to the current file content."""
+
+
+@dataclass
+class Hunk:
+    """One change: `old_lines` (context and removed lines) are replaced by `new_lines` (context and added lines)."""
+
+    old_lines: List[str]
+    new_lines: List[str]
+    # 1-based line of `old_lines` in the original file, when the diff says so. For a pure insertion
+    # (no old lines) it is the line the new lines go after, 0 for the top of the file.
+    start_hint: Optional[int] = None
+
+
+@dataclass
+class FilePatch:
+    path: str
+    hunks: List[Hunk] = field(default_factory=list)
+    is_new: bool = False
+    is_deleted: bool = False
+
+
+# --- Parsing ---
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_SEARCH_MARKER = re.compile(r"^<{5,9} SEARCH\s*$")
+_DIVIDER_MARKER = re.compile(r"^={5,9}\s*$")
+_REPLACE_MARKER = re.compile(r"^>{5,9} REPLACE\s*$")
+
+
+def _strip_diff_path(raw: str) -> Optional[str]:
+    path = raw.split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def parse_unified_diff(text: str) -> List[FilePatch]:
+    """Parses a unified diff (as produced by `git diff` or `diff -u`) covering one or more files."""
+    lines = text.splitlines()
+    patches: List[FilePatch] = []
+    index = 0
+    while index < len(lines):
+        if not lines[index].startswith("--- "):
+            index += 1
+            continue
+        if index + 1 >= len(lines) or not lines[index + 1].startswith("+++ "):
+            raise PatchError(f"Expected a '+++' line after '{lines[index]}'.")
+        old_path, new_path = _strip_diff_path(lines[index][4:]), _strip_diff_path(lines[index + 1][4:])
+        if old_path is None and new_path is None:
+            raise PatchError("A diff cannot have /dev/null as both the old and the new file.")
+        patch = FilePatch(path=new_path or old_path, is_new=old_path is None, is_deleted=new_path is None)
+        index += 2
+
+        while index < len(lines) and not lines[index].startswith("--- "):
+            header = _HUNK_HEADER.match(lines[index])
+            if not header:
+                index += 1
+                continue
+            old_count = int(header.group(2)) if header.group(2) is not None else 1
+            new_count = int(header.group(4)) if header.group(4) is not None else 1
+            hunk = Hunk(old_lines=[], new_lines=[], start_hint=int(header.group(1)))
+            index += 1
+            while index < len(lines) and (len(hunk.old_lines) < old_count or len(hunk.new_lines) < new_count):
+                line = lines[index]
+                if line.startswith("\\"):  # "\ No newline at end of file"
+                    index += 1
+                    continue
+                marker, content = (line[:1], line[1:]) if line else (" ", "")
+                if marker == " ":
+                    hunk.old_lines.append(content)
+                    hunk.new_lines.append(content)
+                elif marker == "-":
+                    hunk.old_lines.append(content)
+                elif marker == "+":
+                    hunk.new_lines.append(content)
+                else:
+                    raise PatchError(f"Unexpected line in hunk of '{patch.path}': '{line}'.")
+                index += 1
+            if len(hunk.old_lines) != old_count or len(hunk.new_lines) != new_count:
+                raise PatchError(f"A hunk of '{patch.path}' is shorter than its '@@' header says.")
+            patch.hunks.append(hunk)
+        if not patch.hunks and not patch.is_deleted:
+            raise PatchError(f"The diff for '{patch.path}' has no hunks.")
+        patches.append(patch)
+    if not patches:
+        raise PatchError("No '---'/'+++' file headers found in the diff.")
+    return patches
+
+
+def parse_search_replace(text: str) -> List[FilePatch]:
+    """
+    Parses search/replace blocks, each preceded by the path of its file:
+
+        path/to/file.py
+        <<<<<<< SEARCH
+        lines to find
+        =======
+        lines to put in their place
+        >>>>>>> REPLACE
+
+    An empty SEARCH section on a file that does not exist creates it.
+    """
+    lines = text.splitlines()
+    patches: Dict[str, FilePatch] = {}
+    index = 0
+    while index < len(lines):
+        if not _SEARCH_MARKER.match(lines[index]):
+            index += 1
+            continue
+        path = next((line.strip().strip("`") for line in reversed(lines[:index]) if line.strip() and not line.startswith("```")), "")
+        if not path or _REPLACE_MARKER.match(path):
+            raise PatchError("Each SEARCH block must be preceded by the path of its file on its own line.")
+        search, replace = [], []
+        index += 1
+        while index < len(lines) and not _DIVIDER_MARKER.match(lines[index]):
+            search.append(lines[index])
+            index += 1
+        index += 1
+        while index < len(lines) and not _REPLACE_MARKER.match(lines[index]):
+            replace.append(lines[index])
+            index += 1
+        if index >= len(lines):
+            raise PatchError(f"The block for '{path}' has no '>>>>>>> REPLACE' line.")
+        index += 1
+        patch = patches.setdefault(path, FilePatch(path=path))
+        patch.hunks.append(Hunk(old_lines=search, new_lines=replace))
+    if not patches:
+        raise PatchError("No '<<<<<<< SEARCH' blocks found.")
+    return list(patches.values())
+
+
+def parse_patch(text: str) -> List[FilePatch]:
+    """Parses either format: search/replace blocks when a SEARCH marker is present, a unified diff otherwise."""
+    if any(_SEARCH_MARKER.match(line) for line in text.splitlines()):
+        return parse_search_replace(text)
+    return parse_unified_diff(text)
+
+
+# --- Applying ---
+
+def _find_block(lines: List[str], block: List[str], hint: Optional[int]) -> List[int]:
+    """Start indexes where `block` occurs in `lines`: the hinted position alone if it matches, else every match."""
+    size = len(block)
+    if hint is not None and lines[hint - 1:hint - 1 + size] == block:
+        return [hint - 1]
+    matches = [start for start in range(len(lines) - size + 1) if lines[start:start + size] == block]
+    if matches:
+        return matches
+    # Models often get trailing whitespace wrong; retry ignoring it.
+    stripped_block = [line.rstrip() for line in block]
+    return [start for start in range(len(lines) - size + 1) if [line.rstrip() for line in lines[start:start + size]] == stripped_block]
+
+
+def apply_file_patch(original: Optional[str], patch: FilePatch) -> Optional[str]:
+    """
+    Returns the new content of the file (None when the patch deletes it). `original` is None for a file
+    that does not exist. Raises PatchError when a hunk is not found exactly once.
+    """
+    if patch.is_deleted:
+        if original is None:
+            raise PatchError(f"Cannot delete '{patch.path}': the file does not exist.")
+        return None
+    creating = original is None
+    if creating and not (patch.is_new or all(not hunk.old_lines for hunk in patch.hunks)):
+        raise PatchError(f"'{patch.path}' does not exist; to create it, use an empty SEARCH section or a diff from /dev/null.")
+    if not creating and patch.is_new:
+        raise PatchError(f"'{patch.path}' already exists; the diff expects to create it.")
+
+    lines = [] if creating else original.splitlines()
+    ends_with_newline = creating or original.endswith("\n")
+    # Hunks are applied in order; later hints are shifted by the line count changes of earlier hunks.
+    offset = 0
+    for number, hunk in enumerate(patch.hunks, start=1):
+        if not hunk.old_lines:
+            if creating:
+                lines = lines + hunk.new_lines
+                continue
+            if hunk.start_hint is None:
+                raise PatchError(f"Hunk {number} of '{patch.path}' has nothing to search for; include some existing lines.")
+            position = min(max(hunk.start_hint + offset, 0), len(lines))
+            lines[position:position] = hunk.new_lines
+            offset += len(hunk.new_lines)
+            continue
+        hint = hunk.start_hint + offset if hunk.start_hint else None
+        starts = _find_block(lines, hunk.old_lines, hint if hint and hint > 0 else None)
+        if not starts:
+            preview = "\n".join(hunk.old_lines[:3])
+            raise PatchError(f"Hunk {number} of '{patch.path}' does not match the file. Lines not found:\n{preview}")
+        if len(starts) > 1:
+            raise PatchError(f"Hunk {number} of '{patch.path}' matches {len(starts)} places; include more context lines.")
+        start = starts[0]
+        lines[start:start + len(hunk.old_lines)] = hunk.new_lines
+        offset += len(hunk.new_lines) - len(hunk.old_lines)
+    return "\n".join(lines) + ("\n" if ends_with_newline and lines else "")
+
+
+# --- Atomic commit ---
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """Writes `data` to a temporary file next to `path`, then renames it over `path`."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def commit_changes(changes: Dict[str, Optional[str]]) -> List[str]:
+    """
+    Writes every staged change (absolute path -> new content, or None to delete) or none of them.
+    Each file is replaced with temp-file-and-rename; if any write fails, the files already changed are
+    restored to their previous content and the error is raised. Returns the changed paths.
+    """
+    originals: List[Tuple[str, Optional[bytes]]] = []
+    try:
+        for path, content in changes.items():
+            previous = None
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    previous = f.read()
+            originals.append((path, previous))
+            if content is None:
+                if previous is not None:
+                    os.remove(path)
+            else:
+                _atomic_write(path, content.encode("utf-8"))
+    except BaseException:
+        for path, previous in reversed(originals):
+            try:
+                if previous is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                else:
+                    _atomic_write(path, previous)
+            except OSError as e:
+                print(f"WARNING: Could not roll back '{path}': {e}")
+        raise
+    finally:
+        mark_changed(path for path, _ in originals)
+    return list(changes)
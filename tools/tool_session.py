@@ -0,0 +1,230 @@
+# tools/tool_session.py
+import contextvars
+import os
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from core.workspace_index import read_text_file
+from tools import filesystem_tools as fs
+from tools.patching import commit_changes
+
+# The session of the agent run in progress. Tool calls made in executor threads see it through the copied context.
+_ACTIVE_SESSION: contextvars.ContextVar[Optional["ToolSession"]] = contextvars.ContextVar("active_tool_session", default=None)
+
+
+class ToolSession:
+    """
+    The filesystem tools of one agent run, with memoised reads and staged writes.
+
+    File contents, directory listings, trees and search results are kept for the rest of the run, so an agent
+    that looks at the same path twice does not hit the disk again. `write_file` drops the written file and
+    every listing and search result, since any of them may now be stale. Counters are in `stats()`.
+
+    With `stage_writes`, `write_file` and `apply_patch` only record the new content (reads, listings, trees and
+    searches see it), and `commit()` writes every change at the end of the run, all or nothing; `discard()`
+    drops them instead.
+    """
+
+    def __init__(self, root: Optional[str] = None, memoize: bool = True, stage_writes: bool = True):
+        self.root = root
+        self.memoize = memoize
+        self.stage_writes = stage_writes
+        self._files: Dict[str, Optional[str]] = {}
+        self._listings: Dict[tuple, str] = {}
+        # Absolute path -> new content, or None for a deleted file.
+        self._staged: Dict[str, Optional[str]] = {}
+        self.calls: Dict[str, int] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bytes_read = 0
+        self.bytes_returned = 0
+        self.files_written = 0
+        self.bytes_written = 0
+
+    # --- Memoised reads ---
+    def _read_text(self, file_path: str, strict: bool = True) -> Optional[str]:
+        """File content by workspace-relative path. With `strict`, unreadable files raise; otherwise they are None."""
+        key = fs._resolve_path(file_path, self.root)
+        if key in self._staged:
+            if self._staged[key] is None and strict:
+                raise FileNotFoundError(f"'{file_path}' is deleted by a staged change.")
+            return self._staged[key]
+        if self.memoize and key in self._files and (self._files[key] is not None or not strict):
+            self.cache_hits += 1
+            return self._files[key]
+        self.cache_misses += 1
+        if strict:
+            text = fs.read_workspace_file(file_path, self.root)
+        else:
+            text = read_text_file(key, index_root=fs._resolve_path(".", self.root))
+        if text is not None:
+            self.bytes_read += len(text.encode("utf-8"))
+        if self.memoize:
+            self._files[key] = text
+        return text
+
+    def _listing(self, key: tuple, produce: Callable[[], str]) -> str:
+        if self.memoize and key in self._listings:
+            self.cache_hits += 1
+            return self._listings[key]
+        self.cache_misses += 1
+        result = produce()
+        if self.memoize:
+            self._listings[key] = result
+        return result
+
+    def _current_content(self, file_path: str) -> Optional[str]:
+        """Content including staged changes, or None when the file does not exist."""
+        try:
+            return self._read_text(file_path)
+        except FileNotFoundError:
+            return None
+
+    def _invalidate(self, path: str) -> None:
+        self._files.pop(path, None)
+        self._listings.clear()
+
+    def _write(self, changes: Dict[str, Optional[str]]) -> None:
+        """Stages the changes, or writes them right away (atomically) when staging is off."""
+        if self.stage_writes:
+            self._staged.update(changes)
+        else:
+            self._record_written(commit_changes(changes), changes)
+        for path in changes:
+            self._invalidate(path)
+
+    def _record_written(self, paths: List[str], changes: Dict[str, Optional[str]]) -> None:
+        self.files_written += len(paths)
+        self.bytes_written += sum(len(changes[path].encode("utf-8")) for path in paths if changes[path] is not None)
+
+    # --- Transaction ---
+    def commit(self) -> List[str]:
+        """Writes every staged change, all or nothing. Returns the changed paths, relative to the workspace."""
+        staged, self._staged = self._staged, {}
+        if not staged:
+            return []
+        paths = commit_changes(staged)
+        self._record_written(paths, staged)
+        root = fs._resolve_path(".", self.root)
+        return [os.path.relpath(path, root) for path in paths]
+
+    def discard(self) -> None:
+        """Drops the staged changes without writing them."""
+        for path in self._staged:
+            self._invalidate(path)
+        self._staged = {}
+
+    # --- Tool implementations ---
+    def list_files(self, directory: str = '.') -> str:
+        try:
+            return self._listing(("list", fs._resolve_path(directory, self.root)), lambda: fs.list_directory(directory, self.root, self._staged))
+        except Exception as e:
+            return f"Error listing files in '{directory}': {e}"
+
+    def read_file(self, file_path: str) -> str:
+        try:
+            return self._read_text(file_path)
+        except Exception as e:
+            return f"Error reading file '{file_path}': {e}"
+
+    def write_file(self, file_path: str, content: str) -> str:
+        try:
+            self._write({fs._resolve_path(file_path, self.root): content})
+            return f"File '{file_path}' saved successfully."
+        except Exception as e:
+            return f"Error writing to file '{file_path}': {e}"
+
+    def apply_patch(self, patch: str) -> str:
+        try:
+            changes, summary = fs.prepare_patch(patch, self._current_content, self.root)
+            self._write(changes)
+            return summary
+        except Exception as e:
+            return f"Error applying patch: {e}"
+
+    def list_tree(self, tool_input: str = '.') -> str:
+        try:
+            directory, max_depth = fs.parse_tree_input(tool_input)
+            key = ("tree", fs._resolve_path(directory, self.root), max_depth)
+            return self._listing(key, lambda: fs.render_tree(directory, max_depth, self.root, self._staged))
+        except Exception as e:
+            return f"Error listing tree for '{tool_input}': {e}"
+
+    def read_files(self, tool_input: str) -> str:
+        sections = []
+        for file_path in fs.parse_read_files_input(tool_input):
+            try:
+                sections.append(f"=== {file_path} ===\n{self._read_text(file_path)}")
+            except Exception as e:
+                sections.append(f"=== {file_path} ===\nError reading file: {e}")
+        return "\n\n".join(sections) or "No file paths given."
+
+    def read_file_range(self, tool_input: str) -> str:
+        try:
+            file_path, start, end = fs.parse_range_input(tool_input)
+            return fs.format_line_range(self._read_text(file_path), start, end)
+        except Exception as e:
+            return f"Error reading lines from '{tool_input}': {e}"
+
+    def grep_files(self, tool_input: str) -> str:
+        try:
+            pattern, directory = fs.parse_grep_input(tool_input)
+            key = ("grep", pattern, fs._resolve_path(directory, self.root))
+            return self._listing(
+                key,
+                lambda: fs.grep_workspace(pattern, directory, lambda path: self._read_text(path, strict=False), self.root, self._staged),
+            )
+        except Exception as e:
+            return f"Error searching for '{tool_input}': {e}"
+
+    # --- Tool calls ---
+    @contextmanager
+    def activate(self) -> Iterator["ToolSession"]:
+        """Makes this the session that the tools from `session_tools()` act on, for the duration of the block."""
+        token = _ACTIVE_SESSION.set(self)
+        try:
+            yield self
+        finally:
+            _ACTIVE_SESSION.reset(token)
+
+    def call(self, name: str, *args, **kwargs) -> str:
+        """Runs the tool method `name`, counting the call and the size of its result."""
+        self.calls[name] = self.calls.get(name, 0) + 1
+        result = getattr(self, name)(*args, **kwargs)
+        self.bytes_returned += len(result.encode("utf-8"))
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "tool_calls": sum(self.calls.values()),
+            "calls": dict(self.calls),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "bytes_read": self.bytes_read,
+            "bytes_returned": self.bytes_returned,
+            "staged_files": len(self._staged),
+            "files_written": self.files_written,
+            "bytes_written": self.bytes_written,
+        }
+
+
+def _dispatch(name: str) -> Callable[..., str]:
+    def run(*args, **kwargs) -> str:
+        session = _ACTIVE_SESSION.get()
+        if session is None:
+            raise RuntimeError(f"Tool '{name}' was called outside of an active ToolSession.")
+        return session.call(name, *args, **kwargs)
+    return run
+
+
+def session_tools() -> List[BaseTool]:
+    """
+    The filesystem tools, with the names, descriptions and arguments of the tools in `filesystem_tools`,
+    acting on the active ToolSession. They hold no state, so one agent executor can serve every run.
+    """
+    return [
+        StructuredTool.from_function(func=_dispatch(template.name), name=template.name, description=template.description, args_schema=template.args_schema)
+        for template in (fs.list_files, fs.read_file, fs.write_file, fs.apply_patch, fs.list_tree, fs.read_files, fs.read_file_range, fs.grep_files)
+    ]